@@ -0,0 +1,178 @@
+# archive.py
+# Kompaktes Archiv beendeter Spiele und blockweises Auslesen für die Wiedergabe.
+#
+# Eine Datei pro Spiel (<archive_id>.hsa im Archiv-Verzeichnis):
+#   Zeile 1  - JSON-Kopf: Raum, Start/Ende, Ergebnis, Spielerliste, Zeitleiste (Fänge, Aufgaben, Phasen), Anzahl Blöcke
+#   danach   - ein Block pro ARCHIVE_BLOCK_SECONDS Spielzeit: JSON-Zeile {"start", "end", "points", "size"}, gefolgt von
+#              "size" Bytes zlib-komprimierter Spalten (siehe _encode_block)
+# Die Standortverläufe liegen spaltenweise und delta-kodiert als 32-Bit-Ganzzahlen vor: Zeit in Millisekunden seit
+# Blockbeginn, Koordinaten in Mikrograd (~0,1 m), Genauigkeit in Dezimetern. Gelesen wird Block für Block mit dem
+# Byte-Offset als Cursor (read_replay_block); auch ein langes Spiel liegt beim Abspielen nie ganz im Speicher.
+import json
+import math
+import os
+import re
+import sys
+import time
+import zlib
+from array import array
+from itertools import accumulate, groupby
+from geo import parse_fix
+
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_FILE_SUFFIX = ".hsa"
+ARCHIVE_BLOCK_SECONDS = 300 # Spielzeit pro Block (= pro Wiedergabe-Abschnitt)
+ARCHIVE_LIST_LIMIT = 50 # LIST_REPLAYS liefert höchstens so viele (neueste zuerst)
+ARCHIVE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,80}$") # Keine Pfadangaben von Clients
+
+TIME_SCALE = 1000 # Millisekunden
+COORDINATE_SCALE = 1000000 # Mikrograd
+ACCURACY_SCALE = 10 # Dezimeter
+INT32_MAX = 2 ** 31 - 1
+
+
+def archive_path(directory, archive_id):
+    """Pfad der Archivdatei; ValueError bei einer ungültigen archive_id."""
+    if not isinstance(archive_id, str) or not ARCHIVE_ID_PATTERN.match(archive_id):
+        raise ValueError(f"Ungültige Archiv-ID: {archive_id!r}")
+    return os.path.join(directory, archive_id + ARCHIVE_FILE_SUFFIX)
+
+
+def _delta_column(values, runs, column, scale, base):
+    for _, points in runs:
+        previous = 0
+        for point in points:
+            quantized = round((point[column] - base) * scale)
+            values.append(quantized - previous)
+            previous = quantized
+
+
+def _usable_points(points):
+    """Punkte, die sich kodieren lassen: endliche Zeit, gültiger Standort (siehe geo.parse_fix); sonst verworfen."""
+    usable = []
+    for t, lat, lon, accuracy in points:
+        fix = parse_fix(lat, lon, accuracy)
+        if fix is None and accuracy is not None: fix = parse_fix(lat, lon) # Nur die Genauigkeit ist unbrauchbar: als unbekannt behalten
+        if fix is not None and isinstance(t, (int, float)) and math.isfinite(t):
+            usable.append((t,) + fix)
+    return usable
+
+
+def _encode_block(block_start, runs):
+    """
+    runs: [(Spielerindex, [(t, lat, lon, accuracy), ...]), ...]. Spalten als ein int32-Feld (little-endian):
+    Anzahl Läufe, Spielerindizes, Punktanzahlen, dann Zeit, lat und lon jeweils delta-kodiert pro Lauf, zuletzt die
+    Genauigkeit absolut (-1 = unbekannt).
+    """
+    values = array("i", [len(runs)])
+    values.extend(index for index, _ in runs)
+    values.extend(len(points) for _, points in runs)
+    _delta_column(values, runs, 0, TIME_SCALE, block_start)
+    _delta_column(values, runs, 1, COORDINATE_SCALE, 0)
+    _delta_column(values, runs, 2, COORDINATE_SCALE, 0)
+    for _, points in runs:
+        values.extend(-1 if point[3] is None else min(round(point[3] * ACCURACY_SCALE), INT32_MAX) for point in points)
+    if sys.byteorder == "big": values.byteswap()
+    return zlib.compress(values.tobytes(), 6)
+
+
+def _decode_block(block_start, data):
+    """Umkehrung von _encode_block: [{"player": Index, "t": [...], "lat": [...], "lon": [...], "accuracy": [...]}, ...]"""
+    values = array("i")
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == "big": values.byteswap()
+    run_count = values[0]
+    indexes, counts = values[1:1 + run_count], values[1 + run_count:1 + 2 * run_count]
+    position = 1 + 2 * run_count
+    tracks = [{"player": index} for index in indexes]
+    for key, scale, base, digits in (("t", TIME_SCALE, block_start, 3), ("lat", COORDINATE_SCALE, 0, 6), ("lon", COORDINATE_SCALE, 0, 6)):
+        for track, count in zip(tracks, counts):
+            track[key] = [round(base + value / scale, digits) for value in accumulate(values[position:position + count])]
+            position += count
+    for track, count in zip(tracks, counts):
+        track["accuracy"] = [None if value < 0 else value / ACCURACY_SCALE for value in values[position:position + count]]
+        position += count
+    if position != len(values): raise ValueError("Archivblock hat eine unerwartete Länge.")
+    return tracks
+
+
+def write_game_archive(directory, archive_id, header, tracks, block_seconds=ARCHIVE_BLOCK_SECONDS):
+    """
+    Schreibt ein beendetes Spiel. header: JSON-taugliches Dict (u.a. "started", "players", "events");
+    tracks: {Spielerindex: [(t, lat, lon, accuracy), ...]} zeitlich aufsteigend; nicht kodierbare Punkte (NaN, außerhalb
+    ±90/±180) werden übersprungen, statt das ganze Spiel zu verlieren. Die Datei erscheint erst vollständig
+    (temporäre Datei + rename, bei einem Fehler wird die temporäre Datei entfernt). Gibt (Pfad, Anzahl Punkte) zurück.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, archive_id)
+    raw_point_count = sum(len(points) for points in tracks.values())
+    tracks = {player_index: _usable_points(points) for player_index, points in tracks.items()}
+    first_times = [points[0][0] for points in tracks.values() if points]
+    origin = min(first_times + [header.get("started") or time.time()])
+    blocks = {} # Blocknummer -> [(Spielerindex, Punkte)]
+    for player_index, points in sorted(tracks.items()):
+        for block_number, block_points in groupby(points, key=lambda point: int((point[0] - origin) // block_seconds)):
+            blocks.setdefault(block_number, []).append((player_index, list(block_points)))
+    point_count = sum(len(points) for points in tracks.values())
+    if point_count < raw_point_count:
+        print(f"ARCHIVE: {raw_point_count - point_count} ungültige Standorte in {archive_id} übersprungen.")
+    header = dict(header, format=ARCHIVE_FORMAT_VERSION, archive_id=archive_id, block_seconds=block_seconds,
+                  blocks=len(blocks), points=point_count)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+            for block_number in sorted(blocks):
+                block_start = origin + block_number * block_seconds
+                data = _encode_block(block_start, blocks[block_number])
+                block_header = {"start": round(block_start, 3), "end": round(block_start + block_seconds, 3),
+                                "points": sum(len(points) for _, points in blocks[block_number]), "size": len(data)}
+                f.write(json.dumps(block_header, separators=(",", ":")).encode("utf-8") + b"\n")
+                f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path): os.remove(temp_path) # Keine halbe Datei zurücklassen
+        raise
+    return path, point_count
+
+
+def list_archives(directory, limit=ARCHIVE_LIST_LIMIT):
+    """Kurzinfos der neuesten Archive (nur die Kopfzeilen, ohne Spielerliste und Zeitleiste)."""
+    if not directory or not os.path.isdir(directory): return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith(ARCHIVE_FILE_SUFFIX)), reverse=True)[:limit]
+    summaries = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), "rb") as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            print(f"ARCHIVE: Kopf von {name} nicht lesbar: {e}"); continue
+        summary = {key: value for key, value in header.items() if key not in ("players", "events")}
+        summary["player_count"] = len(header.get("players", []))
+        summaries.append(summary)
+    return summaries
+
+
+def read_replay_block(directory, archive_id, cursor=0):
+    """
+    Ein Wiedergabe-Abschnitt. Cursor 0 liefert den Kopf ({"header": ...}), jeder weitere Cursor (aus dem vorigen Aufruf)
+    den nächsten Block ({"start", "end", "tracks"}). Gibt (Abschnitt, nächster Cursor oder None am Ende) zurück.
+    FileNotFoundError bei unbekanntem Archiv, ValueError bei ungültiger ID oder einem Cursor, der auf keinen Block zeigt.
+    """
+    path = archive_path(directory, archive_id)
+    if not isinstance(cursor, int) or isinstance(cursor, bool) or cursor < 0:
+        raise ValueError(f"Ungültiger Cursor: {cursor!r}")
+    with open(path, "rb") as f:
+        if cursor == 0:
+            chunk = {"header": json.loads(f.readline())}
+        else:
+            f.seek(cursor)
+            try:
+                block_header = json.loads(f.readline())
+                data = f.read(block_header["size"])
+                tracks = _decode_block(block_header["start"], data)
+            except (KeyError, TypeError, ValueError, zlib.error) as e:
+                raise ValueError(f"Cursor {cursor} zeigt auf keinen Archivblock ({type(e).__name__}).")
+            chunk = {"start": block_header["start"], "end": block_header["end"], "tracks": tracks}
+        next_cursor = f.tell()
+        return chunk, (next_cursor if f.read(1) else None)
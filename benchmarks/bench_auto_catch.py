@@ -0,0 +1,107 @@
+# bench_auto_catch.py
+# Misst das automatische Fangen: alle Seeker gegen alle aktiven Hider in einem Durchgang.
+#
+#   python benchmarks/bench_auto_catch.py [--seekers 50] [--hiders 200] [--budget-ms 5]
+#
+# Gemessen werden geo.pairs_within_meters allein (mit NumPy, falls installiert, und in reinem Python) sowie
+# server.run_auto_catch auf einem Raum mit echtem Spielerverzeichnis (inkl. Auslesen der Standort-Spalten). Die Hider
+# stehen außerhalb des Fang-Radius, damit jeder Durchgang dieselbe Arbeit macht. Exit-Code 1, wenn der Median von
+# run_auto_catch über dem Budget liegt.
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geo
+import server
+from players import PlayerRecord
+
+CENTER_LAT, CENTER_LON = 52.52, 13.405 # Berlin Mitte
+AREA_METERS = 3000 # Spielfeld etwa 3 x 3 km
+
+
+def _random_point(rng):
+    return (CENTER_LAT + rng.uniform(-0.5, 0.5) * AREA_METERS / geo.METERS_PER_DEGREE_LAT,
+            CENTER_LON + rng.uniform(-0.5, 0.5) * AREA_METERS / (geo.METERS_PER_DEGREE_LAT * 0.61))
+
+
+def make_points(seeker_count, hider_count, radius_meters, seed=1):
+    """Seeker und Hider zufällig im Spielfeld, jeder Hider mehr als radius_meters von allen Seekern entfernt."""
+    rng = random.Random(seed)
+    seekers = [_random_point(rng) for _ in range(seeker_count)]
+    hiders = []
+    while len(hiders) < hider_count:
+        lat, lon = _random_point(rng)
+        if all(geo.haversine_meters(lat, lon, s_lat, s_lon) > radius_meters for s_lat, s_lon in seekers):
+            hiders.append((lat, lon))
+    return seekers, hiders
+
+
+def make_room(seekers, hiders):
+    room = server.GameRoom("bench", "Benchmark")
+    with contextlib.redirect_stdout(io.StringIO()): # Reset-Logs nicht mitmessen
+        server.reset_game_to_initial_state(room, notify_clients_about_reset=False)
+    now = time.time()
+    players = room.game_data["players"]
+    for role, points in (("seeker", seekers), ("hider", hiders)):
+        for index, (lat, lon) in enumerate(points):
+            players[f"{role}{index}"] = PlayerRecord(name=f"{role}{index}", original_role=role, current_role=role,
+                                                     location=[lat, lon, 5.0], last_location_timestamp=now)
+    return room
+
+
+def measure(function, repeats):
+    """Laufzeiten in Millisekunden (nach einem Aufwärmlauf)."""
+    function()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<38} median {statistics.median(timings):7.3f} ms   p95 {p95:7.3f} ms")
+    return statistics.median(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark für das automatische Fangen")
+    arg_parser.add_argument("--seekers", type=int, default=50)
+    arg_parser.add_argument("--hiders", type=int, default=200)
+    arg_parser.add_argument("--radius", type=float, default=25.0, help="Fang-Radius in Metern")
+    arg_parser.add_argument("--repeats", type=int, default=200)
+    arg_parser.add_argument("--budget-ms", type=float, default=5.0, help="Erlaubter Median für run_auto_catch")
+    args = arg_parser.parse_args()
+
+    seekers, hiders = make_points(args.seekers, args.hiders, args.radius)
+    seeker_lats, seeker_lons = [p[0] for p in seekers], [p[1] for p in seekers]
+    hider_lats, hider_lons = [p[0] for p in hiders], [p[1] for p in hiders]
+    print(f"{args.seekers} Seeker x {args.hiders} Hider, Radius {args.radius:.0f} m, NumPy {'ja' if geo.numpy is not None else 'nein'}")
+
+    variants = [("python", False)] + ([("numpy", True), ("automatisch", None)] if geo.numpy is not None else [])
+    for name, use_numpy in variants:
+        report(f"pairs_within_meters ({name})", measure(
+            lambda: geo.pairs_within_meters(seeker_lats, seeker_lons, hider_lats, hider_lons, args.radius, use_numpy=use_numpy), args.repeats))
+
+    server.AUTO_CATCH_RADIUS_METERS = args.radius
+    room = make_room(seekers, hiders)
+    with room.lock:
+        median_ms = report("run_auto_catch (Raum)", measure(lambda: server.run_auto_catch(room), args.repeats))
+        assert room.game_data["players"].count("active_hiders") == args.hiders, "Benchmark-Aufbau fehlerhaft: Hider gefangen"
+    if median_ms > args.budget_ms:
+        print(f"ZU LANGSAM: Median {median_ms:.3f} ms > Budget {args.budget_ms:.3f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# bench_server.py
+# Micro-Benchmarks der Server-Hotpaths mit gespeicherten Vergleichswerten (baselines.json) und Regressionsschwelle.
+#
+#   python benchmarks/bench_server.py [--players 50,200,500] [--filter broadcast] [--threshold 0.25]
+#   python benchmarks/bench_server.py --update-baseline      # aktuelle Messung als neue Vergleichswerte speichern
+#
+# Jeder Fall ruft die echten Funktionen aus server.py auf einem synthetischen Raum auf: laufendes Spiel, n Spieler
+# (20 % Seeker) mit Standorten, Aufgaben für alle Hider (der Aufgabenpool wird dafür synthetisch aufgefüllt) und je
+# einer Verbindung im Speicher (MemoryConnection: kodiert und rahmt wie eine echte Verbindung, zählt aber nur Bytes).
+# Die Protokollausgabe (print) wird während der Messung verworfen. Kurze Aufrufe werden in Serien wiederholt, bis eine
+# Messung mindestens MIN_SAMPLE_SECONDS dauert.
+#
+# Verglichen wird nicht die absolute Zeit, sondern das Verhältnis zu einer festen Referenzlast (reference_workload:
+# Dicts bauen und mit json.dumps kodieren, wie beim Versand), die direkt vor und nach jeder Messung mitläuft. Auf
+# Handys und VMs schwankt die Rechenleistung zwischen zwei Läufen um ±40 %, das Verhältnis nur um wenige Prozent.
+# Die absoluten Zeiten werden zusätzlich angezeigt und gespeichert. Die Uhr des Servers
+# (server.time.time) springt bei den Sende-Fällen pro Aufruf zwischen zwei Zeitpunkten eine Sekunde auseinander hin und
+# her (BenchClock): Countdowns und damit die Delta-Patches ändern sich bei jedem Aufruf gleich, statt vom Zeitpunkt der
+# Messung abzuhängen, und das Spiel läuft nie ab. Die Garbage Collection ist während der Messung aus (wie bei timeit).
+#
+# Die Vergleichswerte stammen von einem bestimmten Rechner und einer Python-Version (siehe "machine" in baselines.json;
+# bei Abweichung gibt es einen Hinweis, dann besser zuerst auf dem alten Stand --update-baseline). Exit-Code 1, wenn
+# ein Fall um mehr als --threshold langsamer ist als sein Vergleichswert. Neue Fälle werden nur angezeigt.
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+from players import PlayerRecord
+from bench_auto_catch import make_points
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_PLAYER_COUNTS = (50, 200)
+DEFAULT_THRESHOLD = 0.25 # 25 % langsamer als der Vergleichswert gilt als Regression
+SEEKER_SHARE = 0.2
+SAMPLES = 25 # Messungen pro Fall (nach einem Aufwärmlauf)
+MIN_SAMPLE_SECONDS = 0.002
+
+
+class _NullWriter:
+    def write(self, text): return len(text)
+    def flush(self): pass
+
+
+class BenchClock:
+    """Ersatz für das time-Modul in server.py: time() steht still und wechselt nur mit tick() um eine Sekunde; alles andere wie time."""
+    def __init__(self):
+        self.start = self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def tick(self):
+        self.now = self.start + 1.0 if self.now == self.start else self.start
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+clock = BenchClock()
+
+
+class MemoryConnection(server.ClientConnection):
+    """Verbindung ohne Socket: durchläuft Kodierung, Kompression und Framing, behält aber nur die Anzahl der Bytes."""
+    def __init__(self, room, delta_updates=False):
+        super().__init__()
+        self.room = room
+        self.delta_updates = delta_updates
+        self.sent_messages = 0
+        self.sent_bytes = 0
+
+    def sendall(self, data):
+        self.sent_messages += 1
+        self.sent_bytes += len(data)
+
+
+def make_room(player_count, delta_updates=False):
+    """Laufendes Spiel mit player_count verbundenen Spielern; jeder aktive Hider hat eine Aufgabe."""
+    seeker_count = max(1, int(player_count * SEEKER_SHARE))
+    seekers, hiders = make_points(seeker_count, player_count - seeker_count, radius_meters=25.0)
+    room = server.GameRoom("bench", "Benchmark")
+    with contextlib.redirect_stdout(_NullWriter()):
+        server.reset_game_to_initial_state(room, notify_clients_about_reset=False)
+        now = clock.time()
+        game_data = room.game_data
+        tasks = [dict(server.TASKS[index % len(server.TASKS)], id=index + 1, time_limit_seconds=3600) for index in range(player_count)]
+        game_data.update({
+            "status": server.GAME_STATE_RUNNING, "status_display": server.GAME_STATE_DISPLAY_NAMES[server.GAME_STATE_RUNNING],
+            "game_start_time_actual": now, "game_end_time": now + server.GAME_DURATION_SECONDS,
+            "available_tasks": tasks, "current_phase_index": 2, "current_phase_start_time": now, "updates_done_in_current_phase": 1,
+        })
+        room.task_board.reset(tasks)
+        players = game_data["players"]
+        for role, points in (("seeker", seekers), ("hider", hiders)):
+            for index, (lat, lon) in enumerate(points):
+                player_id = f"{role}{index}"
+                players[player_id] = PlayerRecord(name=f"{role}{index}", original_role=role, current_role=role,
+                                                  location=[lat, lon, 8.0], last_location_timestamp=now, last_seen=now,
+                                                  confirmed_for_lobby=True, client_conn=MemoryConnection(room, delta_updates))
+                if role == "hider": server.assign_task_to_hider(room, player_id)
+    return room
+
+
+_REFERENCE_PLAYERS = {f"p{index}": {"name": f"Spieler {index}", "role": "hider", "status": "active",
+                                     "lat": 52.52 + index / 1000, "lon": 13.405} for index in range(40)}
+
+def reference_workload():
+    return json.dumps({player_id: dict(info, points=index) for index, (player_id, info) in enumerate(_REFERENCE_PLAYERS.items())})
+
+
+def _time_per_call(function, number):
+    started = time.perf_counter()
+    for _ in range(number): function()
+    return (time.perf_counter() - started) / number
+
+
+def _calls_per_sample(function):
+    function() # Aufwärmen
+    number = 1
+    while _time_per_call(function, number) * number < MIN_SAMPLE_SECONDS and number < 100000:
+        number *= 4
+    return number
+
+
+def measure(function, reference_calls):
+    """(Sekunden pro Aufruf, Verhältnis zur Referenzlast) als Median aus SAMPLES Messungen."""
+    number = _calls_per_sample(function)
+    timings, ratios = [], []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(SAMPLES):
+            reference_before = _time_per_call(reference_workload, reference_calls)
+            timing = _time_per_call(function, number)
+            reference_after = _time_per_call(reference_workload, reference_calls)
+            timings.append(timing)
+            ratios.append(timing / ((reference_before + reference_after) / 2))
+    finally:
+        if gc_was_enabled: gc.enable()
+    return statistics.median(timings), statistics.median(ratios)
+
+
+def build_cases(player_count):
+    """[(Name, Funktion)] für einen Raum mit player_count Spielern. Jede Funktion lässt den Raum im selben Zustand zurück."""
+    cases = []
+    for delta_updates in (False, True):
+        suffix = " (delta)" if delta_updates else ""
+        room = make_room(player_count, delta_updates)
+        server.broadcast_full_game_state_to_all(room) # Erster Snapshot; bei Delta-Verbindungen folgen danach nur Patches
+        assert all(p.client_conn.sent_messages == 1 for p in room.game_data["players"].values()), "Benchmark-Aufbau fehlerhaft: Broadcast erreicht nicht alle"
+        hider = room.game_data["players"]["hider0"]
+        seeker = room.game_data["players"]["seeker0"]
+        cases.append((f"send_data_to_one_client hider{suffix}",
+                      lambda room=room, hider=hider: (clock.tick(), server.send_data_to_one_client(room, hider.client_conn, "hider0"))))
+        cases.append((f"send_data_to_one_client seeker{suffix}",
+                      lambda room=room, seeker=seeker: (clock.tick(), server.send_data_to_one_client(room, seeker.client_conn, "seeker0"))))
+        cases.append((f"broadcast_full_game_state_to_all{suffix}", lambda room=room: (clock.tick(), server.broadcast_full_game_state_to_all(room))))
+
+    room = make_room(player_count)
+    cases.append(("check_game_conditions_and_end", lambda: server.check_game_conditions_and_end(room)))
+
+    def reassign_task():
+        with room.lock:
+            server.clear_hider_task(room, room.game_data["players"]["hider0"], "hider0")
+            server.assign_task_to_hider(room, "hider0")
+    cases.append(("assign_task_to_hider (mit Freigabe)", reassign_task))
+
+    cases.append(("_calculate_and_set_next_broadcast_time", lambda: server._calculate_and_set_next_broadcast_time(room, clock.time())))
+
+    server.AUTO_CATCH_RADIUS_METERS = 25.0 # Standorte aus make_points: kein Hider in Reichweite, jeder Durchgang gleich
+    def auto_catch():
+        with room.lock: server.run_auto_catch(room)
+    cases.append(("run_auto_catch", auto_catch))
+    return cases
+
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"machine": None, "results": {}}
+
+
+def machine_description():
+    return f"{platform.machine()} {platform.processor() or platform.system()} / Python {platform.python_version()}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Micro-Benchmarks der Server-Hotpaths mit Regressionsprüfung")
+    arg_parser.add_argument("--players", default=",".join(str(n) for n in DEFAULT_PLAYER_COUNTS),
+                            help="Raumgrößen, kommagetrennt")
+    arg_parser.add_argument("--filter", default=None, help="Nur Fälle, deren Name diesen Text enthält")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Erlaubte Verlangsamung (0.25 = 25 %%)")
+    arg_parser.add_argument("--baseline", default=BASELINE_PATH, help="Datei mit den Vergleichswerten")
+    arg_parser.add_argument("--update-baseline", action="store_true", help="Gemessene Werte als neue Vergleichswerte speichern")
+    args = arg_parser.parse_args()
+    player_counts = [int(n) for n in args.players.split(",") if n.strip()]
+    server.time = clock # Nur in diesem Prozess; siehe BenchClock
+
+    baselines = load_baselines(args.baseline)
+    machine = machine_description()
+    if baselines.get("machine") and baselines["machine"] != machine and not args.update_baseline:
+        print(f"HINWEIS: Vergleichswerte stammen von '{baselines['machine']}', gemessen wird auf '{machine}'.")
+
+    reference_calls = _calls_per_sample(reference_workload)
+    results = {}
+    regressions = []
+    print(f"{'Fall':<50} {'Median':>11} {'relativ':>9} {'Vergleich':>9} {'Änderung':>9}")
+    for player_count in player_counts:
+        with contextlib.redirect_stdout(_NullWriter()):
+            cases = build_cases(player_count)
+        for name, function in cases:
+            if args.filter and args.filter not in name: continue
+            key = f"{name} [n={player_count}]"
+            with contextlib.redirect_stdout(_NullWriter()):
+                seconds, relative = measure(function, reference_calls)
+            results[key] = {"relative": round(relative, 4), "microseconds": round(seconds * 1e6, 2)}
+            baseline = baselines["results"].get(key)
+            if isinstance(baseline, dict) and baseline.get("relative"): # Ältere oder kaputte Einträge gelten als fehlend
+                change = relative / baseline["relative"] - 1
+                verdict = "  REGRESSION" if change > args.threshold else ""
+                if verdict: regressions.append((key, change))
+                print(f"{key:<50} {seconds * 1e6:>9.1f}us {relative:>9.3f} {baseline['relative']:>9.3f} {change * 100:>+8.1f}%{verdict}")
+            else:
+                print(f"{key:<50} {seconds * 1e6:>9.1f}us {relative:>9.3f} {'-':>9} {'neu':>9}")
+
+    if args.update_baseline:
+        merged = dict(baselines["results"]) if baselines.get("machine") == machine else {}
+        merged.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine, "created": time.strftime("%Y-%m-%d"),
+                       "unit": "relative = Median pro Aufruf / Referenzlast, microseconds = Median pro Aufruf",
+                       "results": dict(sorted(merged.items()))}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Vergleichswerte gespeichert: {args.baseline} ({len(results)} Fälle)")
+        return 0
+    if regressions:
+        print(f"\nZU LANGSAM ({len(regressions)} Fälle mehr als {args.threshold * 100:.0f} % über dem Vergleichswert):")
+        for key, change in regressions:
+            print(f"  {key}: {change * 100:+.1f} %")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,13 +6,25 @@ import threading
 import subprocess
 import random
 import traceback # Importiert für detailliertere Fehlermeldungen in Threads
-from flask import Flask, jsonify, request, send_from_directory, session
+from flask import Flask, Response, jsonify, request, send_from_directory, session
+from protocol import apply_game_update_patch, FrameDecoder, FrameTooLargeError, FRAMING_NEWLINE, FRAMING_LENGTH_PREFIXED
+from protocol import decode_message, ENCODING_JSON, SUPPORTED_ENCODINGS, COMPACT_SCHEMA_VERSION
+from protocol import StreamDecompressor, StreamDecodeError, COMPRESSION_NONE, COMPRESSION_ZLIB
+import gamelog
 
 # Standardwerte, können zur Laufzeit geändert werden
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 65432
 FLASK_PORT = 5000
 STATIC_FOLDER = 'static'
+USE_DELTA_UPDATES = True # Server soll nach dem ersten Snapshot nur noch Änderungen (game_update_patch) senden
+PREFERRED_FRAMING = FRAMING_LENGTH_PREFIXED # Framing für Nachrichten vom Server, wird beim JOIN/REJOIN ausgehandelt
+PREFERRED_ENCODINGS = list(SUPPORTED_ENCODINGS) # Kompakte Kodierung bevorzugt (spart Datenvolumen), JSON als Rückfall
+PREFERRED_COMPRESSION = COMPRESSION_ZLIB # Durchgehender Deflate-Strom pro Verbindung; COMPRESSION_NONE spart CPU auf sehr alten Geräten
+SERVER_RESTART_FAST_RECONNECT_SECONDS = 10 # Nach einer "server_restart"-Ankündigung so lange ohne Pausen neu verbinden
+REPLAY_SOCKET_TIMEOUT_SECONDS = 10 # Wiedergabe archivierter Spiele läuft über eine eigene, kurzlebige Verbindung
+CLIENT_LOG_LEVEL = gamelog.INFO # gamelog.DEBUG zeigt zusätzlich jede gesendete Aktion
+CLIENT_LOG_RATE_LIMIT = gamelog.LOG_RATE_LIMIT_PER_SECOND # Protokollzeilen pro Sekunde und Kategorie (0 = unbegrenzt)
 
 # Das globale Dictionary, das die Daten für die UI bereithält
 client_view_data = {
@@ -37,6 +49,7 @@ client_view_data = {
     "current_task": None, # Für Hider
     "hider_leaderboard": [], # Für Hider und am Spielende
     "hider_locations": {}, # Für Seeker
+    "nearest_hider_hint": None, # Für Seeker: "hot"/"warm"/"cold" (Entfernung zum nächsten Hider), None ohne eigenen Standort
     "game_message": None, # Allgemeine Nachrichten vom Server
     "error_message": None, # Allgemeine Fehlermeldungen vom Server
     "join_error": None, # Spezifische Fehlermeldung für den Join-Prozess, die zum Join-Screen zurückführt
@@ -51,6 +64,9 @@ client_view_data = {
     "offline_action_queue": [],  # NEU: Liste für {action_for_server: {...}, ui_message_on_cache: "..."}
     "is_processing_offline_queue": False, # NEU: Flag für UI-Feedback
     "pre_cached_tasks": [], # NEU: Für Aufgaben-Pre-Caching
+    "room_id": None, # Raum auf dem Server (bleibt nach Reset erhalten, damit man im selben Raum neu beitritt)
+    "room_name": None,
+    "available_rooms": [], # Raumverzeichnis vom Server (LIST_ROOMS)
 }
 client_data_lock = threading.Lock() # Lock für den sicheren Zugriff auf client_view_data
 server_socket_global = None # Der globale Socket zum Spielserver
@@ -87,12 +103,12 @@ def send_message_to_server(data):
     with client_data_lock: # Prüfe den aktuellen Verbindungsstatus unter Lock
         socket_is_currently_connected = client_view_data["is_socket_connected_to_server"]
     
-    print(f"CLIENT SEND: Attempting to send action '{action_sent}'. Socket global: {'Exists' if server_socket_global else 'None'}, Connected-Flag: {socket_is_currently_connected}, Socket Obj: {server_socket_global}")
+    gamelog.log(gamelog.DEBUG, "CLIENT SEND", f"Attempting to send action '{action_sent}'. Socket global: {'Exists' if server_socket_global else 'None'}, Connected-Flag: {socket_is_currently_connected}, Socket Obj: {server_socket_global}")
 
     if server_socket_global and socket_is_currently_connected:
         try:
             server_socket_global.sendall(json.dumps(data).encode('utf-8') + b'\n')
-            print(f"CLIENT SEND: Action '{action_sent}' sent successfully.")
+            gamelog.log(gamelog.DEBUG, "CLIENT SEND", f"Action '{action_sent}' sent successfully.")
             return True
         except (BrokenPipeError, ConnectionResetError, OSError) as e:
             print(f"CLIENT SEND (ERROR): Senden von '{action_sent}' fehlgeschlagen, Verbindung verloren: {e}.")
@@ -165,6 +181,33 @@ def process_offline_queue():
     print(f"CLIENT OFFLINE QUEUE: Verarbeitung beendet. {successfully_sent_actions_count} gesendet. {len(client_view_data['offline_action_queue'])} verbleiben.")
 
 
+def resolve_game_update_patch(message, delta_sync):
+    """
+    Wendet einen game_update_patch auf den zuletzt bekannten Serverzustand an und gibt das vollständige game_update zurück.
+    Bei einer Lücke in den Sequenznummern wird einmalig ein vollständiger Snapshot angefordert und None zurückgegeben.
+    """
+    expected_seq = delta_sync["seq"] + 1 if delta_sync["seq"] is not None else None
+    if delta_sync["state"] is None or message.get("seq") != expected_seq:
+        if not delta_sync["resync_requested"]:
+            print(f"CLIENT NET (DELTA): Lücke erkannt (erwartet seq {expected_seq}, erhalten {message.get('seq')}). Fordere vollständigen Snapshot an.")
+            delta_sync["resync_requested"] = True
+            send_message_to_server({"action": "REQUEST_FULL_SYNC"})
+        return None
+    delta_sync["state"] = apply_game_update_patch(delta_sync["state"], message.get("patch", {}))
+    delta_sync["seq"] = message["seq"]
+    return delta_sync["state"]
+
+
+def get_protocol_options():
+    """Protokoll-Optionen, die bei JOIN_GAME/REJOIN_GAME mitgeschickt und vom Server per protocol_ack bestätigt werden."""
+    return {
+        "delta_updates": USE_DELTA_UPDATES,
+        "framing": PREFERRED_FRAMING,
+        "encoding": PREFERRED_ENCODINGS,
+        "schema": COMPACT_SCHEMA_VERSION,
+        "compression": PREFERRED_COMPRESSION
+    }
+
 def network_communication_thread():
     """
     Dieser Thread verwaltet die persistente Socket-Verbindung zum Spielserver.
@@ -172,7 +215,10 @@ def network_communication_thread():
     Alle eingehenden Nachrichten vom Server werden hier verarbeitet und in `client_view_data` aktualisiert.
     """
     global server_socket_global, client_view_data, SERVER_HOST, SERVER_PORT
-    buffer = "" # Puffer für unvollständige Nachrichtenpakete
+    frame_decoder = FrameDecoder() # Puffer für unvollständige Nachrichtenpakete (Byte-Ebene)
+    delta_sync = {"seq": None, "state": None, "resync_requested": False} # Basis für Delta-Updates, gilt pro Verbindung
+    wire_encoding = {"encoding": ENCODING_JSON, "schema": COMPACT_SCHEMA_VERSION, "compression": COMPRESSION_NONE, "decompressor": None} # Ausgehandelte Kodierung, gilt pro Verbindung
+    fast_reconnect_until = 0 # Nach "server_restart" bis zu diesem Zeitpunkt ohne die üblichen Pausen neu verbinden
     print("CLIENT NET: Network communication thread started.")
 
     while True:
@@ -232,7 +278,9 @@ def network_communication_thread():
                 print(f"CLIENT NET: Erfolgreich verbunden mit {current_host_to_connect}:{current_port_to_connect}. Socket: {temp_sock}")
                 temp_sock.settimeout(None) # Nach erfolgreichem Connect: Blockierend machen
                 server_socket_global = temp_sock # Globalen Socket setzen
-                buffer = "" # Puffer leeren bei neuer Verbindung
+                frame_decoder = FrameDecoder() # Neue Verbindung beginnt immer zeilenbasiert
+                wire_encoding = {"encoding": ENCODING_JSON, "schema": COMPACT_SCHEMA_VERSION, "compression": COMPRESSION_NONE, "decompressor": None} # ... und mit unkomprimiertem JSON
+                delta_sync = {"seq": None, "state": None, "resync_requested": False} # Neue Verbindung -> neuer Snapshot
 
                 with client_data_lock:
                     client_view_data["is_socket_connected_to_server"] = True # SOFORT True setzen
@@ -252,8 +300,10 @@ def network_communication_thread():
                         rejoin_payload = {
                             "action": "REJOIN_GAME",
                             "player_id": client_view_data["player_id"],
-                            "name": client_view_data["player_name"]
+                            "name": client_view_data["player_name"],
+                            **get_protocol_options()
                         }
+                        if client_view_data.get("room_id"): rejoin_payload["room_id"] = client_view_data["room_id"]
                         try:
                             # Direkt senden, da send_message_to_server sich selbst auf `client_view_data` basiert.
                             print(f"CLIENT NET: Sende REJOIN_GAME als {client_view_data['player_name']} ({client_view_data['player_id']}).")
@@ -268,6 +318,10 @@ def network_communication_thread():
                             # Der finally-Block wird den Socket schließen, wenn is_socket_connected_to_server False ist.
                     else: # Keine Player-ID vorhanden, also kein Rejoin-Versuch
                         print("CLIENT NET: Keine Spieler-ID/Name für Rejoin vorhanden. Warte auf JOIN oder Server-Update.")
+                        try: # Raumverzeichnis für die Raumauswahl in der Lobby holen
+                            server_socket_global.sendall(json.dumps({"action": "LIST_ROOMS"}).encode('utf-8') + b'\n')
+                        except Exception as e_list:
+                            print(f"CLIENT NET: Senden von LIST_ROOMS fehlgeschlagen: {e_list}")
                         # if client_view_data["game_state"].get("status") == "disconnected": # Nur wenn vorher disconnected, sonst überschreibt es "Verbunden..."
                         #      client_view_data["game_state"]["status_display"] = "Verbunden. Warte auf Spielbeitritt..."
 
@@ -280,7 +334,7 @@ def network_communication_thread():
                 # OSError kann hier auch "Network is unreachable" oder "No route to host" sein.
                 print(f"CLIENT NET (CONNECT FAIL): Verbindung zu {current_host_to_connect}:{current_port_to_connect} fehlgeschlagen: {type(e).__name__} - {e}")
                 with client_data_lock: client_view_data["game_state"]["status_display"] = f"Verbindung zu {current_host_to_connect}:{current_port_to_connect} fehlgeschlagen: {type(e).__name__}"
-                time.sleep(3); continue
+                time.sleep(0.3 if time.time() < fast_reconnect_until else 3); continue
             except Exception as e_conn:
                 print(f"CLIENT NET (CONNECT ERROR - UNEXPECTED): {e_conn}")
                 traceback.print_exc()
@@ -318,14 +372,41 @@ def network_communication_thread():
                     client_view_data["game_state"]["status_display"] = "Server hat Verbindung getrennt."
                     client_view_data["error_message"] = "Server hat die Verbindung beendet."
                 continue # Geht zum nächsten Schleifendurchlauf (Verbindungsversuch)
-            buffer += data_chunk.decode('utf-8') # Daten zum Puffer hinzufügen
-
-            while '\n' in buffer: # Verarbeite alle vollständigen Nachrichten im Puffer
-                message_str, buffer = buffer.split('\n', 1)
-                if not message_str.strip(): continue # Leere Nachrichten ignorieren
-                message = json.loads(message_str) # JSON-Nachricht parsen
+            frame_decoder.feed(data_chunk) # Daten zum Puffer hinzufügen (dekodiert wird erst der vollständige Frame)
+
+            while True: # Verarbeite alle vollständigen Nachrichten im Puffer
+                frame = frame_decoder.next_frame()
+                if frame is None: break
+                if wire_encoding["decompressor"]: # Fehler im Strom -> StreamDecodeError, Verbindung wird neu aufgebaut
+                    frame = wire_encoding["decompressor"].decompress(frame)
+                if not frame.strip(): continue # Leere Nachrichten ignorieren
+                try:
+                    message = decode_message(frame, wire_encoding["encoding"], wire_encoding["schema"]) # Nachricht dekodieren
+                except (ValueError, KeyError): # JSONDecodeError, UnicodeDecodeError und msgpack-Fehler sind ValueErrors
+                    print(f"CLIENT NET (DECODE ERROR, {wire_encoding['encoding']}): Frame war '{frame[:200]!r}...'")
+                    with client_data_lock: client_view_data["error_message"] = "Fehlerhafte Daten vom Server empfangen."
+                    continue
                 # print(f"CLIENT NET: Nachricht vom Server empfangen: {message.get('type', 'NO_TYPE')}") # Kann sehr verbose sein
 
+                # Ausgehandeltes Framing gilt ab dem nächsten Frame
+                if message.get("type") == "protocol_ack":
+                    print(f"CLIENT NET: Server bestätigt Protokoll-Optionen: {message}")
+                    frame_decoder.set_mode(message.get("framing", FRAMING_NEWLINE))
+                    wire_encoding["encoding"] = message.get("encoding", ENCODING_JSON)
+                    wire_encoding["schema"] = message.get("schema", COMPACT_SCHEMA_VERSION)
+                    acked_compression = message.get("compression", COMPRESSION_NONE)
+                    if acked_compression != wire_encoding["compression"]: # Wie der Server: neuer Strom nur bei Wechsel
+                        wire_encoding["decompressor"] = StreamDecompressor() if acked_compression != COMPRESSION_NONE else None
+                    wire_encoding["compression"] = acked_compression
+                    continue
+
+                # Delta-Updates: Patches zum vollständigen game_update zusammensetzen, Snapshots als neue Basis merken
+                if message.get("type") == "game_update_patch":
+                    message = resolve_game_update_patch(message, delta_sync)
+                    if message is None: continue # Warten auf angeforderten Snapshot
+                elif message.get("type") == "game_update" and "seq" in message:
+                    delta_sync.update({"seq": message["seq"], "state": message, "resync_requested": False})
+
                 with client_data_lock: # Sperre für Änderungen an client_view_data
                     client_view_data["is_socket_connected_to_server"] = True # Nachricht erhalten -> Verbindung ist aktiv
                     msg_type = message.get("type")
@@ -366,11 +447,11 @@ def network_communication_thread():
                             "player_name", "role", "confirmed_for_lobby", "player_is_ready",
                             "player_status", "location", "game_state", "lobby_players",
                             "all_players_status", "current_task", "hider_leaderboard",
-                            "hider_locations",
+                            "hider_locations", "nearest_hider_hint",
                             "hider_location_update_imminent",
                             "early_end_requests_count", "total_active_players_for_early_end",
                             "player_has_requested_early_end", "task_skips_available",
-                            "pre_cached_tasks" 
+                            "pre_cached_tasks", "room_id", "room_name"
                         ]
                         for key in update_keys:
                             if key in message: client_view_data[key] = message[key]
@@ -384,6 +465,16 @@ def network_communication_thread():
                             threading.Thread(target=process_offline_queue, daemon=True).start()
 
 
+                    elif msg_type == "server_restart": # Server wird ohne Unterbrechung ersetzt: sofort neu verbinden (REJOIN_GAME)
+                        print(f"CLIENT NET: Server-Neustart angekündigt: {message.get('message')}")
+                        fast_reconnect_until = time.time() + SERVER_RESTART_FAST_RECONNECT_SECONDS
+                        client_view_data["is_socket_connected_to_server"] = False
+                        client_view_data["game_state"]["status_display"] = "Server wird aktualisiert. Verbinde neu..."
+                        break # Restliche Frames gehören zur alten Verbindung
+
+                    elif msg_type == "room_list": # Antwort auf LIST_ROOMS
+                        client_view_data["available_rooms"] = message.get("rooms", [])
+
                     elif msg_type == "server_text_notification":
                         game_msg_text = message.get("message", "Server Nachricht")
                         show_termux_notification(title="Hide and Seek Info", content=game_msg_text, notification_id="server_info")
@@ -423,10 +514,11 @@ def network_communication_thread():
                         ack_message = message.get("message", "Aktion bestätigt.")
                         client_view_data["game_message"] = ack_message
 
-        except json.JSONDecodeError:
-            print(f"CLIENT NET (JSON DECODE ERROR): Buffer war '{buffer[:200]}...'")
-            with client_data_lock: client_view_data["error_message"] = "Fehlerhafte Daten vom Server empfangen."
-            buffer = "" 
+        except (FrameTooLargeError, StreamDecodeError) as e_frame:
+            print(f"CLIENT NET (FRAME ERROR): {e_frame} Verbindung wird neu aufgebaut.")
+            with client_data_lock:
+                client_view_data["is_socket_connected_to_server"] = False
+                client_view_data["error_message"] = "Fehlerhafte Daten vom Server empfangen."
         except (ConnectionResetError, BrokenPipeError, OSError) as e_recv:
             print(f"CLIENT NET (RECEIVE ERROR - COMM): Verbindung getrennt (Empfang): {e_recv}")
             with client_data_lock:
@@ -452,7 +544,7 @@ def network_communication_thread():
                     server_socket_global = None 
                 # else:
                     # print("CLIENT NET: No global socket to close in finally block of receive loop.") # Kann zu verbose sein
-                time.sleep(1) 
+                if time.time() >= fast_reconnect_until: time.sleep(1) # Nach server_restart ohne Pause neu verbinden
 
 
 # --- Flask Webserver Routen ---
@@ -523,6 +615,7 @@ def connect_to_server_route():
             "player_id": None, "player_name": None, "role": None,
             "confirmed_for_lobby": False, "player_is_ready": False,
             "join_error": None, "error_message": None, 
+            "room_id": None, "room_name": None, "available_rooms": [], # Räume gehören zum alten Server
             "game_message": "Verbinde mit " + server_address,
             "is_socket_connected_to_server": False, # Wichtig: Signal an Netzwerk-Thread: Neu verbinden
             # Die Offline-Queue wird hier *nicht* geleert. Sie könnte wichtige Aktionen
@@ -575,8 +668,12 @@ def register_player_details_route():
     
     print(f"CLIENT FLASK (Register): Socket connection OK: {socket_conn_ok} before sending JOIN_GAME.")
 
+    join_payload = {"action": "JOIN_GAME", "name": nickname, "role_preference": role_choice, **get_protocol_options()}
+    if data.get('new_room_name'): join_payload["new_room_name"] = data['new_room_name'] # Neuen Raum anlegen und beitreten
+    elif data.get('room_id'): join_payload["room_id"] = data['room_id']
+
     if socket_conn_ok:
-        if not send_message_to_server({"action": "JOIN_GAME", "name": nickname, "role_preference": role_choice}):
+        if not send_message_to_server(join_payload):
             with client_data_lock: client_view_data["join_error"] = "Senden der Join-Anfrage fehlgeschlagen."
     else:
         with client_data_lock: client_view_data["join_error"] = "Nicht mit Server verbunden. Bitte zuerst verbinden."
@@ -721,6 +818,66 @@ def catch_hider_route(): return handle_generic_action("CATCH_HIDER", "hider_id_t
 def request_early_round_end_action_route(): return handle_generic_action("REQUEST_EARLY_ROUND_END")
 @app.route('/skip_task', methods=['POST'])
 def skip_task_route(): return handle_generic_action("SKIP_TASK")
+@app.route('/list_rooms', methods=['POST'])
+def list_rooms_route(): return handle_generic_action("LIST_ROOMS", requires_player_id=False)
+
+def _replay_request(sock, frame_decoder, payload):
+    """Sendet eine Archiv-Anfrage (LIST_REPLAYS/GET_REPLAY) über eine eigene Verbindung und wartet auf die Antwort."""
+    sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+    while True:
+        frame = frame_decoder.next_frame()
+        if frame is None:
+            data_chunk = sock.recv(65536)
+            if not data_chunk: raise ConnectionError("Server hat die Verbindung geschlossen.")
+            frame_decoder.feed(data_chunk); continue
+        if not frame.strip(): continue
+        message = json.loads(frame)
+        if message.get("type") in ("replay_list", "replay_chunk", "error"): return message
+
+@app.route('/replays', methods=['GET'])
+def list_replays_route():
+    try:
+        with socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=REPLAY_SOCKET_TIMEOUT_SECONDS) as replay_sock:
+            response = _replay_request(replay_sock, FrameDecoder(FRAMING_NEWLINE), {"action": "LIST_REPLAYS"})
+    except (OSError, ValueError) as e:
+        print(f"CLIENT FLASK (Replay): Archivliste von {SERVER_HOST}:{SERVER_PORT} nicht abrufbar: {e}")
+        return jsonify({"success": False, "message": f"Spielarchiv nicht erreichbar: {e}"}), 502
+    if response.get("type") == "error": return jsonify({"success": False, "message": response.get("message")}), 404
+    return jsonify({"success": True, "replays": response.get("replays", [])})
+
+@app.route('/replay/<archive_id>', methods=['GET'])
+def replay_stream_route(archive_id):
+    """
+    Streamt ein archiviertes Spiel als NDJSON: erste Zeile der Kopf (Spieler, Zeitleiste), danach ein Block pro Zeile.
+    Jeder Block wird erst vom Server geholt, wenn der vorige an den Browser gegangen ist.
+    """
+    try:
+        replay_sock = socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=REPLAY_SOCKET_TIMEOUT_SECONDS)
+    except OSError as e:
+        return jsonify({"success": False, "message": f"Spielarchiv nicht erreichbar: {e}"}), 502
+    frame_decoder = FrameDecoder(FRAMING_NEWLINE)
+    try:
+        first_chunk = _replay_request(replay_sock, frame_decoder, {"action": "GET_REPLAY", "archive_id": archive_id, "cursor": 0})
+    except (OSError, ValueError) as e:
+        replay_sock.close()
+        return jsonify({"success": False, "message": f"Wiedergabe fehlgeschlagen: {e}"}), 502
+    if first_chunk.get("type") == "error":
+        replay_sock.close()
+        return jsonify({"success": False, "message": first_chunk.get("message")}), 404
+
+    def generate_chunks():
+        chunk = first_chunk
+        try:
+            while True:
+                yield json.dumps(chunk) + "\n"
+                if chunk.get("type") != "replay_chunk" or chunk.get("next_cursor") is None: return
+                chunk = _replay_request(replay_sock, frame_decoder, {"action": "GET_REPLAY", "archive_id": archive_id, "cursor": chunk["next_cursor"]})
+        except (OSError, ValueError) as e:
+            print(f"CLIENT FLASK (Replay): Wiedergabe von {archive_id} abgebrochen: {e}")
+            yield json.dumps({"type": "error", "message": f"Wiedergabe abgebrochen: {e}"}) + "\n"
+        finally:
+            replay_sock.close()
+    return Response(generate_chunks(), mimetype='application/x-ndjson')
 
 @app.route('/force_server_reset_from_ui', methods=['POST'])
 def force_server_reset_route():
@@ -787,7 +944,7 @@ def force_server_reset_route():
     # Reset-Befehl in die Offline-Warteschlange legen
     with client_data_lock:
         reset_action = {
-            "action_for_server": {"action": "FORCE_SERVER_RESET_FROM_CLIENT"},
+            "action_for_server": {"action": "FORCE_SERVER_RESET_FROM_CLIENT", "room_id": client_view_data.get("room_id")}, # Setzt nur den eigenen Raum zurück
             "ui_message_on_cache": f"Reset-Befehl für {server_address} in Warteschlange..."
         }
         client_view_data["offline_action_queue"].clear() 
@@ -825,7 +982,7 @@ def leave_game_and_go_to_join_screen_route():
             "user_has_initiated_connection": False, # WICHTIG: Stoppt weitere Verbindungsversuche
             "player_id": None, "player_name": None, "role": None, # IMMEDIATE RESET
             "confirmed_for_lobby": False, "player_is_ready": False, "player_status": "active",
-            "current_task": None, "hider_leaderboard": [], "hider_locations": {},
+            "current_task": None, "hider_leaderboard": [], "hider_locations": {}, "nearest_hider_hint": None,
             "game_message": None, "error_message": None, "join_error": None, # Alte Nachrichten/Fehler löschen
             "hider_location_update_imminent": False,
             "early_end_requests_count": 0, "total_active_players_for_early_end": 0,
@@ -880,6 +1037,7 @@ def leave_game_and_go_to_join_screen_route():
 if __name__ == '__main__':
     # Initialisiere traceback für bessere Fehlermeldungen in Threads
     import traceback
+    gamelog.install(CLIENT_LOG_LEVEL, CLIENT_LOG_RATE_LIMIT) # print() schreibt ab hier über den Thread "log-writer" (Termux-Terminal ist langsam)
     print("CLIENT: Initialisiere Client...")
 
     with client_data_lock:
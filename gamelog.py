@@ -0,0 +1,194 @@
+# gamelog.py
+# Asynchrone Protokollierung für Server und Client: Stufen, Ratenlimit pro Kategorie, begrenzter Puffer, Schreib-Thread.
+#
+# install() ersetzt sys.stdout: jede print()-Zeile (auch unter einem Raum-Lock) wird nur noch eingeordnet und in einen
+# Puffer gelegt, geschrieben wird im Thread "log-writer". Stufe und Kategorie ergeben sich aus dem üblichen Zeilenanfang
+# ("SERVER SAFE_SEND (COMM ERROR): ..." -> Kategorie "SERVER SAFE_SEND", Stufe ERROR); log() nimmt beides explizit.
+# Unter Last blockiert nichts: Über dem Ratenlimit einer Kategorie und bei vollem Puffer werden Zeilen verworfen und
+# alle LOG_SUMMARY_INTERVAL_SECONDS als Zusammenfassung gemeldet. Fehlerzeilen unterliegen keinem Ratenlimit.
+# stderr (z.B. traceback.print_exc()) bleibt unverändert.
+import atexit
+import queue
+import re
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARN", ERROR: "ERROR"}
+LEVELS_BY_NAME = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+LOG_BUFFER_MAX_RECORDS = 5000 # Darüber werden neue Zeilen verworfen statt zu warten
+LOG_RATE_LIMIT_PER_SECOND = 50 # Zeilen pro Sekunde und Kategorie (Stoßreserve ebenso groß); 0 = unbegrenzt
+LOG_SUMMARY_INTERVAL_SECONDS = 5 # So oft werden verworfene Zeilen zusammengefasst gemeldet
+LOG_WRITE_BATCH_RECORDS = 500 # Höchstens so viele Zeilen pro write() auf den eigentlichen Ausgabestrom
+
+_CATEGORY_PATTERN = re.compile(r"^\s*(?:!+\s*)?([A-Z][A-Z0-9_ ]{1,40}?)\s*(?:\(([^)]*)\))?\s*:")
+
+
+def classify_line(line):
+    """(Stufe, Kategorie) einer print()-Zeile nach dem Muster "KATEGORIE (ZUSATZ): Text"."""
+    match = _CATEGORY_PATTERN.match(line)
+    category = match.group(1).strip() if match else "OTHER"
+    head = line[:match.end()] if match else line[:60]
+    if "ERROR" in head or "FATAL" in head or line.lstrip().startswith("!!!"):
+        return ERROR, category
+    if "WARN" in head or "DENIED" in head:
+        return WARNING, category
+    return INFO, category
+
+
+class AsyncLogWriter:
+    def __init__(self, stream, min_level=INFO, rate_limit_per_second=LOG_RATE_LIMIT_PER_SECOND,
+                 max_records=LOG_BUFFER_MAX_RECORDS, summary_interval=LOG_SUMMARY_INTERVAL_SECONDS):
+        self.stream = stream
+        self.min_level = min_level
+        self.rate_limit_per_second = rate_limit_per_second
+        self.summary_interval = summary_interval
+        self._records = queue.Queue(maxsize=max_records)
+        self._lock = threading.Lock() # Schützt nur Ratenlimit und Zähler
+        self._buckets = {} # Kategorie -> [Guthaben, letzte Auffüllung]
+        self._suppressed = {} # Kategorie -> über dem Ratenlimit verworfen (seit der letzten Zusammenfassung)
+        self._overflowed = {} # Kategorie -> bei vollem Puffer verworfen
+        self.dropped_total = 0
+        self._closed = False
+        self._writer_thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._writer_thread.start()
+
+    def enabled_for(self, level):
+        return level >= self.min_level
+
+    def log(self, level, category, message):
+        """Ordnet eine Zeile ein, ohne je zu blockieren. Gibt False zurück, wenn sie gefiltert oder verworfen wurde."""
+        if level < self.min_level: return False
+        now = time.time()
+        if level < ERROR and self.rate_limit_per_second and not self._take_token(category, now):
+            return False
+        try:
+            self._records.put_nowait((now, level, message))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._overflowed[category] = self._overflowed.get(category, 0) + 1
+                self.dropped_total += 1
+            return False
+
+    def _take_token(self, category, now):
+        with self._lock:
+            bucket = self._buckets.get(category)
+            if bucket is None:
+                bucket = self._buckets[category] = [self.rate_limit_per_second, now]
+            bucket[0] = min(self.rate_limit_per_second, bucket[0] + (now - bucket[1]) * self.rate_limit_per_second)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            self._suppressed[category] = self._suppressed.get(category, 0) + 1
+            self.dropped_total += 1
+            return False
+
+    def _summary_lines(self, now):
+        with self._lock:
+            suppressed, self._suppressed = self._suppressed, {}
+            overflowed, self._overflowed = self._overflowed, {}
+        lines = []
+        for category in sorted(set(suppressed) | set(overflowed)):
+            parts = []
+            if suppressed.get(category): parts.append(f"{suppressed[category]} über dem Ratenlimit")
+            if overflowed.get(category): parts.append(f"{overflowed[category]} bei vollem Puffer")
+            lines.append(self._format(now, WARNING, f"LOG: {', '.join(parts)} verworfen (Kategorie {category})."))
+        return lines
+
+    @staticmethod
+    def _format(timestamp, level, message):
+        return f"{time.strftime('%H:%M:%S', time.localtime(timestamp))}.{int(timestamp * 1000) % 1000:03d} {LEVEL_NAMES.get(level, level):<5} {message}\n"
+
+    def _run(self):
+        next_summary_time = time.time() + self.summary_interval
+        while True:
+            lines = []
+            try:
+                record = self._records.get(timeout=max(0.05, next_summary_time - time.time()))
+                if record is None: # Signal von close()
+                    self._closed = True
+                else:
+                    lines.append(self._format(*record))
+                while len(lines) < LOG_WRITE_BATCH_RECORDS:
+                    record = self._records.get_nowait()
+                    if record is None: self._closed = True; continue
+                    lines.append(self._format(*record))
+            except queue.Empty:
+                pass
+            now = time.time()
+            if now >= next_summary_time or self._closed:
+                lines.extend(self._summary_lines(now))
+                next_summary_time = now + self.summary_interval
+            if lines:
+                try:
+                    self.stream.write("".join(lines))
+                    self.stream.flush()
+                except (OSError, ValueError): # Ausgabe geschlossen (z.B. Terminal weg): Protokoll geht verloren, Spiel läuft weiter
+                    pass
+            if self._closed and self._records.empty(): return
+
+    def close(self, timeout=2.0):
+        """Schreibt den Puffer noch aus (z.B. bei Programmende) und beendet den Schreib-Thread."""
+        if not self._writer_thread.is_alive(): return
+        try:
+            self._records.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer_thread.join(timeout)
+
+
+class _PrintCapture:
+    """Ersatz für sys.stdout: sammelt print()-Ausgaben pro Thread zu ganzen Zeilen und gibt sie an den AsyncLogWriter."""
+    def __init__(self, writer, original_stream):
+        self._writer = writer
+        self._original_stream = original_stream
+        self._local = threading.local()
+
+    def write(self, text):
+        pending = getattr(self._local, "pending", "") + text
+        if "\n" not in pending:
+            self._local.pending = pending; return len(text)
+        *lines, self._local.pending = pending.split("\n")
+        for line in lines:
+            if not line.strip(): continue
+            level, category = classify_line(line)
+            self._writer.log(level, category, line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    @property
+    def encoding(self):
+        return getattr(self._original_stream, "encoding", "utf-8")
+
+
+_writer = None
+
+def install(min_level=INFO, rate_limit_per_second=LOG_RATE_LIMIT_PER_SECOND, stream=None):
+    """Leitet print() über den asynchronen Schreib-Thread um (einmal pro Prozess). Gibt den AsyncLogWriter zurück."""
+    global _writer
+    if _writer is not None: return _writer
+    original_stream = stream or sys.stdout
+    _writer = AsyncLogWriter(original_stream, min_level, rate_limit_per_second)
+    sys.stdout = _PrintCapture(_writer, original_stream)
+    atexit.register(_writer.close)
+    return _writer
+
+def log(level, category, message):
+    """Protokollzeile mit expliziter Stufe. Ohne install() wie bisher per print (DEBUG dann nicht)."""
+    if _writer is None:
+        if level >= INFO: print(f"{category}: {message}")
+        return
+    _writer.log(level, category, f"{category}: {message}")
+
+def enabled_for(level):
+    """Für teure Meldungen: vorher prüfen, ob die Stufe überhaupt ausgegeben wird."""
+    return level >= (_writer.min_level if _writer is not None else INFO)
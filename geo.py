@@ -0,0 +1,242 @@
+# geo.py
+# Entfernungen auf der Erdoberfläche und ein Raster-Index über Spielerstandorte.
+#
+# SpatialGrid teilt die Welt in Zellen von cell_meters x cell_meters Grad-Ausdehnung (in Nord-Süd-Richtung etwa
+# cell_meters Meter, in Ost-West-Richtung zu den Polen hin schmaler). Eine Umkreissuche betrachtet nur die Zellen, die
+# den Kreis überdecken, statt aller Standorte; die exakte Entfernung (Haversine) wird nur für deren Inhalt berechnet.
+# Über die Datumsgrenze (±180° Länge) hinweg wird nicht gesucht, für Spiele innerhalb einer Stadt unerheblich.
+#
+# Wie das Spielerverzeichnis nicht threadsicher: nur unter room.lock benutzen.
+#
+# pairs_within_meters prüft dagegen alle Paare zweier Punktmengen auf einmal (z.B. alle Seeker gegen alle Hider für das
+# automatische Fangen): in reinem Python über nach Breite sortierte Punkte, bei vielen Kandidaten mit NumPy als eine
+# Matrix-Rechnung (falls installiert).
+#
+# LocationTrack speichert die Standortverläufe (für Replays und Seeker-Spuren) mit fester Obergrenze pro Spieler.
+import bisect
+import math
+from array import array
+
+try:
+    import numpy # Optional, z.B. per "pip install numpy"; beschleunigt pairs_within_meters
+except ImportError:
+    numpy = None
+
+EARTH_RADIUS_METERS = 6371008.8 # Mittlerer Erdradius
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_METERS / 180
+DEFAULT_GRID_CELL_METERS = 100 # Etwa die Größenordnung der Abfragen (Fangen, Heiß/Kalt-Hinweise)
+LOCATION_TRACK_CAPACITY = 720 # Punkte pro Spieler (z.B. 1 h bei einem Punkt alle 5 s), danach werden die ältesten überschrieben
+LOCATION_TRACK_MIN_METERS = 10 # Ein neuer Punkt wird gespeichert, wenn er so weit vom letzten gespeicherten entfernt ist ...
+LOCATION_TRACK_MIN_SECONDS = 30 # ... oder so viel Zeit seit dem letzten gespeicherten vergangen ist
+NUMPY_MIN_CANDIDATE_PAIRS = 2000 # pairs_within_meters: ab so vielen Kandidatenpaaren lohnt sich NumPy (gemessen mit 50 x 200 Punkten)
+
+
+def _finite_float(value):
+    """value als float, wenn es eine endliche Zahl ist (keine bool, kein NaN/Infinity, das json.loads durchlässt), sonst None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)): return None
+    try:
+        value = float(value)
+    except OverflowError: # Sehr große int
+        return None
+    return value if math.isfinite(value) else None
+
+def parse_fix(lat, lon, accuracy=None):
+    """
+    (lat, lon, accuracy) als floats (accuracy kann None bleiben), wenn das ein verwertbarer Standort ist: endliche
+    Zahlen, Breite in ±90°, Länge in ±180°, Genauigkeit None oder >= 0. Sonst None.
+    """
+    lat, lon = _finite_float(lat), _finite_float(lon)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180): return None
+    if accuracy is not None:
+        accuracy = _finite_float(accuracy)
+        if accuracy is None or accuracy < 0: return None
+    return lat, lon, accuracy
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Großkreis-Entfernung in Metern zwischen zwei Punkten (Grad)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    sin_dphi = math.sin((phi2 - phi1) / 2)
+    sin_dlambda = math.sin(math.radians(lon2 - lon1) / 2)
+    a = sin_dphi * sin_dphi + math.cos(phi1) * math.cos(phi2) * sin_dlambda * sin_dlambda
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialGrid:
+    """key -> (lat, lon), gruppiert nach Rasterzellen; Abfragen nach Umkreis und nächstem Punkt."""
+    def __init__(self, cell_meters=DEFAULT_GRID_CELL_METERS):
+        self.cell_meters = cell_meters
+        self.cell_degrees = cell_meters / METERS_PER_DEGREE_LAT
+        self._cells = {} # (Zeile, Spalte) -> {key: (lat, lon)}
+        self._positions = {} # key -> (lat, lon, Zelle)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _cell_of(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    # --- Änderungen ---
+    def update(self, key, lat, lon):
+        cell = self._cell_of(lat, lon)
+        old = self._positions.get(key)
+        if old is not None and old[2] != cell: self._discard_from_cell(key, old[2])
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._positions[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        old = self._positions.pop(key, None)
+        if old is not None: self._discard_from_cell(key, old[2])
+
+    def clear(self):
+        self._cells.clear()
+        self._positions.clear()
+
+    def _discard_from_cell(self, key, cell):
+        members = self._cells.get(cell)
+        if members is None: return
+        members.pop(key, None)
+        if not members: del self._cells[cell]
+
+    def position(self, key):
+        """(lat, lon) oder None."""
+        entry = self._positions.get(key)
+        return None if entry is None else entry[:2]
+
+    # --- Abfragen ---
+    def within(self, lat, lon, radius_meters, accept=None):
+        """[(Entfernung in Metern, key)] aller Punkte im Umkreis, nächster zuerst. accept(key) filtert (z.B. nur aktive Hider)."""
+        lat_span = radius_meters / METERS_PER_DEGREE_LAT
+        pole_side_cos = math.cos(math.radians(min(90.0, abs(lat) + lat_span))) # Zellen sind am polnahen Rand am schmalsten
+        lon_span = 360.0 if pole_side_cos < 1e-6 else min(360.0, lat_span / pole_side_cos)
+        min_row, min_col = self._cell_of(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell_of(lat + lat_span, lon + lon_span)
+        candidate_cells = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if candidate_cells > len(self._cells): # Großer Radius: lieber nur die belegten Zellen durchgehen
+            cells = [members for (row, col), members in self._cells.items() if min_row <= row <= max_row and min_col <= col <= max_col]
+        else:
+            cells = [members for members in (self._cells.get((row, col)) for row in range(min_row, max_row + 1)
+                                              for col in range(min_col, max_col + 1)) if members]
+        found = []
+        for members in cells:
+            for key, (other_lat, other_lon) in members.items():
+                if accept is not None and not accept(key): continue
+                distance = haversine_meters(lat, lon, other_lat, other_lon)
+                if distance <= radius_meters: found.append((distance, key))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(self, lat, lon, accept=None, max_meters=None):
+        """(Entfernung in Metern, key) des nächsten Punkts oder None. Sucht mit wachsendem Radius, nahe Treffer sind billig."""
+        radius = self.cell_meters
+        while True:
+            if max_meters is not None: radius = min(radius, max_meters)
+            found = self.within(lat, lon, radius, accept)
+            if found: return found[0]
+            if (max_meters is not None and radius >= max_meters) or radius >= math.pi * EARTH_RADIUS_METERS:
+                return None # Ganze Erde (bzw. max_meters) durchsucht
+            radius *= 4
+
+
+def pairs_within_meters(lats_a, lons_a, lats_b, lons_b, radius_meters, use_numpy=None):
+    """
+    [(i, j, Entfernung in Metern)] aller Paare aus Punkt i der Menge a und Punkt j der Menge b, die höchstens
+    radius_meters auseinander liegen, nach (i, j) sortiert.
+    use_numpy=None entscheidet nach dem Breitenstreifen-Vorfilter: bei wenigen Kandidatenpaaren (kleiner Radius, typisch
+    fürs Fangen) ist reines Python schneller als die volle Matrix, ab NUMPY_MIN_CANDIDATE_PAIRS rechnet NumPy (falls installiert).
+    """
+    if not lats_a or not lats_b: return []
+    if use_numpy: return _pairs_within_numpy(lats_a, lons_a, lats_b, lons_b, radius_meters)
+    # Punkte aus b nach Breite sortiert: pro Punkt aus a kommen nur die im passenden Breitenstreifen in Frage
+    order_b = sorted(range(len(lats_b)), key=lats_b.__getitem__)
+    sorted_lats_b = [lats_b[j] for j in order_b]
+    lat_span = radius_meters / METERS_PER_DEGREE_LAT
+    windows = [(bisect.bisect_left(sorted_lats_b, lat - lat_span), bisect.bisect_right(sorted_lats_b, lat + lat_span)) for lat in lats_a]
+    if use_numpy is None and numpy is not None and sum(end - start for start, end in windows) >= NUMPY_MIN_CANDIDATE_PAIRS:
+        return _pairs_within_numpy(lats_a, lons_a, lats_b, lons_b, radius_meters)
+    pairs = []
+    for i, ((start, end), lat, lon) in enumerate(zip(windows, lats_a, lons_a)):
+        pole_side_cos = math.cos(math.radians(min(90.0, abs(lat) + lat_span)))
+        lon_span = 360.0 if pole_side_cos < 1e-6 else lat_span / pole_side_cos
+        for j in order_b[start:end]:
+            if abs(lons_b[j] - lon) > lon_span: continue
+            distance = haversine_meters(lat, lon, lats_b[j], lons_b[j])
+            if distance <= radius_meters: pairs.append((i, j, distance))
+    pairs.sort(key=lambda pair: (pair[0], pair[1]))
+    return pairs
+
+
+def _pairs_within_numpy(lats_a, lons_a, lats_b, lons_b, radius_meters):
+    phi_a = numpy.radians(numpy.asarray(lats_a, dtype=float))[:, None]
+    phi_b = numpy.radians(numpy.asarray(lats_b, dtype=float))[None, :]
+    lambda_a = numpy.radians(numpy.asarray(lons_a, dtype=float))[:, None]
+    lambda_b = numpy.radians(numpy.asarray(lons_b, dtype=float))[None, :]
+    a = numpy.sin((phi_b - phi_a) / 2) ** 2 + numpy.cos(phi_a) * numpy.cos(phi_b) * numpy.sin((lambda_b - lambda_a) / 2) ** 2
+    distances = 2 * EARTH_RADIUS_METERS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+    rows, cols = numpy.nonzero(distances <= radius_meters)
+    return list(zip(rows.tolist(), cols.tolist(), distances[rows, cols].tolist()))
+
+
+class LocationTrack:
+    """
+    Ringpuffer der letzten Standorte eines Spielers: je Punkt (timestamp, lat, lon, accuracy) in einem array('d'),
+    accuracy NaN für "unbekannt". add() ist O(1); der Puffer wächst bis capacity Punkte und überschreibt dann den
+    ältesten. Ausgedünnt wird beim Einfügen: ein Punkt zählt nur, wenn er mindestens min_meters vom zuletzt gespeicherten
+    entfernt ist oder seitdem mindestens min_seconds vergangen sind (beide 0 = jeden Punkt speichern).
+    """
+    __slots__ = ("capacity", "min_meters", "min_seconds", "_values", "_next", "_count")
+    FIELDS_PER_POINT = 4
+
+    def __init__(self, capacity=LOCATION_TRACK_CAPACITY, min_meters=LOCATION_TRACK_MIN_METERS, min_seconds=LOCATION_TRACK_MIN_SECONDS):
+        self.capacity = capacity
+        self.min_meters = min_meters
+        self.min_seconds = min_seconds
+        self._values = array("d") # Wächst bis capacity * FIELDS_PER_POINT, danach fester Speicher
+        self._next = 0 # Index des nächsten zu schreibenden Punkts
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def copy(self):
+        """Unabhängige Kopie mit denselben Punkten und Einstellungen."""
+        track = LocationTrack(self.capacity, self.min_meters, self.min_seconds)
+        track._values, track._next, track._count = array("d", self._values), self._next, self._count
+        return track
+
+    def add(self, timestamp, lat, lon, accuracy=None):
+        """Speichert den Punkt, sofern er nicht der Ausdünnung zum Opfer fällt. Gibt zurück, ob er gespeichert wurde."""
+        if self._count:
+            last_timestamp, last_lat, last_lon, _ = self._point(self._count - 1)
+            if timestamp - last_timestamp < self.min_seconds and haversine_meters(last_lat, last_lon, lat, lon) < self.min_meters:
+                return False
+        point = (timestamp, lat, lon, math.nan if accuracy is None else accuracy)
+        offset = self._next * self.FIELDS_PER_POINT
+        if offset == len(self._values): self._values.extend(point) # Noch nicht voll: anhängen
+        else: self._values[offset:offset + self.FIELDS_PER_POINT] = array("d", point)
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def _point(self, position):
+        """Punkt Nummer position (0 = ältester) als (timestamp, lat, lon, accuracy oder None)."""
+        index = (self._next - self._count + position) % self.capacity
+        offset = index * self.FIELDS_PER_POINT
+        timestamp, lat, lon, accuracy = self._values[offset:offset + self.FIELDS_PER_POINT]
+        return timestamp, lat, lon, None if math.isnan(accuracy) else accuracy
+
+    def points(self, since=None):
+        """[(timestamp, lat, lon, accuracy)] ältester zuerst; mit since nur Punkte ab diesem Zeitpunkt."""
+        result = [self._point(position) for position in range(self._count)]
+        if since is not None: result = result[bisect.bisect_left(result, (since,)):]
+        return result
+
+    def last(self):
+        return self._point(self._count - 1) if self._count else None
+
+    def clear(self):
+        self._values = array("d")
+        self._next = self._count = 0
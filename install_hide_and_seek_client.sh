@@ -115,6 +115,12 @@ else
     handle_error "'pip' wurde nicht gefunden. Da stimmt was mit der Python-Installation nicht."
 fi
 echo -e "${GREEN}Flask erfolgreich installiert! Fast geschafft!${NC}"
+# Optional: msgpack macht die Spiel-Updates kleiner (spart mobile Daten). Ohne msgpack läuft das Spiel genauso.
+if command -v pip &> /dev/null; then
+    pip install msgpack || echo -e "${YELLOW}msgpack konnte nicht installiert werden (optional, das Spiel funktioniert trotzdem).${NC}"
+elif command -v pip3 &> /dev/null; then
+    pip3 install msgpack || echo -e "${YELLOW}msgpack konnte nicht installiert werden (optional, das Spiel funktioniert trotzdem).${NC}"
+fi
 echo ""
 
 # 4. Start-Skript erstellen (damit du es einfach starten kannst)
@@ -0,0 +1,182 @@
+# journal.py
+# Write-Ahead-Log und Snapshots für die Wiederherstellung der Räume nach einem Absturz des Servers.
+#
+# Aufbau des Journal-Verzeichnisses:
+#   snapshot.json  - vollständiger Stand aller Räume bis einschließlich "seq" (atomar per rename ersetzt)
+#   journal.log    - eine JSON-Zeile pro Änderung eines Raums nach dem Snapshot:
+#                    {"seq": n, "time": t, "room_id": id, "events": [...], "patch": <Patch wie bei game_update_patch>}
+#                    oder {"seq": n, "time": t, "room_id": id, "removed": true}
+# Wiederherstellung: Snapshot laden, dann alle Zeilen mit größerer seq anwenden. Eine beim Absturz nur halb
+# geschriebene letzte Zeile wird ignoriert.
+#
+# Die Spiellogik meldet Änderungen nur per mark_dirty() (ohne I/O, unter einem kleinen eigenen Lock). Der Schreib-Thread
+# holt sich gebündelt alle paar hundert Millisekunden eine Kopie der geänderten Räume, berechnet die Patches gegen den
+# zuletzt geschriebenen Stand und schreibt den ganzen Stapel mit einem write() und einem fsync().
+import copy
+import json
+import os
+import threading
+import time
+import traceback
+from protocol import diff_game_update, apply_game_update_patch
+
+JOURNAL_FLUSH_INTERVAL_SECONDS = 0.25 # Höchstens so viel Spielgeschehen geht bei einem Absturz verloren
+JOURNAL_SNAPSHOT_EVERY_RECORDS = 2000 # Danach wird ein Snapshot geschrieben und das Log neu begonnen
+SNAPSHOT_FILE_NAME = "snapshot.json"
+LOG_FILE_NAME = "journal.log"
+
+
+class GameJournal:
+    """
+    capture_room(room) liefert den zu sichernden Zustand eines Raums als JSON-taugliches Dict (oder None, wenn der Raum
+    nicht mehr existiert); room.room_id identifiziert ihn. Alle anderen Methoden sind threadsicher.
+    """
+    def __init__(self, directory, capture_room, flush_interval=JOURNAL_FLUSH_INTERVAL_SECONDS,
+                 snapshot_every_records=JOURNAL_SNAPSHOT_EVERY_RECORDS, fsync=True):
+        self.directory = directory
+        self.capture_room = capture_room
+        self.flush_interval = flush_interval
+        self.snapshot_every_records = snapshot_every_records
+        self.fsync = fsync
+        self._lock = threading.Lock() # Schützt nur _dirty und _removed
+        self._flush_lock = threading.Lock() # Schreib-Thread und close() schreiben nie gleichzeitig
+        self._dirty = {} # room_id -> (room, [Ereignisse seit dem letzten Schreiben])
+        self._removed = set()
+        self._wakeup = threading.Event()
+        self._states = {} # room_id -> zuletzt geschriebener Zustand (Basis für Patches und Snapshots, nur im Schreib-Thread)
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._log_file = None
+        self._writer_thread = None
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, SNAPSHOT_FILE_NAME)
+
+    @property
+    def log_path(self):
+        return os.path.join(self.directory, LOG_FILE_NAME)
+
+    # --- Wiederherstellung ---
+    def load(self):
+        """Liest Snapshot und Log ein und gibt {room_id: Zustand} zurück. Muss vor start() aufgerufen werden."""
+        started = time.time()
+        states, seq = {}, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            states, seq = snapshot.get("rooms", {}), snapshot.get("seq", 0)
+        applied_records = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        print(f"JOURNAL: Unvollständige Zeile {line_number} in {self.log_path} ignoriert (Absturz beim Schreiben).")
+                        break # Alles danach stammt aus einem abgebrochenen Schreibvorgang
+                    if record.get("seq", 0) <= seq: continue # Bereits im Snapshot enthalten
+                    seq = record["seq"]
+                    if record.get("removed"):
+                        states.pop(record["room_id"], None)
+                    else:
+                        states[record["room_id"]] = apply_game_update_patch(states.get(record["room_id"], {}), record["patch"])
+                    applied_records += 1
+        self._states, self._seq = states, seq
+        self._records_since_snapshot = applied_records
+        print(f"JOURNAL: {len(states)} Räume aus {self.directory} geladen (Snapshot + {applied_records} Log-Einträge, seq {seq}) in {(time.time() - started) * 1000:.0f} ms.")
+        return copy.deepcopy(states) # Der Aufrufer verändert die Zustände; _states muss der geschriebene Stand bleiben
+
+    # --- Aufrufe aus der Spiellogik ---
+    def mark_dirty(self, room, event):
+        """Merkt eine Änderung vor. Kein I/O, daher auch unter dem Raum-Lock unbedenklich."""
+        with self._lock:
+            entry = self._dirty.get(room.room_id)
+            if entry is None:
+                self._dirty[room.room_id] = (room, [event])
+            elif len(entry[1]) < 100: # Bei Dauerfeuer (z.B. Standort-Updates) reicht die Anzahl der ersten Ereignisse
+                entry[1].append(event)
+
+    def room_removed(self, room_id):
+        with self._lock:
+            self._dirty.pop(room_id, None)
+            self._removed.add(room_id)
+        self._wakeup.set()
+
+    # --- Schreib-Thread ---
+    def start(self):
+        """Startet den Schreib-Thread (auch erneut nach close(), z.B. wenn eine Server-Übergabe scheitert)."""
+        self._closed = False
+        self._log_file = open(self.log_path, "ab")
+        if self._log_file.tell() > 0:
+            self.write_snapshot() # Geladenen Stand sichern und Log neu beginnen (auch hinter einer abgebrochenen letzten Zeile)
+        self._writer_thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._writer_thread.start()
+
+    def _run(self):
+        print(f"JOURNAL: Schreib-Thread gestartet ({self.directory}, Bündelung {self.flush_interval * 1000:.0f} ms).")
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._closed: return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"JOURNAL: Fehler beim Schreiben: {e}"); traceback.print_exc()
+                time.sleep(1)
+
+    def close(self):
+        """Schreibt ausstehende Änderungen und beendet den Schreib-Thread (z.B. vor der Übergabe an einen neuen Serverprozess)."""
+        self._closed = True
+        self._wakeup.set()
+        if self._writer_thread: self._writer_thread.join(5) # Ein erneutes start() darf keinen zweiten Schreib-Thread erzeugen
+        with self._flush_lock:
+            self._flush_locked()
+            self._log_file.close()
+
+    def flush(self):
+        """Schreibt alle vorgemerkten Änderungen als einen Stapel."""
+        with self._flush_lock:
+            if not self._log_file.closed: self._flush_locked()
+
+    def _flush_locked(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            removed, self._removed = self._removed, set()
+        now = time.time()
+        records = []
+        for room_id, (room, events) in dirty.items():
+            state = self.capture_room(room) # Nimmt kurz den Raum-Lock für die Kopie, schreibt aber nichts
+            if state is None: continue
+            patch = diff_game_update(self._states.get(room_id, {}), state)
+            if patch is None: continue
+            self._seq += 1
+            self._states[room_id] = state
+            records.append({"seq": self._seq, "time": now, "room_id": room_id, "events": events, "patch": patch})
+        for room_id in removed:
+            if self._states.pop(room_id, None) is None: continue
+            self._seq += 1
+            records.append({"seq": self._seq, "time": now, "room_id": room_id, "removed": True})
+        if not records: return
+        self._log_file.write(b"".join(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n" for record in records))
+        self._log_file.flush()
+        if self.fsync: os.fsync(self._log_file.fileno())
+        self._records_since_snapshot += len(records)
+        if self._records_since_snapshot >= self.snapshot_every_records:
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        """Sichert den zuletzt geschriebenen Stand aller Räume und beginnt ein neues Log (ohne Raum-Locks)."""
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": self._seq, "time": time.time(), "rooms": self._states}, f, separators=(",", ":"))
+            f.flush()
+            if self.fsync: os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path) # Atomar: entweder der alte oder der neue Snapshot
+        # Ein Absturz zwischen replace und dem Kürzen ist harmlos: load() überspringt Einträge mit seq <= Snapshot-seq.
+        self._log_file.close()
+        self._log_file = open(self.log_path, "wb")
+        self._records_since_snapshot = 0
+        print(f"JOURNAL: Snapshot mit {len(self._states)} Räumen geschrieben (seq {self._seq}), Log neu begonnen.")
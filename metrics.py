@@ -0,0 +1,285 @@
+# metrics.py
+# Laufzeit-Metriken des Spielservers (Zähler, Histogramme, beim Abruf berechnete Werte) und ein lokaler HTTP-Endpunkt:
+#   GET /metrics       - Prometheus-Textformat
+#   GET /metrics.json  - dieselben Werte als JSON (Histogramme mit Anzahl, Summe, Mittelwert und Buckets)
+#
+# Eine Messung kostet einen Lock und ein Dict-Update (Histogramme zusätzlich eine Bisektion über wenige Grenzen) und darf
+# daher im echten Spielbetrieb an bleiben. Labels werden als Tupel von Werten übergeben, deren Namen bei describe()
+# festgelegt sind; Aufrufer sorgen selbst für eine begrenzte Anzahl verschiedener Werte (z.B. unbekannte Aktionen -> "other").
+#
+# LockProfiler/InstrumentedLock messen Warte- und Haltezeiten eines Locks je Aufrufstelle (Abschnitt + Funktion:Zeile)
+# und liefern die größten Verursacher als Bericht (GET /locks). Nur bei Bedarf einschalten: jede Sperrung kostet dann
+# einige Mikrosekunden mehr.
+import contextlib
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS_SECONDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+METRICS_BIND_RETRY_SECONDS = 30 # Bei einer Server-Übergabe hält der alte Prozess den Port noch kurz
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._definitions = {} # Name -> (Art, Hilfetext, Label-Namen, Buckets)
+        self._counters = {} # (Name, Label-Werte) -> Wert
+        self._histograms = {} # (Name, Label-Werte) -> [Bucket-Zähler..., +Inf-Zähler, Summe]
+        self._callbacks = {} # Name -> Funktion, liefert eine Zahl oder {Label-Werte: Zahl}
+        self.started = time.time()
+
+    def describe(self, name, kind, help_text, label_names=(), buckets=LATENCY_BUCKETS_SECONDS):
+        """kind: "counter", "histogram" oder "gauge" (nur mit set_callback)."""
+        self._definitions[name] = (kind, help_text, tuple(label_names), tuple(buckets) if kind == "histogram" else ())
+
+    def inc(self, name, amount=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        buckets = self._definitions[name][3]
+        with self._lock:
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            values[bisect_left(buckets, value)] += 1
+            values[-1] += value
+
+    def set_callback(self, name, function):
+        """Messwert, der erst beim Abruf berechnet wird (z.B. verbundene Spieler); kostet zwischen den Abrufen nichts."""
+        self._callbacks[name] = function
+
+    def _samples(self):
+        """[(Name, Art, Hilfetext, Label-Namen, Buckets, [(Label-Werte, Wert), ...]), ...] als konsistente Kopie."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        callback_values = {}
+        for name, function in self._callbacks.items():
+            try:
+                value = function()
+            except Exception as e: # Ein fehlerhafter Messwert darf den Abruf der übrigen nicht verhindern
+                print(f"METRICS: Messwert {name} nicht berechenbar: {e}"); continue
+            callback_values[name] = value if isinstance(value, dict) else {(): value}
+        samples = []
+        for name, (kind, help_text, label_names, buckets) in self._definitions.items():
+            source = histograms if kind == "histogram" else counters
+            if kind == "gauge":
+                series = sorted(callback_values.get(name, {}).items())
+            else:
+                series = sorted((labels, value) for (series_name, labels), value in source.items() if series_name == name)
+            samples.append((name, kind, help_text, label_names, buckets, series))
+        return samples
+
+    def render_prometheus(self):
+        lines = []
+        for name, kind, help_text, label_names, buckets, series in self._samples():
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in series:
+                label_pairs = [f'{label_name}="{_escape_label(label_value)}"' for label_name, label_value in zip(label_names, labels)]
+                if kind != "histogram":
+                    lines.append(f"{full_name}{_format_labels(label_pairs)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), value[:-1]):
+                    cumulative += count
+                    bucket_labels = _format_labels(label_pairs + ['le="%s"' % bound])
+                    lines.append(f"{full_name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{full_name}_sum{_format_labels(label_pairs)} {value[-1]}")
+                lines.append(f"{full_name}_count{_format_labels(label_pairs)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-taugliche Sicht: {Name: Wert} bzw. {Name: {"Label=Wert,...": Wert}} bei Labels."""
+        result = {"uptime_seconds": round(time.time() - self.started, 1)}
+        for name, kind, _, label_names, buckets, series in self._samples():
+            entries = {}
+            for labels, value in series:
+                if kind == "histogram":
+                    count = sum(value[:-1])
+                    value = {"count": count, "sum": round(value[-1], 6), "mean": round(value[-1] / count, 6) if count else None,
+                             "buckets": dict(zip([str(bound) for bound in buckets] + ["+Inf"], value[:-1]))}
+                entries[",".join(f"{label_name}={label_value}" for label_name, label_value in zip(label_names, labels))] = value
+            if not label_names: entries = entries.get("", 0 if kind == "counter" else None)
+            result[self.prefix + name] = entries
+        return result
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(label_pairs):
+    return "{" + ",".join(label_pairs) + "}" if label_pairs else ""
+
+
+class LockProfiler:
+    """
+    Sammelt die Messwerte aller InstrumentedLocks. Die Aufrufstelle ist der per section() gesetzte Abschnitt des Threads
+    (z.B. "action:UPDATE_LOCATION", "tick:running", "broadcast") plus Funktion und Zeile der äußersten Sperrung.
+    Ausgeschaltet liefert new_lock() ein gewöhnliches RLock und section() kostet fast nichts.
+    """
+    def __init__(self, registry=None, enabled=False):
+        self.enabled = enabled
+        self.registry = registry
+        self._local = threading.local()
+        self._site_names = {} # (Abschnitt, Code, Zeile) -> Beschriftung, spart das Formatieren bei jeder Sperrung
+        self._stats_lock = threading.Lock()
+        self._stats = {} # Aufrufstelle -> [Sperrungen, davon mit Warten, Wartezeit, max. Wartezeit, Haltezeit, max. Haltezeit]
+        if registry is not None:
+            registry.describe("lock_wait_seconds", "histogram", "Wartezeit auf einen Raum-Lock je Aufrufstelle", ("site",))
+            registry.describe("lock_hold_seconds", "histogram", "Haltezeit eines Raum-Locks je Aufrufstelle", ("site",))
+
+    def new_lock(self):
+        return InstrumentedLock(self) if self.enabled else threading.RLock()
+
+    def section(self, label):
+        """Kontextmanager: Sperrungen in diesem Thread zählen bis zum Ende des Blocks zum Abschnitt label."""
+        return _LockSection(self._local, label) if self.enabled else contextlib.nullcontext()
+
+    def site(self, frame):
+        key = (getattr(self._local, "section", None), frame.f_code, frame.f_lineno)
+        site = self._site_names.get(key)
+        if site is None:
+            site = self._site_names[key] = f"{key[0] or '-'} @ {frame.f_code.co_name}:{frame.f_lineno}"
+        return site
+
+    def record(self, site, waited, wait_seconds, hold_seconds):
+        with self._stats_lock:
+            stats = self._stats.get(site)
+            if stats is None:
+                stats = self._stats[site] = [0, 0, 0.0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            if waited:
+                stats[1] += 1
+                stats[2] += wait_seconds
+                if wait_seconds > stats[3]: stats[3] = wait_seconds
+            stats[4] += hold_seconds
+            if hold_seconds > stats[5]: stats[5] = hold_seconds
+        if self.registry is not None:
+            self.registry.observe("lock_wait_seconds", wait_seconds, (site,))
+            self.registry.observe("lock_hold_seconds", hold_seconds, (site,))
+
+    def report(self, top=10):
+        """Die größten Verursacher: nach gesamter Wartezeit anderer, gesamter und längster Haltezeit (Zeiten in ms)."""
+        with self._stats_lock:
+            rows = [{"site": site, "acquisitions": stats[0], "contended": stats[1],
+                     "wait_total_ms": round(stats[2] * 1000, 3), "wait_max_ms": round(stats[3] * 1000, 3),
+                     "hold_total_ms": round(stats[4] * 1000, 3), "hold_max_ms": round(stats[5] * 1000, 3),
+                     "hold_mean_ms": round(stats[4] / stats[0] * 1000, 4)} for site, stats in self._stats.items()]
+        return {"enabled": self.enabled,
+                "by_wait_total": sorted(rows, key=lambda row: row["wait_total_ms"], reverse=True)[:top],
+                "by_hold_total": sorted(rows, key=lambda row: row["hold_total_ms"], reverse=True)[:top],
+                "by_hold_max": sorted(rows, key=lambda row: row["hold_max_ms"], reverse=True)[:top]}
+
+
+class _LockSection:
+    __slots__ = ("local", "label", "previous")
+
+    def __init__(self, local, label):
+        self.local, self.label = local, label
+
+    def __enter__(self):
+        self.previous = getattr(self.local, "section", None)
+        self.local.section = self.label
+
+    def __exit__(self, *exc_info):
+        self.local.section = self.previous
+
+
+class InstrumentedLock:
+    """
+    Ersatz für threading.RLock (with, acquire, release). Gemessen wird nur die äußerste Sperrung eines Threads: Wartezeit
+    bis zum Erhalt und Haltezeit bis zur letzten Freigabe. Der Zustand der laufenden Sperrung gehört dem haltenden Thread.
+    """
+    def __init__(self, profiler):
+        self._lock = threading.RLock()
+        self._profiler = profiler
+        self._depth = 0
+        self._site = None
+        self._waited = False
+        self._wait_seconds = 0.0
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        return self._acquire(blocking, timeout, sys._getframe(1))
+
+    def __enter__(self):
+        return self._acquire(True, -1, sys._getframe(1))
+
+    def _acquire(self, blocking, timeout, caller_frame):
+        waited, wait_seconds = False, 0.0
+        if not self._lock.acquire(False):
+            if not blocking: return False
+            wait_started = time.perf_counter()
+            if not self._lock.acquire(True, timeout): return False
+            waited, wait_seconds = True, time.perf_counter() - wait_started
+        self._depth += 1
+        if self._depth == 1:
+            self._site = self._profiler.site(caller_frame)
+            self._waited, self._wait_seconds = waited, wait_seconds
+            self._acquired_at = time.perf_counter()
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth:
+            self._lock.release(); return
+        hold_seconds = time.perf_counter() - self._acquired_at
+        site, waited, wait_seconds = self._site, self._waited, self._wait_seconds
+        self._lock.release()
+        self._profiler.record(site, waited, wait_seconds, hold_seconds) # Außerhalb des Locks
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def start_metrics_http_server(registry, host, port, json_routes=None):
+    """
+    Startet den Endpunkt in einem Daemon-Thread. json_routes: {Pfad: Funktion ohne Argumente} für weitere JSON-Berichte.
+    Ist der Port belegt, wird bis zu METRICS_BIND_RETRY_SECONDS erneut versucht.
+    """
+    json_routes = dict(json_routes or {}, **{"/metrics.json": registry.snapshot})
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                body, content_type = registry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            elif path in json_routes:
+                body, content_type = json.dumps(json_routes[path]()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Abrufe alle paar Sekunden würden das Server-Log fluten
+
+    def serve():
+        give_up_time = time.time() + METRICS_BIND_RETRY_SECONDS
+        while True:
+            try:
+                http_server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+                break
+            except OSError as e:
+                if time.time() >= give_up_time:
+                    print(f"METRICS: Endpunkt auf {host}:{port} nicht verfügbar: {e}. Metriken werden weiter gezählt, aber nicht ausgeliefert."); return
+                time.sleep(1)
+        http_server.daemon_threads = True
+        print(f"METRICS: Endpunkt unter http://{host}:{port}/metrics (und {', '.join(sorted(json_routes))}).")
+        http_server.serve_forever()
+
+    thread = threading.Thread(target=serve, name="metrics-http", daemon=True)
+    thread.start()
+    return thread
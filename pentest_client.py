@@ -4,6 +4,11 @@ import time
 import threading
 import random
 import traceback
+import argparse
+import asyncio
+import math
+from geo import haversine_meters, METERS_PER_DEGREE_LAT
+from protocol import apply_game_update_patch
 
 # Configuration
 SERVER_HOST = "127.0.0.1"
@@ -13,6 +18,22 @@ DEFAULT_RECEIVE_TIMEOUT = 1
 SERVER_RESET_WAIT_TIME = 3
 LARGE_DATA_LENGTH = 10000 # Default length for large data tests
 
+# Load generation (--load)
+LOAD_DURATION_SECONDS = 300
+LOAD_RAMP_PER_SECOND = 100 # New connections per second while ramping up
+LOAD_SEEKER_SHARE = 0.2
+LOAD_LOCATION_INTERVAL_SECONDS = 5 # Like a phone with GPS on, jittered +-50%
+LOAD_READY_DELAY_SECONDS = (5, 10) # Time in the lobby before SET_READY (never before the ramp-up ends, or the first players start alone)
+LOAD_TASK_DELAY_SECONDS = (20, 90) # Hiders "work" on a task for a random time in this range before completing it
+LOAD_CENTER = (52.5200, 13.4050)
+LOAD_AREA_METERS = 800 # Players start within this radius of LOAD_CENTER
+LOAD_HIDER_SPEED_MPS = 1.2
+LOAD_SEEKER_SPEED_MPS = 4.0
+LOAD_CATCH_ATTEMPT_METERS = 40 # Seekers send CATCH_HIDER once they are this close to a hider's last published location
+LOAD_JOIN_TIMEOUT_SECONDS = 15
+LOAD_STREAM_LIMIT_BYTES = 8 * 1024 * 1024 # Full game_updates of big rooms are long lines
+LOAD_REPORT_INTERVAL_SECONDS = 10
+
 # --- Core Utility Functions ---
 def connect_to_server(host, port):
     try:
@@ -548,7 +569,327 @@ def test_large_nickname_join(host, port, nickname_length=2000): # Reduced defaul
     # print("--- Test: JOIN_GAME with Large Nickname Finished ---")
 
 
+# --- Load Generation (asyncio) ---
+def _percentile(sorted_values, fraction):
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def _count(counter, key, amount=1):
+    counter[key] = counter.get(key, 0) + amount
+
+class LoadStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connects = 0; self.connect_failures = 0; self.joins = 0; self.join_failures = 0
+        self.disconnects = 0 # Connection lost unexpectedly (not the server's reset after a game)
+        self.server_errors = 0; self.protocol_errors = 0; self.resyncs = 0
+        self.actions_sent = {}; self.messages_received = {}; self.bytes_received = 0
+        self.latencies = {} # action -> [seconds until the sender received the next game state]
+        self.error_samples = {} # error text -> count
+        self.catch_attempts = 0; self.task_completions = 0; self.games_finished = 0
+
+    def snapshot_line(self):
+        elapsed = time.perf_counter() - self.started
+        sent = sum(self.actions_sent.values()); received = sum(self.messages_received.values())
+        return (f"[{elapsed:6.1f}s] joins {self.joins}/{self.connects} | actions {sent} ({sent / elapsed:.0f}/s) | "
+                f"msgs in {received} ({received / elapsed:.0f}/s, {self.bytes_received / elapsed / 1024:.0f} KiB/s) | "
+                f"disconnects {self.disconnects} | errors {self.server_errors}")
+
+    def report(self, players):
+        elapsed = time.perf_counter() - self.started
+        sent = sum(self.actions_sent.values()); received = sum(self.messages_received.values())
+        result = {
+            "players": players, "elapsed_seconds": round(elapsed, 2),
+            "connects": self.connects, "connect_failures": self.connect_failures, "joins": self.joins, "join_failures": self.join_failures,
+            "disconnects": self.disconnects, "disconnect_rate": round(self.disconnects / max(1, self.connects), 4),
+            "server_errors": self.server_errors, "error_rate": round(self.server_errors / max(1, sent), 4),
+            "protocol_errors": self.protocol_errors, "resyncs": self.resyncs,
+            "actions_sent": dict(self.actions_sent), "actions_per_second": round(sent / elapsed, 1),
+            "messages_received": dict(self.messages_received), "messages_per_second": round(received / elapsed, 1),
+            "bytes_received_per_second": round(self.bytes_received / elapsed),
+            "catch_attempts": self.catch_attempts, "task_completions": self.task_completions, "games_finished": self.games_finished,
+            "latency_ms": {}, "error_samples": dict(sorted(self.error_samples.items(), key=lambda item: -item[1])[:10]),
+        }
+        for action, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result["latency_ms"][action] = {"count": len(values)}
+            for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+                result["latency_ms"][action][name] = round(_percentile(values, fraction) * 1000, 1)
+            result["latency_ms"][action]["max"] = round(values[-1] * 1000, 1)
+        return result
+
+def print_load_report(result):
+    print(f"\n--- Load Report: {result['players']} virtual players, {result['elapsed_seconds']}s ---")
+    print(f"Connections: {result['connects']} ok, {result['connect_failures']} failed | joins {result['joins']}, join failures {result['join_failures']}")
+    print(f"Disconnects: {result['disconnects']} ({result['disconnect_rate'] * 100:.2f}% of connections) | server errors: {result['server_errors']} "
+          f"({result['error_rate'] * 100:.2f}% of actions) | protocol errors: {result['protocol_errors']} | delta resyncs: {result['resyncs']}")
+    print(f"Throughput: {result['actions_per_second']} actions/s sent, {result['messages_per_second']} msgs/s received "
+          f"({result['bytes_received_per_second'] / 1024:.0f} KiB/s)")
+    print(f"Gameplay: {result['task_completions']} tasks completed, {result['catch_attempts']} catch attempts, {result['games_finished']} games finished")
+    print("Latency from action to the next game state received by the sender (ms):")
+    print(f"  {'action':<18} {'count':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for action, row in result["latency_ms"].items():
+        print(f"  {action:<18} {row['count']:>7} {row['p50']:>8} {row['p90']:>8} {row['p99']:>8} {row['max']:>8}")
+    for message, count in result["error_samples"].items():
+        print(f"  error x{count}: {message}")
+
+class VirtualPlayer:
+    """
+    One simulated phone: join, ready, stream locations, complete tasks (hiders) or chase and catch (seekers).
+    After a game the server resets the room and closes all connections; the player then connects and joins again.
+    Latency is measured per action from sending it until this player receives the next game state (game_update,
+    game_update_patch or error): the server answers every action that way, directly or with a (coalesced) broadcast.
+    """
+    def __init__(self, index, role, stats, host, port, room_request, delta_updates, location_interval, ramp_end, deadline):
+        self.index = index; self.role = role; self.stats = stats
+        self.host = host; self.port = port
+        self.room_request = room_request # {"room_id": ...}, {"new_room_name": ...} or {} (main room)
+        self.delta_updates = delta_updates; self.location_interval = location_interval
+        self.ramp_end = ramp_end; self.deadline = deadline
+        self.name = f"Load_{role[0]}{index:05d}"
+        self.room_id = None
+        self.joined = asyncio.Event() # Set once the first join attempt finished (room leaders hand out room_id)
+        bearing = random.uniform(0, 2 * math.pi); distance = LOAD_AREA_METERS * math.sqrt(random.random())
+        self.lat, self.lon = self._offset(LOAD_CENTER[0], LOAD_CENTER[1], distance * math.cos(bearing), distance * math.sin(bearing))
+        self.heading = random.uniform(0, 2 * math.pi)
+        self._reset_session()
+
+    def _reset_session(self):
+        self.writer = None; self.closing = False; self.reset_by_server = False
+        self.player_id = None
+        self.state = None # Last full game_update (delta patches applied)
+        self.seq = None; self.resync_requested = False
+        self.pending = [] # [(action, send time)] not yet answered by a game state
+        self.session_joined = asyncio.Event()
+        self.task_id = None; self.task_due = None; self.game_over_seen = False
+        self.ready_at = max(self.ramp_end, time.monotonic() + random.uniform(*LOAD_READY_DELAY_SECONDS))
+
+    @staticmethod
+    def _offset(lat, lon, north_meters, east_meters):
+        return (lat + north_meters / METERS_PER_DEGREE_LAT,
+                lon + east_meters / (METERS_PER_DEGREE_LAT * max(0.01, math.cos(math.radians(lat)))))
+
+    def send(self, message):
+        if self.writer is None or self.writer.is_closing(): return False
+        action = message["action"]
+        self.writer.write((json.dumps(message) + "\n").encode("utf-8"))
+        _count(self.stats.actions_sent, action)
+        if action != "REQUEST_FULL_SYNC": self.pending.append((action, time.perf_counter()))
+        return True
+
+    def _answer_pending(self):
+        now = time.perf_counter()
+        for action, sent_at in self.pending: self.stats.latencies.setdefault(action, []).append(now - sent_at)
+        self.pending.clear()
+
+    def _on_game_state(self, update):
+        self.state = update
+        if update.get("player_id") and not self.player_id:
+            self.player_id = update["player_id"]; self.room_id = update.get("room_id") or self.room_id
+            self.stats.joins += 1; self.session_joined.set()
+        elif update.get("player_id") is None and "player_id" in update:
+            if self.player_id: self.reset_by_server = True # Reset after a game (or forced); the server closes the socket next
+            elif update.get("join_error"):
+                self.stats.join_failures += 1; _count(self.stats.error_samples, f"join: {update['join_error']}"[:120])
+                self.session_joined.set()
+
+    def _handle_message(self, message):
+        msg_type = message.get("type", "NO_TYPE")
+        _count(self.stats.messages_received, msg_type)
+        if msg_type == "game_update":
+            self.seq = message.get("seq"); self.resync_requested = False
+            self._on_game_state(message); self._answer_pending()
+        elif msg_type == "game_update_patch":
+            if self.state is None or self.seq is None or message.get("seq") != self.seq + 1:
+                if not self.resync_requested:
+                    self.stats.resyncs += 1; self.resync_requested = True
+                    self.send({"action": "REQUEST_FULL_SYNC"})
+                return
+            self.seq = message["seq"]
+            self._on_game_state(apply_game_update_patch(self.state, message.get("patch", {}))); self._answer_pending()
+        elif msg_type == "error":
+            self.stats.server_errors += 1
+            _count(self.stats.error_samples, str(message.get("message"))[:120])
+            self._answer_pending()
+
+    async def _read_loop(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                self.stats.bytes_received += len(line)
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.stats.protocol_errors += 1; continue
+                if isinstance(message, dict): self._handle_message(message)
+                else: self.stats.protocol_errors += 1
+        except (ConnectionError, OSError, ValueError) as e: # ValueError: line longer than LOAD_STREAM_LIMIT_BYTES
+            _count(self.stats.error_samples, f"receive: {type(e).__name__}")
+        if not self.closing and not self.reset_by_server: self.stats.disconnects += 1
+        self.session_joined.set() # Unblock the script if the connection died before the join completed
+
+    def _move(self, seconds):
+        running = ((self.state or {}).get("game_state") or {}).get("status") == "running"
+        target = self._chase_target() if self.role == "seeker" and running else None
+        if target:
+            north = (target[0] - self.lat) * METERS_PER_DEGREE_LAT
+            east = (target[1] - self.lon) * METERS_PER_DEGREE_LAT * math.cos(math.radians(self.lat))
+            self.heading = math.atan2(east, north)
+        else:
+            self.heading += random.uniform(-0.5, 0.5)
+        step = (LOAD_SEEKER_SPEED_MPS if self.role == "seeker" else LOAD_HIDER_SPEED_MPS) * seconds
+        self.lat, self.lon = self._offset(self.lat, self.lon, step * math.cos(self.heading), step * math.sin(self.heading))
+
+    def _chase_target(self):
+        """Closest published hider location; sends CATCH_HIDER once within LOAD_CATCH_ATTEMPT_METERS of it."""
+        hiders = (self.state or {}).get("hider_locations") or {}
+        player_status = (self.state or {}).get("all_players_status") or {}
+        best = None
+        for hider_id, info in hiders.items():
+            if not isinstance(info, dict) or info.get("lat") is None: continue
+            if (player_status.get(hider_id) or {}).get("status", "active") != "active": continue # Already caught by someone else
+            distance = haversine_meters(self.lat, self.lon, info["lat"], info["lon"])
+            if best is None or distance < best[0]: best = (distance, hider_id, info["lat"], info["lon"])
+        if best is None: return None
+        if best[0] <= LOAD_CATCH_ATTEMPT_METERS:
+            if self.send({"action": "CATCH_HIDER", "hider_id_to_catch": best[1]}): self.stats.catch_attempts += 1
+            self.state = dict(self.state, hider_locations={k: v for k, v in hiders.items() if k != best[1]}) # Not again before the next publication
+        return best[2], best[3]
+
+    def _play_step(self):
+        state = self.state or {}
+        status = (state.get("game_state") or {}).get("status")
+        if status == "lobby":
+            if time.monotonic() >= self.ready_at and state.get("confirmed_for_lobby") and not state.get("player_is_ready") and \
+               not any(a == "SET_READY" for a, _ in self.pending):
+                self.send({"action": "SET_READY", "ready_status": True})
+        elif status in ("hider_wins", "seeker_wins"):
+            if not self.game_over_seen: self.stats.games_finished += 1; self.game_over_seen = True
+        elif self.role == "hider" and status == "running" and state.get("player_status") == "active":
+            task = state.get("current_task")
+            if task and task.get("id") != self.task_id:
+                self.task_id = task.get("id"); self.task_due = time.monotonic() + random.uniform(*LOAD_TASK_DELAY_SECONDS)
+            if task and self.task_due and time.monotonic() >= self.task_due:
+                if self.send({"action": "TASK_COMPLETE"}): self.stats.task_completions += 1
+                self.task_due = None
+
+    async def _session(self):
+        """One connection from JOIN_GAME until the deadline or until it closes. Returns True if the player should rejoin."""
+        self._reset_session()
+        try:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=LOAD_STREAM_LIMIT_BYTES)
+        except OSError as e:
+            self.stats.connect_failures += 1; _count(self.stats.error_samples, f"connect: {e}"[:120])
+            return False
+        self.stats.connects += 1
+        read_task = asyncio.create_task(self._read_loop(reader))
+        try:
+            join = {"action": "JOIN_GAME", "name": self.name, "role_preference": self.role, "delta_updates": self.delta_updates}
+            join.update({"room_id": self.room_id} if self.room_id else self.room_request)
+            self.send(join)
+            try:
+                await asyncio.wait_for(self.session_joined.wait(), LOAD_JOIN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.stats.join_failures += 1; _count(self.stats.error_samples, "join: timeout")
+            self.joined.set()
+            if not self.player_id: return False
+            last_move = time.monotonic()
+            while time.monotonic() < self.deadline and not read_task.done():
+                await asyncio.sleep(self.location_interval * random.uniform(0.5, 1.5))
+                now = time.monotonic()
+                self._move(now - last_move); last_move = now
+                self.send({"action": "UPDATE_LOCATION", "lat": round(self.lat, 6), "lon": round(self.lon, 6), "accuracy": random.choice((5, 8, 12, 20))})
+                self._play_step()
+                await self.writer.drain()
+        except (ConnectionError, OSError):
+            pass # Counted by the read loop
+        finally:
+            self.closing = not read_task.done()
+            self.writer.close()
+            await asyncio.gather(read_task, return_exceptions=True)
+            self.joined.set()
+        return self.reset_by_server
+
+    async def run(self):
+        while time.monotonic() < self.deadline and await self._session():
+            await asyncio.sleep(random.uniform(1, 3)) # Like a player pressing "join" again after the reset
+
+async def run_load_test(host, port, players, duration=LOAD_DURATION_SECONDS, ramp_per_second=LOAD_RAMP_PER_SECOND,
+                        seeker_share=LOAD_SEEKER_SHARE, players_per_room=0, delta_updates=True,
+                        location_interval=LOAD_LOCATION_INTERVAL_SECONDS, report_interval=LOAD_REPORT_INTERVAL_SECONDS):
+    """Runs `players` virtual players against host:port for `duration` seconds after the ramp-up and returns the report dict."""
+    stats = LoadStats()
+    ramp_end = time.monotonic() + players / ramp_per_second
+    deadline = ramp_end + duration
+    seeker_every = max(1, round(1 / seeker_share)) if seeker_share > 0 else None
+    tasks = []; room_leaders = {} # group -> VirtualPlayer that created the room
+
+    async def progress():
+        while True:
+            await asyncio.sleep(report_interval); print(stats.snapshot_line())
+    progress_task = asyncio.create_task(progress())
+    try:
+        for index in range(players):
+            role = "seeker" if seeker_every and index % seeker_every == 0 else "hider"
+            room_request = {}
+            if players_per_room > 0:
+                group = index // players_per_room
+                leader = room_leaders.get(group)
+                if leader is None:
+                    room_request = {"new_room_name": f"Load {group}"}
+                else:
+                    await leader.joined.wait() # The rest of the group needs the room_id
+                    room_request = {"room_id": leader.room_id} if leader.room_id else {}
+            player = VirtualPlayer(index, role, stats, host, port, room_request, delta_updates, location_interval, ramp_end, deadline)
+            if players_per_room > 0 and group not in room_leaders: room_leaders[group] = player
+            tasks.append(asyncio.create_task(player.run()))
+            await asyncio.sleep(1 / ramp_per_second)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        progress_task.cancel()
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return stats.report(players)
+
+def run_load_mode(cli_args):
+    print(f"Load mode: {cli_args.load} virtual players against {cli_args.host}:{cli_args.port} for {cli_args.duration}s "
+          f"(ramp {cli_args.ramp}/s, {cli_args.players_per_room or 'all'} per room, delta updates {'on' if not cli_args.no_delta else 'off'})")
+    try:
+        import resource
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit < cli_args.load + 50: print(f"WARNING: open file limit is {soft_limit}; raise it (ulimit -n) for {cli_args.load} connections.")
+    except (ImportError, ValueError, OSError):
+        pass
+    result = asyncio.run(run_load_test(cli_args.host, cli_args.port, cli_args.load, cli_args.duration, cli_args.ramp,
+                                       cli_args.seeker_share, cli_args.players_per_room, not cli_args.no_delta, cli_args.location_interval))
+    print_load_report(result)
+    if cli_args.report_json:
+        with open(cli_args.report_json, "w") as f: json.dump(result, f, indent=2)
+        print(f"Report written to {cli_args.report_json}")
+    return result
+
+
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hide and Seek pentest client (default) and load generator (--load)")
+    arg_parser.add_argument("--host", default=SERVER_HOST)
+    arg_parser.add_argument("--port", type=int, default=SERVER_PORT)
+    arg_parser.add_argument("--load", type=int, default=0, metavar="PLAYERS",
+                            help="Load mode: simulate this many concurrent virtual players instead of running the pentest scenarios")
+    arg_parser.add_argument("--duration", type=float, default=LOAD_DURATION_SECONDS, help="Load mode: seconds to keep playing after the ramp-up")
+    arg_parser.add_argument("--ramp", type=float, default=LOAD_RAMP_PER_SECOND, help="Load mode: new connections per second")
+    arg_parser.add_argument("--seeker-share", type=float, default=LOAD_SEEKER_SHARE, help="Load mode: share of players joining as seekers")
+    arg_parser.add_argument("--players-per-room", type=int, default=0, help="Load mode: create a new room for every N players (0 = all in the main room)")
+    arg_parser.add_argument("--location-interval", type=float, default=LOAD_LOCATION_INTERVAL_SECONDS, help="Load mode: mean seconds between location updates")
+    arg_parser.add_argument("--no-delta", action="store_true", help="Load mode: request full game_updates instead of delta patches")
+    arg_parser.add_argument("--report-json", default=None, help="Load mode: also write the report to this file")
+    cli_args = arg_parser.parse_args()
+    if cli_args.ramp <= 0: arg_parser.error("--ramp must be positive")
+    SERVER_HOST, SERVER_PORT = cli_args.host, cli_args.port
+    if cli_args.load > 0:
+        run_load_mode(cli_args)
+        raise SystemExit(0)
+
     print("Pentest client script - Comprehensive Tests Run")
 
     # Default reduced parameters for full suite run
@@ -0,0 +1,360 @@
+# players.py
+# Spielerverzeichnis eines Raums: kompakte Spieler-Datensätze mit Sekundärindizes.
+#
+# game_data["players"] ist ein PlayerRegistry (dict player_id -> PlayerRecord). Ein PlayerRecord hat feste Felder
+# (__slots__) statt eines dicts pro Spieler; PLAYER_FIELD_DEFAULTS ist die einzige Stelle für Standardwerte, ein
+# defensives .get("feld", standard) ist nicht mehr nötig. Zugriff als Attribut (player.points), für bestehenden Code
+# und den Journal-Export auch wie ein dict (player["points"], player.get("points"), dict(player)).
+#
+# Häufig geschriebene Zahlen (Standort, Zeitstempel, Punkte) liegen nicht im Datensatz, sondern spaltenweise in
+# array-Spalten des Verzeichnisses (PlayerColumns, eine Zeile pro Spieler). Das spart Speicher und erlaubt später
+# Auswertungen über eine ganze Spalte (z.B. alle Hider-Standorte) ohne Python-Objekte pro Wert. Anders als beim dict
+# ist "location" daher ein Tupel (nur als Ganzes zuweisbar) und "points" nimmt nur ganze Zahlen an.
+#
+# Jede Änderung an einem Feld aus INDEXED_PLAYER_FIELDS hält die Indizes sofort aktuell, egal ob über
+# registry[player_id] = {...}, del registry[player_id] oder player.status_ingame = "offline". Abfragen wie "alle aktiven
+# Hider" oder "alle verbundenen Spieler" sind damit Lookups statt Schleifen über alle Spieler. Die Indizes sind dicts
+# (geordnete Mengen), die Reihenfolge der Ergebnisse ist also reproduzierbar.
+#
+# Ebenso führt das Verzeichnis einen Raster-Index (geo.SpatialGrid) über die zuletzt gemeldeten Standorte; nearby() und
+# nearest() beantworten Umkreis- und Nächster-Spieler-Abfragen, ohne alle Spieler durchzugehen.
+#
+# Für das Journal merkt sich das Verzeichnis, welche Spieler sich seit dem letzten export() geändert haben; export()
+# kopiert nur diese neu und verwendet für alle anderen die vorherigen Kopien.
+#
+# Wie game_data selbst nicht threadsicher: nur unter room.lock benutzen.
+# Ein als dict übergebener Eintrag wird beim Einfügen in einen PlayerRecord kopiert (unbekannte Felder, z.B. aus einem
+# älteren Journal, werden ignoriert); danach nur noch über registry[player_id] ändern, nicht über das ursprüngliche dict.
+import math
+from array import array
+from collections.abc import MutableMapping
+from operator import attrgetter
+from geo import LocationTrack, SpatialGrid, parse_fix
+
+PLAYER_FIELD_DEFAULTS = {
+    "addr": None, "name": "N/A", "original_role": "hider", "current_role": "hider",
+    "location": None, "last_seen": 0.0, "client_conn": None,
+    "confirmed_for_lobby": False, "is_ready": False, "status_ingame": "active",
+    "status_before_offline": "active", "points": 0, "has_pending_location_warning": False,
+    "last_location_update_after_warning": 0.0, "warning_sent_time": 0.0, "last_location_timestamp": 0.0,
+    "task": None, "task_deadline": None, "task_skips_available": 0,
+    "is_waiting_for_lobby": False,
+}
+
+INDEXED_PLAYER_FIELDS = frozenset({"name", "current_role", "original_role", "status_ingame", "client_conn", "confirmed_for_lobby"})
+
+# Zahlenfelder in den array-Spalten (Typcode wie bei array.array). "location" wird auf lat/lon/accuracy verteilt,
+# NaN steht für "kein Standort" bzw. "keine Genauigkeit".
+PLAYER_COLUMNS = {
+    "lat": "d", "lon": "d", "accuracy": "d",
+    "last_seen": "d", "last_location_timestamp": "d", "warning_sent_time": "d", "last_location_update_after_warning": "d",
+    "points": "q",
+}
+_COLUMN_DEFAULTS = {"lat": math.nan, "lon": math.nan, "accuracy": math.nan}
+
+PLAYER_INDEXES = {
+    "connected": lambda p: p.client_conn is not None,
+    "hiders": lambda p: p.current_role == "hider",
+    "seekers": lambda p: p.current_role == "seeker",
+    "active_hiders": lambda p: p.current_role == "hider" and p.status_ingame == "active",
+    "original_hiders": lambda p: p.original_role == "hider",
+    "remaining_hiders": lambda p: p.original_role == "hider" and p.status_ingame == "active", # Gewinnbedingung
+    "lobby_confirmed": lambda p: bool(p.confirmed_for_lobby),
+    "lobby_active": lambda p: bool(p.confirmed_for_lobby) and p.client_conn is not None,
+    "early_end_voters": lambda p: p.status_ingame == "active" and bool(p.confirmed_for_lobby),
+}
+
+
+class PlayerColumns:
+    """Zahlenfelder mehrerer Spieler als array-Spalten; freie Zeilen (entfernte Spieler) werden wiederverwendet."""
+    __slots__ = tuple(PLAYER_COLUMNS) + ("_free_rows",)
+
+    def __init__(self):
+        for field, typecode in PLAYER_COLUMNS.items():
+            setattr(self, field, array(typecode))
+        self._free_rows = []
+
+    def allocate(self):
+        """Gibt eine Zeile mit Standardwerten zurück."""
+        if self._free_rows:
+            row = self._free_rows.pop()
+            for field in PLAYER_COLUMNS:
+                getattr(self, field)[row] = _column_default(field)
+            return row
+        for field in PLAYER_COLUMNS:
+            getattr(self, field).append(_column_default(field))
+        return len(self.points) - 1
+
+    def release(self, row):
+        self._free_rows.append(row)
+
+
+def _column_default(field):
+    return _COLUMN_DEFAULTS.get(field, PLAYER_FIELD_DEFAULTS.get(field, 0))
+
+
+def _whole_number(value):
+    """Punkte sind ganzzahlig; 12.0 (z.B. aus JSON) wird angenommen, 12.5 oder "12" nicht stillschweigend abgeschnitten."""
+    if isinstance(value, int) and not isinstance(value, bool): return value
+    if isinstance(value, float) and value.is_integer(): return int(value)
+    raise ValueError(f"Punkte müssen eine ganze Zahl sein, nicht {value!r}")
+
+
+def _column_field(field, convert=None):
+    """Attribut, dessen Wert in der Spalte field der Spalten des Datensatzes liegt; ohne convert nur lesbar."""
+    column_of = attrgetter(field)
+    def get_value(self):
+        return column_of(self._columns)[self._row]
+    if convert is None: return property(get_value)
+    def set_value(self, value):
+        column_of(self._columns)[self._row] = convert(value)
+        if self._registry is not None: self._registry._changed.add(self._player_id)
+    return property(get_value, set_value)
+
+
+class PlayerRecord(MutableMapping):
+    """
+    Ein Spieler mit den Feldern aus PLAYER_FIELD_DEFAULTS; Attribut- und dict-Zugriff.
+    Felder ohne Spalte sind einfache Slots (schnellster Lesezugriff). Schleifen über viele Spieler, die nur Zahlenfelder
+    brauchen, lesen besser direkt die Spalten (PlayerRegistry.rows), statt pro Spieler die Properties aufzurufen.
+    """
+    __slots__ = tuple(field for field in PLAYER_FIELD_DEFAULTS if field not in PLAYER_COLUMNS and field != "location") \
+                + ("track", "_registry", "_player_id", "_columns", "_row")
+
+    lat = _column_field("lat") # Nur lesbar: ändern über location/record_location, die auch Raster-Index und Journal mitführen
+    lon = _column_field("lon")
+    last_seen = _column_field("last_seen", float)
+    last_location_timestamp = _column_field("last_location_timestamp", float)
+    warning_sent_time = _column_field("warning_sent_time", float)
+    last_location_update_after_warning = _column_field("last_location_update_after_warning", float)
+    points = _column_field("points", _whole_number)
+
+    def __init__(self, fields=None, **kwargs):
+        object.__setattr__(self, "_registry", None)
+        self._player_id = None
+        self._columns = PlayerColumns() # Eigene Spalten, bis der Datensatz in ein Verzeichnis eingefügt wird
+        self._row = self._columns.allocate()
+        self.track = LocationTrack() # Verlauf der Standorte (kein Feld: nicht im Journal, nicht im dict-Export)
+        for field, default in PLAYER_FIELD_DEFAULTS.items():
+            if field not in PLAYER_COLUMNS and field != "location": setattr(self, field, default)
+        for source in (fields or {}, kwargs):
+            for field, value in source.items():
+                if field in PLAYER_FIELD_DEFAULTS: setattr(self, field, value)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if self._registry is not None and name in PLAYER_FIELD_DEFAULTS:
+            self._registry._changed.add(self._player_id)
+            if name in INDEXED_PLAYER_FIELDS: self._registry._reindex(self._player_id, self)
+
+    @property
+    def location(self):
+        """
+        (lat, lon, accuracy) (accuracy kann None sein) oder None, wenn noch kein Standort bekannt ist.
+        Ein Tupel, weil die Werte in den Spalten liegen: ändern nur durch Zuweisen des ganzen Standorts, nicht per location[i] = ...
+        """
+        lat = self._columns.lat[self._row]
+        if math.isnan(lat): return None
+        accuracy = self._columns.accuracy[self._row]
+        return (lat, self._columns.lon[self._row], None if math.isnan(accuracy) else accuracy)
+
+    @location.setter
+    def location(self, value):
+        if value is None:
+            lat, lon, accuracy = math.nan, math.nan, None
+        else:
+            fix = parse_fix(*(tuple(value) + (None,))[:3])
+            if fix is None: raise ValueError(f"Ungültiger Standort: {value!r}") # Vor dem Schreiben: Spalten und Raster bleiben stimmig
+            lat, lon, accuracy = fix
+        self._columns.lat[self._row] = lat
+        self._columns.lon[self._row] = lon
+        self._columns.accuracy[self._row] = math.nan if accuracy is None else accuracy
+        if self._registry is not None:
+            self._registry._changed.add(self._player_id)
+            self._registry._location_changed(self._player_id, self)
+
+    def record_location(self, lat, lon, accuracy, timestamp):
+        """Neuer Standort vom Client: aktueller Standort, Zeitstempel und Eintrag im Verlauf (ausgedünnt, siehe geo.LocationTrack)."""
+        self.location = [lat, lon, accuracy]
+        self.last_location_timestamp = timestamp
+        self.track.add(timestamp, lat, lon, accuracy)
+
+    @property
+    def has_location(self):
+        return not math.isnan(self._columns.lat[self._row])
+
+    def _move_to_columns(self, columns):
+        """Verschiebt die Zahlenfelder in eine Zeile von columns (Einfügen in ein bzw. Entfernen aus einem Verzeichnis)."""
+        row = columns.allocate()
+        for field in PLAYER_COLUMNS:
+            getattr(columns, field)[row] = getattr(self._columns, field)[self._row]
+        self._columns.release(self._row)
+        self._columns, self._row = columns, row
+
+    # --- dict-Zugriff ---
+    def __getitem__(self, field):
+        if field not in PLAYER_FIELD_DEFAULTS: raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in PLAYER_FIELD_DEFAULTS: raise KeyError(f"Unbekanntes Spielerfeld: {field}")
+        setattr(self, field, value)
+
+    def __delitem__(self, field):
+        self[field] = PLAYER_FIELD_DEFAULTS[field] # Felder gibt es immer; "Löschen" setzt den Standardwert
+
+    def __iter__(self):
+        return iter(PLAYER_FIELD_DEFAULTS)
+
+    def __len__(self):
+        return len(PLAYER_FIELD_DEFAULTS)
+
+    def __contains__(self, field):
+        return field in PLAYER_FIELD_DEFAULTS
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in PLAYER_FIELD_DEFAULTS else default
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in PLAYER_FIELD_DEFAULTS}
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),)) # Kopien (copy/pickle) sind einfache dicts ohne Verweis auf das Verzeichnis
+
+    def __repr__(self):
+        return f"<PlayerRecord {self._player_id} {self.to_dict()!r}>"
+
+
+class PlayerRegistry(dict):
+    """player_id -> PlayerRecord mit gemeinsamen Zahlenspalten, den Indizes aus PLAYER_INDEXES und einem Namensindex."""
+    def __init__(self, players=None):
+        super().__init__()
+        self.columns = PlayerColumns()
+        self.locations = SpatialGrid() # player_id -> letzter Standort
+        self._indexes = {index_name: {} for index_name in PLAYER_INDEXES}
+        self._names = {} # Name -> Tupel der player_ids (fast immer genau eine, Tupel sind deutlich kleiner als dicts)
+        self._memberships = {} # player_id -> (Indexnamen, Name), Stand der letzten Indizierung
+        self._changed = set() # Seit dem letzten export() geänderte, hinzugekommene oder entfernte player_ids
+        self._exported = {} # player_id -> Kopie aus dem letzten export()
+        for player_id, entry in (players or {}).items():
+            self[player_id] = entry
+
+    # --- Änderungen ---
+    def __setitem__(self, player_id, entry):
+        if player_id in self: self._detach(player_id)
+        if not isinstance(entry, PlayerRecord):
+            entry = PlayerRecord(entry)
+        elif entry._registry is not None: # Gehört schon zu einem Verzeichnis: kopieren, Standortverlauf mitnehmen
+            source, entry = entry, PlayerRecord(entry)
+            entry.track = source.track.copy()
+        entry._move_to_columns(self.columns)
+        entry._player_id = player_id
+        entry._registry = self
+        super().__setitem__(player_id, entry)
+        self._changed.add(player_id)
+        self._reindex(player_id, entry)
+        self._location_changed(player_id, entry)
+
+    def __delitem__(self, player_id):
+        self._detach(player_id)
+        super().__delitem__(player_id)
+
+    def pop(self, player_id, *default):
+        if player_id in self: self._detach(player_id)
+        return super().pop(player_id, *default)
+
+    def popitem(self):
+        player_id = next(reversed(self))
+        return player_id, self.pop(player_id)
+
+    def clear(self):
+        for player_id in list(self): self._detach(player_id)
+        super().clear()
+
+    def setdefault(self, player_id, default=None):
+        if player_id not in self: self[player_id] = default
+        return self[player_id]
+
+    def update(self, *args, **kwargs):
+        for player_id, entry in dict(*args, **kwargs).items():
+            self[player_id] = entry
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def _detach(self, player_id):
+        entry = super().__getitem__(player_id)
+        entry._registry = entry._player_id = None
+        entry._move_to_columns(PlayerColumns()) # Der entfernte Datensatz bleibt für sich allein benutzbar
+        self._changed.add(player_id)
+        self.locations.remove(player_id)
+        index_names, name = self._memberships.pop(player_id, ((), None))
+        for index_name in index_names:
+            self._indexes[index_name].pop(player_id, None)
+        self._remove_name(player_id, name)
+
+    def _remove_name(self, player_id, name):
+        ids_with_name = tuple(other_id for other_id in self._names.get(name, ()) if other_id != player_id)
+        if ids_with_name: self._names[name] = ids_with_name
+        else: self._names.pop(name, None)
+
+    def _location_changed(self, player_id, entry):
+        if entry.has_location: self.locations.update(player_id, entry.lat, entry.lon)
+        else: self.locations.remove(player_id)
+
+    def _reindex(self, player_id, entry):
+        old_index_names, old_name = self._memberships.get(player_id, ((), None))
+        new_index_names = tuple(index_name for index_name, matches in PLAYER_INDEXES.items() if matches(entry))
+        if new_index_names != old_index_names:
+            for index_name in old_index_names:
+                if index_name not in new_index_names: self._indexes[index_name].pop(player_id, None)
+            for index_name in new_index_names:
+                self._indexes[index_name][player_id] = None
+        new_name = entry.name
+        if new_name != old_name:
+            self._remove_name(player_id, old_name)
+            self._names[new_name] = self._names.get(new_name, ()) + (player_id,)
+        self._memberships[player_id] = (new_index_names, new_name)
+
+    def export(self, copy_entry):
+        """
+        {player_id: copy_entry(PlayerRecord)} in der Reihenfolge des Verzeichnisses, z.B. für das Journal. Neu kopiert
+        werden nur die seit dem letzten Aufruf geänderten Spieler; die übrigen Kopien sind dieselben Objekte wie beim
+        letzten Mal (ein Vergleich per "is" erkennt sie als unverändert) und dürfen daher nicht verändert werden.
+        """
+        for player_id in self._changed:
+            if player_id in self: self._exported[player_id] = copy_entry(super().__getitem__(player_id))
+            else: self._exported.pop(player_id, None)
+        self._changed.clear()
+        return {player_id: self._exported[player_id] for player_id in self}
+
+    # --- Abfragen (Kopien, daher auch beim Ändern während der Schleife sicher) ---
+    def ids(self, index_name):
+        return list(self._indexes[index_name])
+
+    def entries(self, index_name):
+        """[(player_id, PlayerRecord)] aller Spieler im Index."""
+        return [(player_id, super(PlayerRegistry, self).__getitem__(player_id)) for player_id in self._indexes[index_name]]
+
+    def rows(self, index_name):
+        """[(player_id, Zeile in self.columns)] aller Spieler im Index, z.B. für Auswertungen direkt auf den Spalten."""
+        return [(player_id, super(PlayerRegistry, self).__getitem__(player_id)._row) for player_id in self._indexes[index_name]]
+
+    def count(self, index_name):
+        return len(self._indexes[index_name])
+
+    def contains(self, index_name, player_id):
+        return player_id in self._indexes[index_name]
+
+    def ids_with_name(self, name):
+        return list(self._names.get(name, ()))
+
+    def nearby(self, index_name, lat, lon, radius_meters):
+        """[(Entfernung in Metern, player_id)] der Spieler im Index mit Standort im Umkreis, nächster zuerst."""
+        index = self._indexes[index_name]
+        return self.locations.within(lat, lon, radius_meters, accept=index.__contains__)
+
+    def nearest(self, index_name, lat, lon, max_meters=None):
+        """(Entfernung in Metern, player_id) des nächsten Spielers im Index mit bekanntem Standort oder None."""
+        index = self._indexes[index_name]
+        return self.locations.nearest(lat, lon, accept=index.__contains__, max_meters=max_meters)
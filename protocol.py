@@ -0,0 +1,356 @@
+# protocol.py
+# Gemeinsame Protokoll-Bausteine für server.py und client.py.
+import json
+import struct
+import zlib
+
+# --- Framing ---
+# Standard: eine Nachricht pro Zeile ("\n"-getrennt). Optional (pro Verbindung per JOIN_GAME/REJOIN_GAME ausgehandelt):
+# jede Nachricht vom Server mit 4-Byte-Längenpräfix (Big Endian), damit auch Binärdaten übertragen werden können.
+FRAMING_NEWLINE = "newline"
+FRAMING_LENGTH_PREFIXED = "length_prefixed"
+SUPPORTED_FRAMINGS = (FRAMING_NEWLINE, FRAMING_LENGTH_PREFIXED)
+MAX_FRAME_BYTES = 1024 * 1024 # Größere Frames gelten als Protokollfehler (Schutz vor unbegrenztem Puffer)
+_LENGTH_PREFIX = struct.Struct("!I")
+
+
+class FrameTooLargeError(ValueError):
+    """Ein Frame überschreitet die erlaubte Maximalgröße. Die Verbindung sollte danach getrennt werden."""
+
+
+class FrameDecoder:
+    """
+    Inkrementeller Frame-Decoder auf Byte-Ebene.
+    Arbeitet auf einem bytearray, sucht Trennzeichen nur im neu hinzugekommenen Teil und dekodiert
+    erst vollständige Frames (UTF-8-Zeichen, die über zwei recv()-Aufrufe verteilt sind, sind damit kein Problem).
+    Der Modus kann zwischen zwei Frames gewechselt werden (set_mode), der Rest des Puffers wird dann im neuen Modus gelesen.
+    """
+    def __init__(self, mode=FRAMING_NEWLINE, max_frame_bytes=MAX_FRAME_BYTES):
+        if mode not in SUPPORTED_FRAMINGS:
+            raise ValueError(f"Unbekanntes Framing: {mode}")
+        self.mode = mode
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._scan_pos = 0 # Bis hierhin wurde im Zeilenmodus bereits erfolglos nach "\n" gesucht
+
+    def feed(self, data):
+        self._buffer += data
+
+    def set_mode(self, mode):
+        if mode not in SUPPORTED_FRAMINGS:
+            raise ValueError(f"Unbekanntes Framing: {mode}")
+        self.mode = mode
+        self._scan_pos = 0
+
+    def buffered_bytes(self):
+        return len(self._buffer)
+
+    def clear(self):
+        self._buffer.clear()
+        self._scan_pos = 0
+
+    def drain(self):
+        """Gibt alle noch nicht gelesenen Bytes zurück und leert den Puffer (z.B. bei Übergabe der Verbindung an einen anderen Prozess)."""
+        data = bytes(self._buffer)
+        self.clear()
+        return data
+
+    def _take(self, start, end, consumed):
+        with memoryview(self._buffer) as view:
+            frame = bytes(view[start:end])
+        del self._buffer[:consumed] # Löschen am Anfang ist bei bytearray günstig
+        self._scan_pos = 0
+        return frame
+
+    def next_frame(self):
+        """Gibt den nächsten vollständigen Frame (bytes, ohne Trennzeichen/Präfix) zurück oder None."""
+        if self.mode == FRAMING_NEWLINE:
+            newline_index = self._buffer.find(b"\n", self._scan_pos)
+            if newline_index < 0:
+                if len(self._buffer) > self.max_frame_bytes:
+                    raise FrameTooLargeError(f"Zeile ohne Trennzeichen ist länger als {self.max_frame_bytes} Bytes.")
+                self._scan_pos = len(self._buffer)
+                return None
+            if newline_index > self.max_frame_bytes:
+                raise FrameTooLargeError(f"Zeile ist länger als {self.max_frame_bytes} Bytes.")
+            return self._take(0, newline_index, newline_index + 1)
+
+        if len(self._buffer) < _LENGTH_PREFIX.size:
+            return None
+        (frame_length,) = _LENGTH_PREFIX.unpack_from(self._buffer)
+        if frame_length > self.max_frame_bytes:
+            raise FrameTooLargeError(f"Angekündigter Frame ({frame_length} Bytes) ist größer als {self.max_frame_bytes} Bytes.")
+        frame_end = _LENGTH_PREFIX.size + frame_length
+        if len(self._buffer) < frame_end:
+            return None
+        return self._take(_LENGTH_PREFIX.size, frame_end, frame_end)
+
+    def frames(self):
+        """Liefert alle derzeit vollständigen Frames. Bei Moduswechseln zwischen Frames next_frame() direkt verwenden."""
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+
+def encode_frame(payload_bytes, mode=FRAMING_NEWLINE):
+    """Verpackt eine Nachricht für den Versand im angegebenen Framing."""
+    if mode == FRAMING_LENGTH_PREFIXED:
+        return _LENGTH_PREFIX.pack(len(payload_bytes)) + payload_bytes
+    return payload_bytes + b"\n"
+
+
+# --- Delta-Updates (game_update_patch) ---
+# Nach einem vollständigen game_update (mit "seq") schickt der Server nur noch Patches mit fortlaufender "seq".
+# Ein Patch beschreibt die Änderungen eines Dicts:
+#   {"set": {key: neuer_wert}, "del": [key, ...], "sub": {key: <Patch für verschachteltes Dict>}}
+# Leere Teile werden weggelassen. Listen und andere Werte werden immer komplett ersetzt.
+
+def diff_game_update(old, new):
+    """Berechnet den Patch von `old` nach `new` (beides Dicts). Gibt None zurück, wenn sich nichts geändert hat."""
+    patch_set, patch_del, patch_sub = {}, [], {}
+    for key, new_value in new.items():
+        if key not in old:
+            patch_set[key] = new_value
+            continue
+        old_value = old[key]
+        if old_value is new_value:
+            continue # Gemeinsam genutzte Objekte (z.B. aus demselben Broadcast-Snapshot) sind sicher gleich
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            nested_patch = diff_game_update(old_value, new_value)
+            if nested_patch is not None:
+                patch_sub[key] = nested_patch
+        elif old_value != new_value or type(old_value) is not type(new_value):
+            patch_set[key] = new_value
+    for key in old:
+        if key not in new:
+            patch_del.append(key)
+
+    if not (patch_set or patch_del or patch_sub):
+        return None
+    patch = {}
+    if patch_set: patch["set"] = patch_set
+    if patch_del: patch["del"] = patch_del
+    if patch_sub: patch["sub"] = patch_sub
+    return patch
+
+
+def apply_game_update_patch(base, patch):
+    """
+    Wendet einen Patch auf `base` an und gibt ein neues Dict zurück.
+    `base` und seine verschachtelten Dicts werden nicht verändert (Copy-on-Write), damit bereits
+    weitergereichte Teile des alten Zustands (z.B. in client_view_data) stabil bleiben.
+    """
+    result = dict(base)
+    for key in patch.get("del", ()):
+        result.pop(key, None)
+    for key, value in patch.get("set", {}).items():
+        result[key] = value
+    for key, nested_patch in patch.get("sub", {}).items():
+        nested_base = result.get(key)
+        result[key] = apply_game_update_patch(nested_base if isinstance(nested_base, dict) else {}, nested_patch)
+    return result
+
+
+# --- Kodierung (encoding) ---
+# Standard ist JSON mit den normalen Feldnamen. Per JOIN_GAME/REJOIN_GAME ("encoding": [Präferenzliste], "schema": Version)
+# kann eine kompakte Kodierung ausgehandelt werden: Feldnamen werden durch kurze Codes aus einem versionierten Schema ersetzt,
+# häufige Werte (Nachrichtentyp, Status, Anzeigetexte) durch Zahlen. Serialisiert wird mit msgpack (falls installiert,
+# nur mit length_prefixed-Framing, da Binärdaten "\n" enthalten können) oder mit kompaktem JSON.
+ENCODING_JSON = "json"
+ENCODING_COMPACT_JSON = "compact_json"
+ENCODING_COMPACT_MSGPACK = "compact_msgpack"
+
+try:
+    import msgpack # Optional, z.B. per "pip install msgpack"
+except ImportError:
+    msgpack = None
+
+# Reihenfolge = Präferenz des Clients
+SUPPORTED_ENCODINGS = ((ENCODING_COMPACT_MSGPACK,) if msgpack else ()) + (ENCODING_COMPACT_JSON, ENCODING_JSON)
+
+COMPACT_SCHEMA_VERSION = 1
+# Schema-Tabellen pro Version. Einträge NIE ändern oder umsortieren, sondern eine neue Version anlegen.
+# Die Codes (a, b, ..., Z, aa, ...) dürfen nicht mit echten Schlüsseln kollidieren; Spieler-IDs beginnen mit Ziffern.
+COMPACT_SCHEMAS = {
+    1: {
+        "keys": (
+            "type", "seq", "patch", "set", "del", "sub",
+            "player_id", "player_name", "role", "location", "confirmed_for_lobby", "player_is_ready",
+            "player_status", "is_waiting_for_lobby", "game_state", "status", "status_display",
+            "game_time_left", "hider_wait_time_left", "game_over_message", "lobby_players", "name", "is_ready",
+            "all_players_status", "hider_leaderboard", "id", "points", "hider_location_update_imminent",
+            "early_end_requests_count", "total_active_players_for_early_end", "player_has_requested_early_end",
+            "task_skips_available", "current_task", "description", "time_left_seconds", "pre_cached_tasks",
+            "hider_locations", "lat", "lon", "timestamp", "message", "join_error", "error_message",
+            "game_message", "event_name", "framing", "encoding", "schema", "delta_updates",
+        ),
+        # Nur Werte unter diesen Schlüsseln werden durch Zahlen ersetzt (dort kommen nie echte Zahlen vor)
+        "interned_value_keys": ("type", "status", "status_display", "role", "player_status", "event_name"),
+        "values": (
+            "game_update", "game_update_patch", "protocol_ack", "acknowledgement", "error", "game_event",
+            "server_text_notification",
+            "lobby", "hider_wait", "running", "hider_wins", "seeker_wins", "waiting_for_lobby", "disconnected",
+            "active", "caught", "offline", "failed_task", "failed_loc_update", "hider", "seeker",
+            "Lobby - Warten auf Spieler", "Vorbereitung - Hider verstecken sich", "Spiel läuft",
+            "Spiel beendet - Hider gewinnen!", "Spiel beendet - Seeker gewinnen!", "Warten auf nächste Lobby-Runde",
+            "game_started", "hider_location_update_due", "seeker_locations_updated",
+        ),
+    },
+}
+
+
+def _short_code(index):
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    code = ""
+    while True:
+        code = alphabet[index % len(alphabet)] + code
+        index = index // len(alphabet) - 1
+        if index < 0:
+            return code
+
+
+class CompactCodec:
+    """Übersetzt Nachrichten zwischen normalen Feldnamen und den kurzen Codes eines Schemas (beide Richtungen)."""
+    def __init__(self, schema_version=COMPACT_SCHEMA_VERSION):
+        schema = COMPACT_SCHEMAS[schema_version]
+        self.schema_version = schema_version
+        self._key_to_code = {key: _short_code(i) for i, key in enumerate(schema["keys"])}
+        self._code_to_key = {code: key for key, code in self._key_to_code.items()}
+        self._value_to_code = {value: i for i, value in enumerate(schema["values"])}
+        self._code_to_value = dict(enumerate(schema["values"]))
+        self._interned_value_keys = frozenset(schema["interned_value_keys"])
+        # Beim Entpacken stehen die internierten Schlüssel noch als Code in der Nachricht
+        self._interned_value_codes = frozenset(self._key_to_code[key] for key in self._interned_value_keys)
+
+    def pack(self, message):
+        """Ersetzt Feldnamen (und internierte Werte) durch Codes. Gibt ein neues Dict zurück, `message` bleibt unverändert."""
+        key_to_code, value_to_code, interned_keys = self._key_to_code, self._value_to_code, self._interned_value_keys
+        result = {}
+        for key, value in message.items():
+            value_type = type(value)
+            if value_type is dict:
+                value = self.pack(value)
+            elif value_type is list:
+                value = self._pack_list(value)
+            elif value_type is str and key in interned_keys:
+                value = value_to_code.get(value, value)
+            result[key_to_code.get(key, key)] = value
+        return result
+
+    def _pack_list(self, items):
+        return [self.pack(item) if type(item) is dict else self._pack_list(item) if type(item) is list else item for item in items]
+
+    def unpack_pairs(self, pairs):
+        """
+        Gegenstück zu pack() für ein einzelnes Objekt, als object_pairs_hook für json.loads/msgpack.unpackb gedacht:
+        Der Parser ruft den Hook für jedes Objekt auf, ein eigener rekursiver Durchlauf entfällt damit.
+        """
+        code_to_key, code_to_value, interned_codes = self._code_to_key, self._code_to_value, self._interned_value_codes
+        result = {}
+        for code, value in pairs:
+            if type(value) is int and code in interned_codes:
+                value = code_to_value.get(value, value)
+            result[code_to_key.get(code, code)] = value
+        return result
+
+
+_codecs = {}
+_COMPACT_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False) # Einmal anlegen, json.dumps mit Optionen erzeugt sonst jedes Mal einen neuen
+
+def get_compact_codec(schema_version=COMPACT_SCHEMA_VERSION):
+    codec = _codecs.get(schema_version)
+    if codec is None:
+        codec = _codecs[schema_version] = CompactCodec(schema_version)
+    return codec
+
+
+def negotiate_encoding(requested, schema_version, framing):
+    """
+    Wählt die erste vom Client gewünschte Kodierung, die der Server unterstützt.
+    `requested` ist ein Name oder eine Liste in Präferenzreihenfolge. Fällt auf JSON zurück.
+    """
+    candidates = [requested] if isinstance(requested, str) else list(requested or [])
+    for name in candidates:
+        if name == ENCODING_JSON:
+            return name
+        if name not in SUPPORTED_ENCODINGS or schema_version not in COMPACT_SCHEMAS:
+            continue
+        if name == ENCODING_COMPACT_MSGPACK and framing != FRAMING_LENGTH_PREFIXED:
+            continue
+        return name
+    return ENCODING_JSON
+
+
+def encode_message(message, encoding=ENCODING_JSON, schema_version=COMPACT_SCHEMA_VERSION):
+    """Serialisiert eine Nachricht (dict) in der ausgehandelten Kodierung zu bytes (ohne Framing)."""
+    if encoding == ENCODING_JSON:
+        return json.dumps(message).encode('utf-8')
+    packed = get_compact_codec(schema_version).pack(message)
+    if encoding == ENCODING_COMPACT_MSGPACK:
+        return msgpack.packb(packed, use_bin_type=True)
+    return _COMPACT_JSON_ENCODER.encode(packed).encode('utf-8')
+
+
+def decode_message(frame, encoding=ENCODING_JSON, schema_version=COMPACT_SCHEMA_VERSION):
+    """Gegenstück zu encode_message. Fehlerhafte Daten lösen ValueError (bzw. Unterklassen) aus."""
+    if encoding == ENCODING_JSON:
+        return json.loads(frame)
+    unpack_pairs = get_compact_codec(schema_version).unpack_pairs
+    if encoding == ENCODING_COMPACT_MSGPACK:
+        return msgpack.unpackb(frame, raw=False, strict_map_key=False, object_pairs_hook=unpack_pairs)
+    return json.loads(frame, object_pairs_hook=unpack_pairs)
+
+
+# --- Kompression (compression) ---
+# Optional pro Verbindung ("compression": "zlib" bei JOIN_GAME/REJOIN_GAME, nur mit length_prefixed-Framing):
+# Jede Verbindung hat einen eigenen, durchgehenden Deflate-Strom. Jede Nachricht wird mit Z_SYNC_FLUSH abgeschlossen
+# und ist damit sofort dekodierbar, während sich der Kompressor wiederkehrende Schlüssel und Namen aus früheren
+# Nachrichten merkt. Das immer gleiche Sync-Ende (00 00 FF FF) wird wie bei WebSocket permessage-deflate weggelassen.
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+SUPPORTED_COMPRESSIONS = (COMPRESSION_ZLIB, COMPRESSION_NONE)
+ZLIB_COMPRESSION_LEVEL = 6 # 1 = schnell, 9 = klein. Bei kleinen, ähnlichen Nachrichten bringt mehr als 6 kaum etwas
+_SYNC_FLUSH_TAIL = b"\x00\x00\xff\xff"
+
+
+class StreamDecodeError(ValueError):
+    """Der komprimierte Datenstrom ist beschädigt. Die Verbindung muss neu aufgebaut werden."""
+
+
+class StreamCompressor:
+    """Deflate-Kompressor für alle Nachrichten einer Verbindung. Aufrufe müssen in Sende-Reihenfolge erfolgen."""
+    def __init__(self, level=ZLIB_COMPRESSION_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS) # Rohes Deflate ohne zlib-Header
+
+    def compress(self, data):
+        chunk = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return chunk[:-len(_SYNC_FLUSH_TAIL)] if chunk.endswith(_SYNC_FLUSH_TAIL) else chunk
+
+
+class StreamDecompressor:
+    """Gegenstück zu StreamCompressor. Begrenzt die entpackte Größe pro Nachricht (Schutz vor Kompressionsbomben)."""
+    def __init__(self, max_message_bytes=MAX_FRAME_BYTES):
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.max_message_bytes = max_message_bytes
+
+    def decompress(self, chunk):
+        try:
+            data = self._decompressor.decompress(chunk + _SYNC_FLUSH_TAIL, self.max_message_bytes)
+        except zlib.error as e:
+            raise StreamDecodeError(f"Komprimierter Datenstrom beschädigt: {e}") from e
+        if self._decompressor.unconsumed_tail:
+            raise FrameTooLargeError(f"Entpackte Nachricht ist größer als {self.max_message_bytes} Bytes.")
+        return data
+
+
+def negotiate_compression(requested, framing):
+    """Wählt die erste gewünschte Kompression, die der Server unterstützt. Kompression setzt length_prefixed-Framing voraus."""
+    candidates = [requested] if isinstance(requested, str) else list(requested or [])
+    for name in candidates:
+        if name == COMPRESSION_ZLIB and framing == FRAMING_LENGTH_PREFIXED:
+            return name
+        if name == COMPRESSION_NONE:
+            return name
+    return COMPRESSION_NONE
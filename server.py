@@ -1,11 +1,30 @@
 # server.py
 import socket
+import select
+import os
 import threading
+import queue
+import asyncio
+import argparse
+import multiprocessing
 import json
 import time
 import random
+import zlib
+import heapq
+import itertools
+import math
 import traceback # Importiert für detailliertere Fehlermeldungen
 from tasks import TASKS # Annahme: tasks.py existiert und enthält eine Liste von Aufgaben
+from protocol import diff_game_update, encode_frame, FrameDecoder, FrameTooLargeError, FRAMING_NEWLINE, SUPPORTED_FRAMINGS
+from protocol import encode_message, negotiate_encoding, ENCODING_JSON, COMPACT_SCHEMA_VERSION
+from protocol import negotiate_compression, StreamCompressor, COMPRESSION_NONE
+from journal import GameJournal
+from players import PlayerRecord, PlayerRegistry
+from geo import haversine_meters, pairs_within_meters, parse_fix
+from archive import write_game_archive, list_archives, read_replay_block
+from metrics import MetricsRegistry, LockProfiler, start_metrics_http_server
+import gamelog
 
 HOST = '0.0.0.0'
 PORT = 65432
@@ -49,8 +68,190 @@ GAME_STATE_DISPLAY_NAMES = {
 
 INITIAL_TASK_SKIPS = 1 # Anzahl der Aufgaben-Skips, die ein Hider pro Spiel erhält
 
-game_data = {} # Globales Dictionary, das den aktuellen Spielzustand speichert
-data_lock = threading.RLock() # Reentrant Lock für den Zugriff auf game_data
+# Standortbezogene Regeln (Entfernungen über den Raster-Index im Spielerverzeichnis, siehe players.py/geo.py)
+CATCH_MAX_DISTANCE_METERS = None # Fangen nur aus dieser Nähe (plus gemeldete GPS-Ungenauigkeit, höchstens noch einmal so viel); None = ohne Prüfung, per --catch-max-distance
+CATCH_MAX_FIX_AGE_SECONDS = 30 # Ist einer der beiden Standorte älter, wird die Entfernung nicht geprüft (der Fang gilt wie ohne Prüfung)
+HOT_COLD_HINT_BANDS = [(100, "hot"), (300, "warm")] # Seeker-Hinweis nach Entfernung zum nächsten aktiven Hider, darüber "cold"
+AUTO_CATCH_RADIUS_METERS = None # Automatisches Fangen: aktive Hider in diesem Umkreis eines Seekers gelten als gefangen; None = aus, per --auto-catch-radius
+AUTO_CATCH_MAX_FIX_AGE_SECONDS = 15 # Nur Standorte, die höchstens so alt sind, zählen für das automatische Fangen
+
+# Ausgangs-Warteschlangen pro Verbindung: Spiellogik reiht nur ein, das eigentliche Senden passiert außerhalb der Raum-Locks
+OUTBOUND_QUEUE_MAX_MESSAGES = 256 # Thread-Engine: max. wartende Nachrichten, danach gilt der Client als "hängend" und wird getrennt
+OUTBOUND_BUFFER_MAX_BYTES = 1024 * 1024 # asyncio-Engine: max. ungesendete Bytes im Transport-Puffer
+BROADCAST_COALESCE_WINDOW_SECONDS = 0.15 # Höchstens ein gebündelter Voll-Broadcast pro Zeitfenster (Spielstart/-ende gehen sofort raus)
+JOURNAL_DIR = None # Verzeichnis für Write-Ahead-Log und Snapshots (None = keine Absturz-Wiederherstellung), per --journal-dir
+ARCHIVE_DIR = None # Verzeichnis für das Archiv beendeter Spiele (Standortverläufe + Zeitleiste, siehe archive.py; None = kein Archiv), per --archive-dir
+RECOVERY_REJOIN_GRACE_SECONDS = 90 # Nach einer Wiederherstellung haben Spieler so lange Zeit für REJOIN_GAME, bevor sie als offline gelten
+
+# Zeitgesteuerte Spiellogik: Ein Raum wird genau zu seinem nächsten Termin (Phasenende, Warnung, Standort-Broadcast,
+# Aufgabenfrist, Spielende, Reset) und nach jeder Aktion geprüft, nicht mehr jede Sekunde.
+HIDER_WAIT_COUNTDOWN_BROADCAST_SECONDS = 3 # Countdown-Updates während der Hider-Vorbereitungszeit
+GAME_COUNTDOWN_BROADCAST_SECONDS = 5 # Countdown-Updates im laufenden Spiel
+EARLY_END_RECOUNT_SECONDS = 10 # Neuzählung der aktiven Spieler für die Abstimmung zum vorzeitigen Ende
+GAME_OVER_FAST_BROADCAST_SECONDS = 3 # So lange nach Spielende alle 0.5 s ein Update, danach alle 5 s
+MIN_ROOM_TICK_SPACING_SECONDS = 0.01 # Schutz vor Dauerschleifen, falls ein Termin in der Vergangenheit liegen bleibt
+
+# Laufzeit-Metriken (siehe metrics.py): immer gezählt, per HTTP nur mit --metrics-port ausgeliefert
+METRICS_HOST = '127.0.0.1' # Nur lokal erreichbar
+METRICS_PORT = None # None = kein HTTP-Endpunkt; im Mehrprozess-Betrieb nutzt Worker i den Port METRICS_PORT + 1 + i
+METRICS_ACTION_LABELS = frozenset({
+    "JOIN_GAME", "REJOIN_GAME", "LIST_ROOMS", "LIST_REPLAYS", "GET_REPLAY", "FORCE_SERVER_RESET_FROM_CLIENT",
+    "REQUEST_FULL_SYNC", "SET_READY", "UPDATE_LOCATION", "TASK_COMPLETE", "TASK_COMPLETE_OFFLINE", "SKIP_TASK",
+    "CATCH_HIDER", "RETURN_TO_REGISTRATION", "LEAVE_GAME_AND_GO_TO_JOIN", "REQUEST_EARLY_ROUND_END",
+}) # Alle anderen Aktionen zählen als "other", damit beliebige Client-Eingaben keine neuen Zeitreihen erzeugen
+
+server_metrics = MetricsRegistry(prefix="hideandseek_")
+server_metrics.describe("tick_duration_seconds", "histogram", "Dauer eines Spiellogik-Ticks eines Raums")
+server_metrics.describe("broadcasts_total", "counter", "Voll-Broadcasts des Spielzustands an einen Raum")
+server_metrics.describe("broadcast_recipients_total", "counter", "Empfänger aller Voll-Broadcasts")
+server_metrics.describe("sent_messages_total", "counter", "Gesendete Nachrichten nach Typ", ("type",))
+server_metrics.describe("sent_bytes_total", "counter", "Gesendete Bytes (nach Kodierung und Kompression) nach Nachrichtentyp", ("type",))
+server_metrics.describe("send_duration_seconds", "histogram", "Dauer von _safe_send_json (Kodieren und Einreihen)")
+server_metrics.describe("send_failures_total", "counter", "Fehlgeschlagene Sendeversuche nach Grund", ("reason",))
+server_metrics.describe("action_duration_seconds", "histogram", "Bearbeitungsdauer einer Client-Aktion", ("action",))
+server_metrics.describe("players_connected", "gauge", "Spieler mit Verbindung (alle Räume)")
+server_metrics.describe("players_active", "gauge", "Aktive, bestätigte Spieler (alle Räume)")
+server_metrics.describe("rooms", "gauge", "Räume nach Spielstatus", ("status",))
+
+# Lock-Profiling der Raum-Locks (per --lock-profile): Warte-/Haltezeiten je Abschnitt (Aktion, Tick-Status, Broadcast,
+# Journal) und Aufrufstelle, als Histogramme unter /metrics und als Rangliste unter /locks. Muss vor dem Anlegen der
+# Räume eingeschaltet werden; ausgeschaltet bleiben die Raum-Locks gewöhnliche RLocks.
+lock_profiler = LockProfiler(server_metrics)
+METRICS_JSON_ROUTES = {"/locks": lock_profiler.report}
+
+
+class ClientConnection:
+    """Gemeinsame Basis der Verbindungs-Hüllen beider Engines: hält den pro Verbindung ausgehandelten Protokollzustand."""
+    def __init__(self):
+        self.room = None # GameRoom, dem die Verbindung per JOIN_GAME/REJOIN_GAME zugeordnet wurde
+        self.delta_updates = False # Opt-in per JOIN_GAME/REJOIN_GAME ("delta_updates": true)
+        self.update_seq = 0 # Sequenznummer des zuletzt gesendeten game_update/game_update_patch
+        self.last_game_update = None # Basis für den nächsten Patch; None erzwingt einen vollständigen Snapshot
+        self.framing = FRAMING_NEWLINE # Framing Server -> Client, per protocol_ack umschaltbar
+        self.encoding = ENCODING_JSON # Kodierung Server -> Client, per protocol_ack umschaltbar
+        self.schema_version = COMPACT_SCHEMA_VERSION # Schema der kompakten Kodierung
+        self.compression = COMPRESSION_NONE
+        self.compressor = None # StreamCompressor, wenn Kompression ausgehandelt wurde (Zustand über alle Nachrichten hinweg)
+        self._send_lock = threading.Lock()
+
+    def encode_payload(self, payload):
+        """Muss unter _send_lock aufgerufen werden: der Kompressor-Zustand muss der Reihenfolge auf der Leitung entsprechen."""
+        data = encode_message(payload, self.encoding, self.schema_version)
+        if self.compressor:
+            data = self.compressor.compress(data)
+        return encode_frame(data, self.framing)
+
+    def uses_default_protocol(self):
+        """True, solange nichts ausgehandelt wurde - nur dann kann ein anderer Prozess die Verbindung nahtlos übernehmen."""
+        return self.framing == FRAMING_NEWLINE and self.encoding == ENCODING_JSON and self.compressor is None
+
+    def send_payload(self, payload):
+        """Kodiert und reiht eine Nachricht ein. Der Lock hält Kodierung und Reihenfolge pro Verbindung zusammen."""
+        with self._send_lock:
+            data = self.encode_payload(payload)
+            self.sendall(data)
+        message_type = (payload.get("type", "unknown"),)
+        server_metrics.inc("sent_messages_total", 1, message_type)
+        server_metrics.inc("sent_bytes_total", len(data), message_type)
+
+    def send_protocol_ack(self, ack_payload, framing, encoding, schema_version, compression):
+        """Sendet protocol_ack noch mit den alten Einstellungen und schaltet direkt danach um (ohne Nachricht dazwischen)."""
+        with self._send_lock:
+            self.sendall(self.encode_payload(ack_payload))
+            self.framing = framing
+            self.encoding = encoding
+            self.schema_version = schema_version
+            if compression != self.compression: # Neuer Strom nur bei Wechsel; der Client legt seinen Dekompressor ebenso neu an
+                self.compressor = StreamCompressor() if compression != COMPRESSION_NONE else None
+            self.compression = compression
+
+
+class QueuedClientConnection(ClientConnection):
+    """
+    Socket-Hülle für die Thread-Engine mit begrenzter Ausgangs-Warteschlange und eigenem Schreib-Thread.
+    sendall() blockiert nie: Nachrichten werden nur eingereiht, ein langsamer oder halbtoter Client
+    hält damit weder den Raum-Lock noch den Spiel-Tick auf. Läuft die Warteschlange voll, wird die Verbindung getrennt.
+    """
+    _CLOSE_SENTINEL = None
+
+    def __init__(self, sock, addr, max_queued_messages=OUTBOUND_QUEUE_MAX_MESSAGES):
+        super().__init__()
+        self.sock = sock
+        self.addr = addr
+        self._outbound = queue.Queue(maxsize=max_queued_messages)
+        self._broken = False # True, sobald Senden fehlschlug oder die Warteschlange übergelaufen ist
+        self._close_requested = False
+        self._detaching = False # detach(): Socket nach dem Zustellen nicht schließen, er wird an einen anderen Prozess übergeben
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def recv(self, bufsize):
+        return self.sock.recv(bufsize)
+
+    def sendall(self, data):
+        if self._broken or self._close_requested:
+            raise BrokenPipeError(f"Verbindung zu {self.addr} ist bereits getrennt oder wird geschlossen.")
+        try:
+            self._outbound.put_nowait(data)
+        except queue.Full:
+            print(f"SERVER OUTBOUND: Warteschlange für {self.addr} voll ({self._outbound.maxsize} Nachrichten). Client zu langsam, Verbindung wird getrennt.")
+            self._abort()
+            raise BrokenPipeError(f"Ausgangs-Warteschlange für {self.addr} übergelaufen.")
+
+    def shutdown(self, how):
+        self.close() # Noch eingereihte Nachrichten werden vorher zugestellt (z.B. Reset-Hinweis)
+
+    def close(self):
+        if self._close_requested: return
+        self._close_requested = True
+        try:
+            self._outbound.put_nowait(self._CLOSE_SENTINEL)
+        except queue.Full:
+            self._abort() # Kein Platz mehr für ein geordnetes Ende
+
+    def detach(self, timeout=5.0):
+        """
+        Stellt alle eingereihten Nachrichten zu und gibt den Socket heraus, ohne shutdown() aufzurufen
+        (Übergabe an einen anderen Prozess). Gibt None zurück, wenn die Verbindung dabei abbricht.
+        """
+        if self._close_requested: return None
+        self._close_requested = True
+        self._detaching = True
+        try:
+            self._outbound.put(self._CLOSE_SENTINEL, timeout=timeout)
+        except queue.Full:
+            self._abort(); return None
+        self._writer_thread.join(timeout)
+        if self._broken or self._writer_thread.is_alive():
+            self._abort(); return None
+        return self.sock
+
+    def _abort(self):
+        """Trennt sofort, ohne ausstehende Nachrichten zu senden. Weckt auch den lesenden Handler-Thread auf."""
+        self._broken = True
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        try: self.sock.close()
+        except OSError: pass
+
+    def _writer_loop(self):
+        while True:
+            data = self._outbound.get()
+            if data is self._CLOSE_SENTINEL or self._broken:
+                break
+            try:
+                self.sock.sendall(data)
+            except (ConnectionResetError, BrokenPipeError, OSError) as e:
+                if not self._broken: # Beim Abbruch durch _abort() ist der Fehler erwartet
+                    print(f"SERVER OUTBOUND (COMM ERROR): Senden an {self.addr} fehlgeschlagen: {e}")
+                    self._abort()
+                break
+        if not self._broken and not self._detaching:
+            self._abort() # Geordnetes Ende nach dem Zustellen aller Nachrichten
+
+    def __repr__(self):
+        return f"<QueuedClientConnection addr={self.addr} queued={self._outbound.qsize()}>"
+
 
 def format_time_ago(seconds_elapsed):
     """Formatiert eine Anzahl von Sekunden in eine lesbare 'vor X Zeit'-Angabe."""
@@ -69,61 +270,117 @@ def format_time_ago(seconds_elapsed):
     return f"{days} Tag(en)"
 
 def _safe_send_json(conn, payload, player_id_for_log="N/A", player_name_for_log="N/A_IN_SAFE_SEND"):
-    """Sicherer Versand von JSON-Daten an einen Client. Setzt client_conn auf None bei Fehler."""
+    """
+    Sicherer Versand von JSON-Daten an einen Client. Setzt client_conn auf None bei Fehler.
+    conn.sendall reiht nur in die Ausgangs-Warteschlange der Verbindung ein und darf daher auch unter dem Raum-Lock aufgerufen werden.
+    """
     if not conn:
+        server_metrics.inc("send_failures_total", 1, ("no_conn",))
         # NEUES LOG
         print(f"SERVER SAFE_SEND (NO CONN): P:{player_id_for_log} ({player_name_for_log}): Payload (Typ: {payload.get('type','NO_TYPE')}) nicht gesendet, da conn=None.")
         return False
     try:
         # Das folgende Log kann sehr gesprächig sein, wenn es für jede Nachricht aktiviert wird.
         # print(f"SERVER SAFE_SEND: An P:{player_id_for_log} ({player_name_for_log}), Payload Typ: {payload.get('type','NO_TYPE')}, Socket: {conn}")
-        conn.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+        send_started = time.perf_counter()
+        conn.send_payload(payload)
+        server_metrics.observe("send_duration_seconds", time.perf_counter() - send_started)
         return True
     except (ConnectionResetError, BrokenPipeError, OSError) as e:
+        server_metrics.inc("send_failures_total", 1, ("comm_error",))
         # NEUES LOG (leicht modifiziert)
         print(f"SERVER SAFE_SEND (COMM ERROR): P:{player_id_for_log} ({player_name_for_log}): {e}. Socket: {conn}")
-        with data_lock: # Muss gelockt sein, um game_data zu ändern
+        room = conn.room
+        if room is None: return False # Verbindung gehört (noch) zu keinem Raum
+        with room.lock: # Muss gelockt sein, um game_data zu ändern
+            game_data = room.game_data
             if "players" in game_data and player_id_for_log in game_data.get("players", {}): # Sicherstellen, dass player_id noch existiert
                 # Wichtig: Nur None setzen, wenn es sich tatsächlich um die Verbindung handelt, die den Fehler verursacht hat
-                if game_data["players"][player_id_for_log].get("client_conn") == conn:
-                    game_data["players"][player_id_for_log]["client_conn"] = None
+                if game_data["players"][player_id_for_log].client_conn == conn:
+                    game_data["players"][player_id_for_log].client_conn = None
                     # NEUES LOG
                     print(f"SERVER SAFE_SEND: client_conn für P:{player_id_for_log} ({player_name_for_log}) auf None gesetzt wegen Sendefehler.")
         return False
     except Exception as e:
+        server_metrics.inc("send_failures_total", 1, ("unexpected",))
         # NEUES LOG (leicht modifiziert)
         print(f"SERVER SAFE_SEND (UNEXPECTED ERROR): P:{player_id_for_log} ({player_name_for_log}): {e}. Socket: {conn}")
         traceback.print_exc()
         return False
 
 
-def reset_game_to_initial_state(notify_clients_about_reset=False, reset_message="Server wurde zurückgesetzt. Bitte neu beitreten."):
-    """ Setzt das Spiel komplett zurück, entfernt alle Spieler und startet eine frische Lobby. """
-    global game_data
+def _send_game_update(conn, payload, player_id_for_log, player_name_for_log):
+    """
+    Sendet ein vollständiges, personalisiertes game_update. Hat die Verbindung Delta-Updates ausgehandelt,
+    wird nach dem ersten Snapshot nur noch ein game_update_patch mit fortlaufender Sequenznummer gesendet.
+    Muss unter dem Raum-Lock aufgerufen werden, damit Sequenz und Patch-Basis pro Verbindung konsistent bleiben.
+    """
+    if not conn or not conn.delta_updates:
+        return _safe_send_json(conn, payload, player_id_for_log, player_name_for_log)
+
+    if conn.last_game_update is None: # Erster Snapshot oder vom Client angeforderte Resynchronisation
+        message = dict(payload)
+    else:
+        patch = diff_game_update(conn.last_game_update, payload)
+        if patch is None:
+            return True # Nichts geändert -> nichts senden
+        message = {"type": "game_update_patch", "patch": patch}
+    conn.update_seq += 1
+    message["seq"] = conn.update_seq
+    conn.last_game_update = payload
+    return _safe_send_json(conn, message, player_id_for_log, player_name_for_log)
+
+
+def _apply_protocol_options(conn, message):
+    """
+    Übernimmt die vom Client bei JOIN_GAME/REJOIN_GAME angefragten Protokoll-Optionen für diese Verbindung.
+    Fragt der Client ein Framing oder eine Kodierung an, wird das mit einem protocol_ack (noch im alten Framing
+    und in der alten Kodierung) bestätigt; alle folgenden Nachrichten an diesen Client nutzen dann die neuen Einstellungen.
+    Client -> Server bleibt zeilenbasiertes JSON.
+    """
+    conn.delta_updates = message.get("delta_updates") is True
+    conn.last_game_update = None # Nach (Re-)Join immer mit vollständigem Snapshot beginnen
+    if "framing" in message or "encoding" in message or "compression" in message:
+        accepted_framing = conn.framing
+        if "framing" in message:
+            requested_framing = message.get("framing")
+            accepted_framing = requested_framing if requested_framing in SUPPORTED_FRAMINGS else FRAMING_NEWLINE
+        accepted_encoding = negotiate_encoding(message.get("encoding", ENCODING_JSON), message.get("schema"), accepted_framing)
+        accepted_compression = negotiate_compression(message.get("compression", COMPRESSION_NONE), accepted_framing)
+        ack_payload = {"type": "protocol_ack", "framing": accepted_framing, "encoding": accepted_encoding,
+                       "compression": accepted_compression, "delta_updates": conn.delta_updates}
+        accepted_schema = conn.schema_version
+        if accepted_encoding != ENCODING_JSON:
+            accepted_schema = ack_payload["schema"] = message.get("schema")
+        conn.send_protocol_ack(ack_payload, accepted_framing, accepted_encoding, accepted_schema, accepted_compression)
+
+
+def reset_game_to_initial_state(room, notify_clients_about_reset=False, reset_message="Server wurde zurückgesetzt. Bitte neu beitreten."):
+    """ Setzt das Spiel eines Raums komplett zurück, entfernt alle Spieler und startet eine frische Lobby. """
+    game_data = room.game_data
 
     players_to_notify_and_disconnect_info = []
 
-    with data_lock:
+    with room.lock:
         # NEUES LOG
-        print(f"SERVER LOGIC (RGS_ENTER_LOCK): Spiel wird zurückgesetzt. Notify Clients: {notify_clients_about_reset}")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", f"(RGS_ENTER_LOCK) Spiel wird zurückgesetzt. Notify Clients: {notify_clients_about_reset}")
 
         current_players_snapshot_for_notification = {}
         if notify_clients_about_reset and "players" in game_data:
             current_players_snapshot_for_notification = {
-                p_id: {"conn": p_info.get("client_conn"), "name": p_info.get("name", "N/A")}
-                for p_id, p_info in game_data["players"].items()
-                if p_info.get("client_conn")
+                p_id: {"conn": p_info.client_conn, "name": p_info.name}
+                for p_id, p_info in game_data["players"].entries("connected")
             }
 
         # NEUES LOG
-        print(f"SERVER LOGIC (RGS_PRE_CLEAR): game_data wird jetzt geleert. Aktuelle Spieleranzahl (für Snapshot): {len(current_players_snapshot_for_notification)}")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", f"(RGS_PRE_CLEAR) game_data wird jetzt geleert. Aktuelle Spieleranzahl (für Snapshot): {len(current_players_snapshot_for_notification)}")
         game_data.clear()
         # NEUES LOG
-        print(f"SERVER LOGIC (RGS_POST_CLEAR): game_data geleert.")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", "(RGS_POST_CLEAR) game_data geleert.")
         game_data.update({
             "status": GAME_STATE_LOBBY,
             "status_display": GAME_STATE_DISPLAY_NAMES[GAME_STATE_LOBBY],
-            "players": {},
+            "players": PlayerRegistry(), # Mit Indizes nach Rolle, Status, Verbindung und Name (siehe players.py)
             "game_start_time_actual": None,
             "game_end_time": None,
             "hider_wait_end_time": None,
@@ -137,9 +394,11 @@ def reset_game_to_initial_state(notify_clients_about_reset=False, reset_message=
             "current_phase_start_time": 0,
             "updates_done_in_current_phase": 0,
             "next_location_broadcast_time": float('inf'),
+            "timeline": [], # Spielereignisse (Statuswechsel, Phasen, Fänge, Aufgaben) für das Archiv
         })
+        room.task_board.reset(game_data["available_tasks"])
         # NEUES LOG
-        print("SERVER LOGIC (RGS_POST_UPDATE): Spielzustand auf Initialwerte zurückgesetzt (game_data manipuliert).")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", "(RGS_POST_UPDATE) Spielzustand auf Initialwerte zurückgesetzt (game_data manipuliert).")
 
         if notify_clients_about_reset:
             for p_id, p_snapshot_info in current_players_snapshot_for_notification.items():
@@ -152,11 +411,11 @@ def reset_game_to_initial_state(notify_clients_about_reset=False, reset_message=
                         "name": p_name_log
                     })
         # NEUES LOG
-        print(f"SERVER LOGIC (RGS_EXIT_LOCK): Lock wird freigegeben. {len(players_to_notify_and_disconnect_info)} Clients werden potenziell benachrichtigt/getrennt.")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", f"(RGS_EXIT_LOCK) Lock wird freigegeben. {len(players_to_notify_and_disconnect_info)} Clients werden potenziell benachrichtigt/getrennt.")
 
     if notify_clients_about_reset and players_to_notify_and_disconnect_info:
         # NEUES LOG
-        print(f"SERVER LOGIC (RGS_NOTIFY_LOOP_START): Beginne Benachrichtigung und Trennung von {len(players_to_notify_and_disconnect_info)} Clients (außerhalb des Locks).")
+        gamelog.log(gamelog.DEBUG, "SERVER LOGIC", f"(RGS_NOTIFY_LOOP_START) Beginne Benachrichtigung und Trennung von {len(players_to_notify_and_disconnect_info)} Clients (außerhalb des Locks).")
 
         payload_for_reset = {
             "type": "game_update",
@@ -173,14 +432,14 @@ def reset_game_to_initial_state(notify_clients_about_reset=False, reset_message=
 
             if _safe_send_json(conn, payload_for_reset, p_id, p_name):
                 # NEUES LOG
-                print(f"SERVER RGS_NOTIFY: Reset-Nachricht an P:{p_id} ({p_name}) auf Socket {conn} gesendet.")
+                gamelog.log(gamelog.DEBUG, "SERVER RGS_NOTIFY", f"Reset-Nachricht an P:{p_id} ({p_name}) auf Socket {conn} gesendet.")
             else:
                 # NEUES LOG
                 print(f"SERVER RGS_NOTIFY (SEND FAILED): Senden an P:{p_id} ({p_name}) auf Socket {conn} fehlgeschlagen.")
 
             try:
                 # NEUES LOG
-                print(f"SERVER RGS_SHUTDOWN: Versuche Shutdown für Socket von P:{p_id} ({p_name}): {conn}.")
+                gamelog.log(gamelog.DEBUG, "SERVER RGS_SHUTDOWN", f"Versuche Shutdown für Socket von P:{p_id} ({p_name}): {conn}.")
                 conn.shutdown(socket.SHUT_RDWR)
             except (OSError, socket.error) as e_shutdown:
                 if e_shutdown.errno not in [socket.EBADF, socket.ENOTCONN]: # Bad file descriptor, Not connected
@@ -192,89 +451,304 @@ def reset_game_to_initial_state(notify_clients_about_reset=False, reset_message=
             finally:
                 try:
                     # NEUES LOG
-                    print(f"SERVER RGS_CLOSE: Schließe Socket von P:{p_id} ({p_name}): {conn}.")
+                    gamelog.log(gamelog.DEBUG, "SERVER RGS_CLOSE", f"Schließe Socket von P:{p_id} ({p_name}): {conn}.")
                     conn.close()
                 except Exception as e_close:
                     # NEUES LOG
                     print(f"SERVER RGS_CLOSE_ERROR: Fehler beim expliziten Schließen für P:{p_id} ({p_name}) auf {conn}: {e_close}.")
 
     # NEUES LOG
-    print("SERVER LOGIC (RGS_END): reset_game_to_initial_state abgeschlossen.")
+    gamelog.log(gamelog.DEBUG, "SERVER LOGIC", "(RGS_END) reset_game_to_initial_state abgeschlossen.")
 
-def get_active_lobby_players_data():
+def get_active_lobby_players_data(room):
+    game_data = room.game_data
     active_lobby_players = {}
-    with data_lock:
-        for p_id, p_info in game_data.get("players", {}).items():
-            if p_info.get("confirmed_for_lobby", False): # Nur Spieler, die im aktuellen Lobby-Zyklus sind
-                active_lobby_players[p_id] = {
-                    "name": p_info.get("name", "Unbekannt"),
-                    "role": p_info.get("current_role", "hider"), # Die Rolle, die sie für dieses Spiel haben
-                    "is_ready": p_info.get("is_ready", False)
-                }
+    with room.lock:
+        for p_id, p_info in game_data["players"].entries("lobby_confirmed"): # Nur Spieler, die im aktuellen Lobby-Zyklus sind
+            active_lobby_players[p_id] = {
+                "name": p_info.name,
+                "role": p_info.current_role, # Die Rolle, die sie für dieses Spiel haben
+                "is_ready": p_info.is_ready
+            }
     return active_lobby_players
 
-def get_all_players_public_status():
+def get_all_players_public_status(room):
+    game_data = room.game_data
     all_players = {}
-    with data_lock:
+    with room.lock:
         for p_id, p_info in game_data.get("players", {}).items():
             # Hier zeigen wir Infos für alle Spieler, die dem Server bekannt sind (auch wenn sie nicht "confirmed_for_lobby" sind)
             # Solange sie eine Verbindung haben oder relevant für das Spiel waren.
             # Der "is_waiting_for_lobby" Status wird clientseitig verwendet, um zu entscheiden, ob diese Infos relevant sind.
             all_players[p_id] = {
-                "name": p_info.get("name", "Unbekannt"),
-                "role": p_info.get("current_role", "hider"),
-                "status": p_info.get("status_ingame", "active") # z.B. active, caught, offline
+                "name": p_info.name,
+                "role": p_info.current_role,
+                "status": p_info.status_ingame # z.B. active, caught, offline
             }
     return all_players
 
-def get_hider_leaderboard():
+def get_hider_leaderboard(room):
+    game_data = room.game_data
     leaderboard = []
-    with data_lock:
-        for p_id, p_info in game_data.get("players", {}).items():
-            if p_info.get("original_role") == "hider": # Zeige alle, die als Hider gestartet sind
-                leaderboard.append({
-                    "id": p_id,
-                    "name": p_info.get("name", "Unbekannt"),
-                    "points": p_info.get("points", 0),
-                    "status": p_info.get("status_ingame", "active")
-                })
+    with room.lock:
+        for p_id, p_info in game_data["players"].entries("original_hiders"): # Zeige alle, die als Hider gestartet sind
+            leaderboard.append({
+                "id": p_id,
+                "name": p_info.name,
+                "points": p_info.points,
+                "status": p_info.status_ingame
+            })
     leaderboard.sort(key=lambda x: x["points"], reverse=True)
     return leaderboard
 
-def assign_task_to_hider(player_id):
-    with data_lock:
+class TaskBoard:
+    """
+    Index über die Aufgaben eines Raums, damit weder Zuweisung noch Fristprüfung alle Spieler durchsuchen müssen:
+    ein Pool freier Aufgaben (Liste + Positionen, zufälliges Ziehen und Entfernen in O(1)) und ein Min-Heap der Fristen
+    zugewiesener Aufgaben (veraltete Einträge werden beim Herausnehmen verworfen). Wird nur unter room.lock benutzt.
+    Maßgeblich bleiben player.task/.task_deadline; der Index wird bei jeder Änderung mitgeführt (hold/release)
+    und nach einer Wiederherstellung mit rebuild() neu aufgebaut. Er gehört daher nicht ins Journal.
+    """
+    def __init__(self):
+        self.reset([])
+
+    def reset(self, tasks):
+        self._tasks = {task["id"]: task for task in tasks}
+        self._free = list(self._tasks) # Freie Aufgaben-IDs in beliebiger Reihenfolge
+        self._free_positions = {task_id: index for index, task_id in enumerate(self._free)}
+        self._holders = {} # player_id -> (task_id, Frist)
+        self._held_by = {} # task_id -> player_id
+        self._deadlines = [] # (Frist, player_id, task_id)
+        self._overdue = set() # Abgelaufen, während der Hider nicht aktiv war (z.B. offline): wird nachgeholt
+        self._pre_cached = {} # player_id -> vorgemerkte freie Aufgaben-IDs (stabil, damit Delta-Patches leer bleiben)
+
+    def rebuild(self, tasks, players):
+        self.reset(tasks)
+        for player_id, player_info in players.items():
+            if player_info.task:
+                self.hold(player_id, player_info.task.get("id"), player_info.task_deadline or 0)
+
+    def _remove_free(self, task_id):
+        index = self._free_positions.pop(task_id, None)
+        if index is None: return
+        last_task_id = self._free.pop()
+        if last_task_id != task_id: # Letztes Element in die Lücke verschieben
+            self._free[index] = last_task_id
+            self._free_positions[last_task_id] = index
+
+    def take_random(self):
+        """Entnimmt eine zufällige freie Aufgabe (None, wenn alle vergeben sind)."""
+        if not self._free: return None
+        task_id = self._free[random.randrange(len(self._free))]
+        self._remove_free(task_id)
+        return self._tasks[task_id]
+
+    def hold(self, player_id, task_id, deadline):
+        self.release(player_id)
+        self._remove_free(task_id)
+        self._holders[player_id] = (task_id, deadline)
+        self._held_by[task_id] = player_id
+        heapq.heappush(self._deadlines, (deadline, player_id, task_id))
+
+    def release(self, player_id):
+        """Die Aufgabe des Spielers ist erledigt, übersprungen, abgelaufen oder entzogen und wird wieder frei."""
+        self._overdue.discard(player_id)
+        task_id, _ = self._holders.pop(player_id, (None, None))
+        if task_id is None or self._held_by.get(task_id) != player_id: return
+        del self._held_by[task_id]
+        if task_id in self._tasks and task_id not in self._free_positions:
+            self._free_positions[task_id] = len(self._free)
+            self._free.append(task_id)
+
+    def is_free(self, task_id):
+        return task_id in self._free_positions
+
+    def pre_cached_for(self, player_id, count=2):
+        """
+        Bis zu `count` freie Aufgaben zum Vorladen für einen Hider. Die Auswahl bleibt pro Spieler gleich, solange die
+        Aufgaben frei sind; nur vergebene werden ersetzt bzw. fehlende ergänzt (sonst enthielte jeder Patch eine neue Liste).
+        """
+        picks = [task_id for task_id in self._pre_cached.get(player_id, ()) if task_id in self._free_positions][:count]
+        if len(picks) < count and len(self._free) > len(picks):
+            candidates = [task_id for task_id in self._free if task_id not in picks]
+            picks.extend(random.sample(candidates, min(count - len(picks), len(candidates))))
+        self._pre_cached[player_id] = picks
+        return [self._tasks[task_id] for task_id in picks]
+
+    def _drop_stale_deadlines(self):
+        while self._deadlines and self._holders.get(self._deadlines[0][1]) != (self._deadlines[0][2], self._deadlines[0][0]):
+            heapq.heappop(self._deadlines)
+
+    def next_deadline(self):
+        self._drop_stale_deadlines()
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def pop_expired(self, current_time):
+        """Spieler-IDs, deren Frist abgelaufen ist (inklusive zurückgestellter, siehe defer_overdue). Aufwand ~ Anzahl der Treffer."""
+        expired = list(self._overdue)
+        self._overdue.clear()
+        while self.next_deadline() is not None and self._deadlines[0][0] <= current_time:
+            expired.append(heapq.heappop(self._deadlines)[1])
+        return expired
+
+    def defer_overdue(self, player_id):
+        """Abgelaufen, aber der Hider ist gerade nicht aktiv: bei der nächsten Prüfung erneut liefern, Aufgabe bleibt vergeben."""
+        if player_id in self._holders: self._overdue.add(player_id)
+
+
+def clear_hider_task(room, player_info, player_id):
+    """Entzieht die aktuelle Aufgabe eines Spielers (erledigt, übersprungen, abgelaufen, gefangen, ausgeschieden). Unter room.lock."""
+    player_info.task, player_info.task_deadline = None, None
+    room.task_board.release(player_id)
+
+def assign_task_to_hider(room, player_id):
+    game_data = room.game_data
+    with room.lock:
         player = game_data.get("players", {}).get(player_id)
-        if not player or player.get("current_role") != "hider" or player.get("status_ingame") != "active":
+        if not player or player.current_role != "hider" or player.status_ingame != "active":
             return # Kann keine Aufgabe zuweisen
 
         available_tasks_list = game_data.get("available_tasks")
-        if not player.get("task") and available_tasks_list: # Spieler hat keine Aufgabe und es gibt verfügbare
-            # Finde Aufgaben, die noch nicht von anderen aktiven Hidern bearbeitet werden
-            assigned_tasks_ids = {p_info.get("task", {}).get("id")
-                                for p_info in game_data["players"].values()
-                                if p_info.get("task") and p_info.get("status_ingame") == "active"}
-
-            possible_tasks = [t for t in available_tasks_list if t.get("id") not in assigned_tasks_ids]
-
-            if possible_tasks:
-                task = random.choice(possible_tasks)
-                player["task"] = task
-                player["task_deadline"] = time.time() + task.get("time_limit_seconds", 180) # Standard 3 Min
-                print(f"SERVER TASK: Hider {player.get('name','N/A')} ({player_id}): Neue Aufgabe: {task.get('description','N/A')}")
+        if not player.task and available_tasks_list: # Spieler hat keine Aufgabe und es gibt verfügbare
+            task = room.task_board.take_random() # Nur Aufgaben, die gerade kein anderer Hider bearbeitet
+
+            if task:
+                player.task = task
+                player.task_deadline = time.time() + task.get("time_limit_seconds", 180) # Standard 3 Min
+                room.task_board.hold(player_id, task["id"], player.task_deadline)
+                print(f"SERVER TASK: Hider {player.name} ({player_id}): Neue Aufgabe: {task.get('description','N/A')}")
             else:
-                print(f"SERVER TASK: Keine unzugewiesenen Aufgaben mehr verfügbar für Hider {player.get('name','N/A')}")
+                print(f"SERVER TASK: Keine unzugewiesenen Aufgaben mehr verfügbar für Hider {player.name}")
         elif not available_tasks_list:
-            print(f"SERVER TASK: Keine Aufgaben mehr im globalen Pool verfügbar für Hider {player.get('name','N/A')}")
+            print(f"SERVER TASK: Keine Aufgaben mehr im globalen Pool verfügbar für Hider {player.name}")
         # else: Spieler hat bereits eine Aufgabe oder ist nicht berechtigt
 
-def count_active_players_for_early_end():
-    with data_lock:
-        return sum(1 for p_info in game_data.get("players", {}).values()
-                   if p_info.get("status_ingame") == "active" and p_info.get("confirmed_for_lobby"))
-
-
-def _calculate_and_set_next_broadcast_time(current_time):
-    with data_lock:
+def count_active_players_for_early_end(room):
+    game_data = room.game_data
+    with room.lock:
+        return game_data["players"].count("early_end_voters")
+
+def check_catch_distance(seeker_info, hider_info):
+    """
+    Gibt (erlaubt, Entfernung in Metern oder None) zurück. Ist der Standort eines der beiden unbekannt oder älter als
+    CATCH_MAX_FIX_AGE_SECONDS (z.B. Handy sendet nicht mehr), lässt sich nichts prüfen und der Fang wird wie bisher zugelassen.
+    """
+    if CATCH_MAX_DISTANCE_METERS is None or not seeker_info.has_location or not hider_info.has_location:
+        return True, None
+    min_fix_time = time.time() - CATCH_MAX_FIX_AGE_SECONDS
+    if seeker_info.last_location_timestamp < min_fix_time or hider_info.last_location_timestamp < min_fix_time:
+        return True, None
+    distance = haversine_meters(seeker_info.lat, seeker_info.lon, hider_info.lat, hider_info.lon)
+    accuracy_allowance = sum(accuracy for accuracy in (seeker_info.location[2], hider_info.location[2]) if accuracy)
+    return distance <= CATCH_MAX_DISTANCE_METERS + min(accuracy_allowance, CATCH_MAX_DISTANCE_METERS), distance
+
+def catch_hider(room, seeker_id, hider_id, distance=None):
+    """
+    Zustandsübergang "Hider gefangen" (CATCH_HIDER und automatisches Fangen). Prüft nur Rolle/Status des Hiders und gibt
+    zurück, ob er gefangen wurde. Muss unter room.lock aufgerufen werden.
+    """
+    players = room.game_data["players"]
+    seeker_info, hider_info = players.get(seeker_id), players.get(hider_id)
+    if seeker_info is None or hider_info is None: return False
+    if hider_info.current_role != "hider" or hider_info.status_ingame != "active": return False
+    hider_info.current_role = "seeker" # Gefangener Hider wird zum Seeker
+    hider_info.status_ingame = "caught"
+    clear_hider_task(room, hider_info, hider_id) # Keine Aufgaben mehr
+    hider_info.task_skips_available = 0 # Keine Skips mehr
+    record_game_event(room, "catch", seeker=seeker_id, hider=hider_id, auto=distance is not None,
+                      distance=round(distance, 1) if distance is not None else None)
+    distance_text = f" (automatisch, {distance:.0f} m)" if distance is not None else ""
+    broadcast_server_text_notification(room, f"Seeker {seeker_info.name} hat Hider {hider_info.name} gefangen{distance_text}!")
+    print(f"SERVER ACTION: Seeker {seeker_info.name} ({seeker_id}) hat Hider {hider_info.name} ({hider_id}) gefangen{distance_text}.")
+    return True
+
+def run_auto_catch(room, now=None):
+    """
+    Prüft alle Seeker gegen alle aktiven Hider in einem Durchgang (geo.pairs_within_meters, mit NumPy falls vorhanden)
+    und fängt jeden Hider, der mit frischem Standort im AUTO_CATCH_RADIUS_METERS eines Seekers steht. Liest die
+    Standort-Spalten des Spielerverzeichnisses direkt. Gibt die Anzahl der Fänge zurück. Muss unter room.lock aufgerufen werden.
+    """
+    if AUTO_CATCH_RADIUS_METERS is None: return 0
+    players = room.game_data["players"]
+    columns = players.columns
+    min_fix_time = (now or time.time()) - AUTO_CATCH_MAX_FIX_AGE_SECONDS
+    def fresh_positions(index_name):
+        ids, lats, lons = [], [], []
+        for player_id, row in players.rows(index_name):
+            lat = columns.lat[row]
+            if lat != lat or columns.last_location_timestamp[row] < min_fix_time: continue # Kein (frischer) Standort
+            ids.append(player_id); lats.append(lat); lons.append(columns.lon[row])
+        return ids, lats, lons
+    seeker_ids, seeker_lats, seeker_lons = fresh_positions("seekers")
+    hider_ids, hider_lats, hider_lons = fresh_positions("active_hiders")
+    if not seeker_ids or not hider_ids: return 0
+    pairs = pairs_within_meters(seeker_lats, seeker_lons, hider_lats, hider_lons, AUTO_CATCH_RADIUS_METERS)
+    caught_count = 0
+    for seeker_index, hider_index, distance in sorted(pairs, key=lambda pair: pair[2]): # Nächster Seeker fängt
+        if catch_hider(room, seeker_ids[seeker_index], hider_ids[hider_index], distance): caught_count += 1
+    return caught_count
+
+def get_nearest_hider_hint(room, seeker_info):
+    """"hot"/"warm"/"cold" nach HOT_COLD_HINT_BANDS für einen Seeker mit bekanntem Standort, sonst None. Muss unter room.lock aufgerufen werden."""
+    if not seeker_info.has_location: return None
+    nearest = room.game_data["players"].nearest("active_hiders", seeker_info.lat, seeker_info.lon, max_meters=HOT_COLD_HINT_BANDS[-1][0])
+    if nearest is not None:
+        for band_meters, hint in HOT_COLD_HINT_BANDS:
+            if nearest[0] <= band_meters: return hint
+    return "cold"
+
+
+# --- Spielarchiv (siehe archive.py) ---
+# Während des Spiels sammelt game_data["timeline"] die Ereignisse; beim Spielende werden Zeitleiste und Standortverläufe
+# unter dem Raum-Lock kopiert und von einem eigenen Thread geschrieben, damit Dateizugriffe die Spiellogik nicht aufhalten.
+def record_game_event(room, event_type, **details):
+    """Hängt ein Ereignis an die Zeitleiste des laufenden Spiels. Muss unter room.lock aufgerufen werden."""
+    room.game_data.setdefault("timeline", []).append({"time": round(time.time(), 3), "type": event_type, **details})
+
+def archive_finished_game(room, current_time):
+    """Übergibt ein gerade beendetes Spiel an einen Schreib-Thread (nur mit ARCHIVE_DIR). Muss unter room.lock aufgerufen werden."""
+    if not ARCHIVE_DIR: return
+    game_data = room.game_data
+    timeline = list(game_data.get("timeline", []))
+    header = {
+        "room_id": room.room_id, "room_name": room.name,
+        "started": timeline[0]["time"] if timeline else current_time, "ended": current_time,
+        "result": game_data.get("status"), "game_over_message": game_data.get("game_over_message"),
+        "players": [], "events": timeline,
+    }
+    tracks = {}
+    for index, (p_id, p_info) in enumerate(game_data["players"].items()):
+        header["players"].append({"id": p_id, "name": p_info.name, "original_role": p_info.original_role,
+                                  "final_role": p_info.current_role, "status": p_info.status_ingame, "points": p_info.points})
+        tracks[index] = p_info.track.points()
+    archive_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(current_time))}-{room.room_id}"
+    threading.Thread(target=_write_game_archive, args=(archive_id, header, tracks), name="game-archive", daemon=True).start()
+
+def _write_game_archive(archive_id, header, tracks):
+    started = time.time()
+    try:
+        path, point_count = write_game_archive(ARCHIVE_DIR, archive_id, header, tracks)
+        print(f"SERVER ARCHIVE: Spiel {archive_id} archiviert ({len(header['players'])} Spieler, {point_count} Standorte, "
+              f"{os.path.getsize(path) // 1024} KB) in {(time.time() - started) * 1000:.0f} ms.")
+    except (OSError, ValueError, OverflowError) as e:
+        print(f"SERVER ARCHIVE: Spiel {archive_id} konnte nicht archiviert werden: {e}"); traceback.print_exc()
+
+def send_replay_chunk(conn, message, player_id, player_name_for_log):
+    """Antwort auf GET_REPLAY: ein Abschnitt (Kopf oder ein Block) eines archivierten Spiels samt Cursor für den nächsten."""
+    archive_id, cursor = message.get("archive_id"), message.get("cursor", 0)
+    try:
+        chunk, next_cursor = read_replay_block(ARCHIVE_DIR, archive_id, cursor)
+    except FileNotFoundError:
+        _safe_send_json(conn, {"type": "error", "message": f"Archiviertes Spiel '{archive_id}' nicht gefunden."}, player_id, player_name_for_log); return
+    except (OSError, ValueError) as e:
+        _safe_send_json(conn, {"type": "error", "message": f"Wiedergabe nicht möglich: {e}"}, player_id, player_name_for_log); return
+    _safe_send_json(conn, {"type": "replay_chunk", "archive_id": archive_id, "cursor": cursor, "next_cursor": next_cursor, **chunk},
+                    player_id, player_name_for_log)
+
+
+def _calculate_and_set_next_broadcast_time(room, current_time):
+    game_data = room.game_data
+    with room.lock:
         phase_idx = game_data.get("current_phase_index", -1)
 
         if phase_idx < 0 or phase_idx >= len(PHASE_DEFINITIONS):
@@ -310,6 +784,7 @@ def _calculate_and_set_next_broadcast_time(current_time):
             game_data["current_phase_start_time"] = current_time
             game_data["updates_done_in_current_phase"] = 0 # Wichtig: Zähler für neue Phase zurücksetzen
             phase_def = PHASE_DEFINITIONS[phase_idx] # Definition für die neue Phase laden
+            record_game_event(room, "phase", phase=phase_idx, name=phase_def["name"])
             print(f"SERVER LOGIC: Starte/Weiter mit Phase {phase_idx}: {phase_def['name']}")
 
 
@@ -333,11 +808,46 @@ def _calculate_and_set_next_broadcast_time(current_time):
             # print(f"SERVER LOGIC: Nächster Hider-Standort-Broadcast geplant für: {target_time_str} (in ca. {delay_seconds}s) in Phase '{phase_def['name']}'.")
 
 
-def send_data_to_one_client(conn, player_id_for_perspective):
+def build_broadcast_snapshot(room):
+    """
+    Baut die für alle Empfänger gleichen Teile eines game_update einmal pro Broadcast.
+    Das Ergebnis wird von allen Empfängern gemeinsam genutzt und darf daher nicht verändert werden.
+    """
+    game_data = room.game_data
+    with room.lock:
+        current_game_status = game_data.get("status", GAME_STATE_LOBBY)
+        players = game_data["players"]
+
+        visible_hiders = {} # Für Seeker: alle aktiven Hider mit bekanntem Standort
+        for h_id, h_info in players.entries("active_hiders"):
+            if h_info.has_location: # Nur wenn Standort bekannt
+                visible_hiders[h_id] = {
+                    "name": h_info.name,
+                    "lat": h_info.lat, "lon": h_info.lon,
+                    "timestamp": time.strftime("%H:%M:%S", time.localtime(h_info.last_location_timestamp))
+                }
+
+        return {
+            "status": current_game_status,
+            "status_display": game_data.get("status_display", GAME_STATE_DISPLAY_NAMES.get(current_game_status, "Unbekannter Status")),
+            "lobby_players": get_active_lobby_players_data(room) if current_game_status == GAME_STATE_LOBBY else {},
+            "all_players_status": get_all_players_public_status(room),
+            "hider_leaderboard": get_hider_leaderboard(room),
+            "hider_locations": visible_hiders,
+            "early_end_requests_count": len(game_data.get("early_end_requests", set())),
+        }
+
+
+def send_data_to_one_client(room, conn, player_id_for_perspective, snapshot=None):
+    """
+    Sendet den personalisierten Spielzustand an einen Spieler.
+    `snapshot` (aus build_broadcast_snapshot) wird bei Broadcasts übergeben, damit die gemeinsamen Teile nur einmal berechnet werden.
+    """
+    game_data = room.game_data
     payload = {}
     player_name_for_log = "N/A_IN_SEND_INIT" # Für Logging, falls Spieler nicht gefunden wird
     try:
-        with data_lock: # Sicherer Zugriff auf game_data
+        with room.lock: # Sicherer Zugriff auf game_data
             if player_id_for_perspective not in game_data.get("players", {}):
                 # Spieler existiert nicht mehr im Spiel (z.B. nach Reset oder Disconnect)
                 if conn: # Nur senden, wenn eine Verbindung besteht
@@ -352,13 +862,15 @@ def send_data_to_one_client(conn, player_id_for_perspective):
 
             player_info = game_data["players"].get(player_id_for_perspective)
             if not player_info: return False # Sollte nicht passieren, wenn ID in players ist, aber zur Sicherheit
+            if snapshot is None: # Einzelversand: gemeinsame Teile für diesen einen Empfänger berechnen
+                snapshot = build_broadcast_snapshot(room)
 
-            player_name_for_log = player_info.get("name", f"Unbekannt_{player_id_for_perspective}")
-            p_role = player_info.get("current_role", "hider")
-            is_waiting_for_lobby = player_info.get("is_waiting_for_lobby", False)
+            player_name_for_log = player_info.name
+            p_role = player_info.current_role
+            is_waiting_for_lobby = player_info.is_waiting_for_lobby
 
-            current_game_status = game_data.get("status", GAME_STATE_LOBBY)
-            current_status_display = game_data.get("status_display", GAME_STATE_DISPLAY_NAMES.get(current_game_status, "Unbekannter Status"))
+            current_game_status = snapshot["status"]
+            current_status_display = snapshot["status_display"]
 
             # Erstelle den game_state Teil der Payload
             payload_game_state = {}
@@ -378,48 +890,40 @@ def send_data_to_one_client(conn, player_id_for_perspective):
             # Haupt-Payload zusammenstellen
             payload = {
                 "type": "game_update", "player_id": player_id_for_perspective, # Wichtig für den Client zur Identifikation
-                "player_name": player_name_for_log, "role": p_role, "location": player_info.get("location"),
-                "confirmed_for_lobby": player_info.get("confirmed_for_lobby", False),
-                "player_is_ready": player_info.get("is_ready", False),
-                "player_status": player_info.get("status_ingame", "active"),
+                "room_id": room.room_id, "room_name": room.name, # Für REJOIN_GAME und die Anzeige
+                "player_name": player_name_for_log, "role": p_role, "location": player_info.location,
+                "confirmed_for_lobby": player_info.confirmed_for_lobby,
+                "player_is_ready": player_info.is_ready,
+                "player_status": player_info.status_ingame,
                 "is_waiting_for_lobby": is_waiting_for_lobby, # Informiert den Client, ob er auf die nächste Runde wartet
                 "game_state": payload_game_state,
-                "lobby_players": get_active_lobby_players_data() if current_game_status == GAME_STATE_LOBBY and not is_waiting_for_lobby else {},
-                "all_players_status": get_all_players_public_status(), # Immer alle Spieler senden für die Gesamtübersicht
-                "hider_leaderboard": get_hider_leaderboard() if p_role == "hider" or current_game_status in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS] else None,
-                "hider_location_update_imminent": player_info.get("has_pending_location_warning", False) if p_role == "hider" and not is_waiting_for_lobby else False,
-                "early_end_requests_count": len(game_data.get("early_end_requests", set())) if not is_waiting_for_lobby else 0,
+                "lobby_players": snapshot["lobby_players"] if not is_waiting_for_lobby else {},
+                "all_players_status": snapshot["all_players_status"], # Immer alle Spieler senden für die Gesamtübersicht
+                "hider_leaderboard": snapshot["hider_leaderboard"] if p_role == "hider" or current_game_status in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS] else None,
+                "hider_location_update_imminent": player_info.has_pending_location_warning if p_role == "hider" and not is_waiting_for_lobby else False,
+                "early_end_requests_count": snapshot["early_end_requests_count"] if not is_waiting_for_lobby else 0,
                 "total_active_players_for_early_end": game_data.get("total_active_players_for_early_end", 0) if not is_waiting_for_lobby else 0,
                 "player_has_requested_early_end": player_id_for_perspective in game_data.get("early_end_requests", set()) if not is_waiting_for_lobby else False
             }
 
             # Hider-spezifische Daten
             if p_role == "hider" and not is_waiting_for_lobby:
-                payload["task_skips_available"] = player_info.get("task_skips_available", 0)
-                if player_info.get("status_ingame") == "active" and player_info.get("task"):
-                    p_task_info = player_info["task"]
+                payload["task_skips_available"] = player_info.task_skips_available
+                if player_info.status_ingame == "active" and player_info.task:
+                    p_task_info = player_info.task
                     payload["current_task"] = {
                         "id": p_task_info.get("id", "N/A"), "description": p_task_info.get("description", "Keine Beschreibung"),
                         "points": p_task_info.get("points", 0),
-                        "time_left_seconds": max(0, int(player_info.get("task_deadline", 0) - time.time())) if player_info.get("task_deadline") else 0
+                        "time_left_seconds": max(0, int(player_info.task_deadline - time.time())) if player_info.task_deadline else 0
                     }
                 else: # Kein aktiver Task
                     payload["current_task"] = None
 
                 # Pre-caching von Aufgaben für Hider
                 payload["pre_cached_tasks"] = []
-                if player_info.get("status_ingame") == "active": # Nur für aktive Hider
-                    available_tasks_list_copy = list(game_data.get("available_tasks", [])) # Kopie für Modifikationen
-                    # IDs aller aktuell zugewiesenen Aufgaben (auch die des aktuellen Spielers)
-                    assigned_task_ids = {p.get("task", {}).get("id") for p in game_data.get("players", {}).values() if p.get("task")}
-
-                    # Filtere Aufgaben, die noch nicht zugewiesen sind
-                    unassigned_tasks = [t for t in available_tasks_list_copy if t.get("id") not in assigned_task_ids]
-                    random.shuffle(unassigned_tasks) # Mische für eine zufällige Auswahl
-
-                    # Füge bis zu 2 Aufgaben zum Pre-Cache hinzu
-                    for i in range(min(2, len(unassigned_tasks))): # Nimmt maximal 2 oder weniger, falls nicht genug da sind
-                        task_to_cache = unassigned_tasks[i]
+                if player_info.status_ingame == "active": # Nur für aktive Hider
+                    # Bis zu 2 zufällige, noch nicht zugewiesene Aufgaben; dieselben, bis eine davon vergeben wird
+                    for task_to_cache in room.task_board.pre_cached_for(player_id_for_perspective):
                         payload["pre_cached_tasks"].append({
                             "id": task_to_cache.get("id"), "description": task_to_cache.get("description"),
                             "points": task_to_cache.get("points")
@@ -428,24 +932,15 @@ def send_data_to_one_client(conn, player_id_for_perspective):
 
             # Seeker-spezifische Daten
             if p_role == "seeker" and not is_waiting_for_lobby:
-                visible_hiders = {}
-                current_players_copy = dict(game_data.get("players", {})) # Kopie für sichere Iteration
-                for h_id, h_info in current_players_copy.items():
-                    if h_info.get("current_role") == "hider" and \
-                       h_info.get("status_ingame") == "active" and \
-                       h_info.get("location"): # Nur wenn Standort bekannt
-                        visible_hiders[h_id] = {
-                            "name": h_info.get("name", "Unbekannter Hider"),
-                            "lat": h_info["location"][0], "lon": h_info["location"][1],
-                            "timestamp": time.strftime("%H:%M:%S", time.localtime(h_info.get("last_location_timestamp", time.time())))
-                        }
-                payload["hider_locations"] = visible_hiders
+                payload["hider_locations"] = snapshot["hider_locations"]
+                payload["nearest_hider_hint"] = get_nearest_hider_hint(room, player_info) if current_game_status == GAME_STATE_RUNNING else None
             else: # Für Hider oder wenn der Spieler wartet, keine Hider-Standorte senden
                 payload["hider_locations"] = {} # Leeres Objekt, um clientseitige Fehler zu vermeiden
+                payload["nearest_hider_hint"] = None
 
-        # Sende die zusammengestellte Payload an den Client
-        if conn and payload: # Sicherstellen, dass Verbindung und Payload existieren
-             return _safe_send_json(conn, payload, player_id_for_perspective, player_name_for_log)
+            # Sende die zusammengestellte Payload an den Client (noch unter Lock, damit Delta-Sequenzen geordnet bleiben)
+            if conn and payload: # Sicherstellen, dass Verbindung und Payload existieren
+                return _send_game_update(conn, payload, player_id_for_perspective, player_name_for_log)
 
     except Exception as e: # Fange unerwartete Fehler bei der Payload-Erstellung ab
         print(f"SERVER SEND (ERROR - UNEXPECTED in prep): P:{player_id_for_perspective} ({player_name_for_log}): Unerwarteter Fehler: {e}")
@@ -453,65 +948,691 @@ def send_data_to_one_client(conn, player_id_for_perspective):
     return False # Fehler beim Senden oder Vorbereiten
 
 
-def broadcast_full_game_state_to_all(exclude_pid=None):
+def broadcast_full_game_state_to_all(room, exclude_pid=None):
     """Sendet den aktuellen, personalisierten Spielzustand an alle verbundenen Clients."""
-    players_to_update_with_conn = []
-    with data_lock: # Hole Liste der Spieler und ihrer Verbindungen unter Lock
-        for pid, pinfo in game_data.get("players", {}).items():
-            if pid != exclude_pid and pinfo.get("client_conn"): # Nur an verbundene Clients, exkl. exclude_pid
-                players_to_update_with_conn.append((pid, pinfo["client_conn"]))
-
-    # Sende Daten außerhalb des Locks, um Blockaden zu minimieren
-    for p_id_to_update, conn_to_use in players_to_update_with_conn:
-        send_data_to_one_client(conn_to_use, p_id_to_update) # Diese Funktion handelt den Lock intern
-
+    game_data = room.game_data
+    # Ein einziger Lock-Durchlauf: Snapshot einmal bauen, dann pro Spieler nur die persönlichen Felder.
+    # Das Senden selbst reiht nur in die Ausgangs-Warteschlangen ein und blockiert nicht.
+    with lock_profiler.section("broadcast"), room.lock:
+        players_to_update_with_conn = [(pid, pinfo.client_conn) for pid, pinfo in game_data["players"].entries("connected")
+                                       if pid != exclude_pid] # Nur an verbundene Clients, exkl. exclude_pid
+        if not players_to_update_with_conn: return
+        server_metrics.inc("broadcasts_total")
+        server_metrics.inc("broadcast_recipients_total", len(players_to_update_with_conn))
+        snapshot = build_broadcast_snapshot(room)
+        for p_id_to_update, conn_to_use in players_to_update_with_conn:
+            send_data_to_one_client(room, conn_to_use, p_id_to_update, snapshot)
+
+
+class BroadcastCoalescer:
+    """
+    Bündelt Broadcast-Anforderungen: mark_dirty() merkt nur vor, gesendet wird höchstens einmal pro Zeitfenster.
+    Der erste Broadcast nach einer ruhigen Phase geht sofort raus, weitere Anforderungen im selben Fenster werden zusammengefasst.
+    Läuft entweder mit eigenem Thread (run_thread) oder auf einem asyncio-Loop (attach_loop).
+    Ohne beides (z.B. in Skripten) wird sofort gesendet.
+    """
+    def __init__(self, window_seconds, flush_callback):
+        self.window_seconds = window_seconds
+        self._flush_callback = flush_callback
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._last_flush = 0.0
+        self._mode = None # None, "thread" oder "asyncio"
+        self._loop = None
+        self._async_timer_armed = False
+        self._closed = False
+
+    def close(self):
+        """Beendet den Bündelungs-Thread (z.B. wenn der zugehörige Raum aufgelöst wird). Offene Anforderungen verfallen."""
+        with self._cond:
+            self._closed = True
+            self._dirty = False
+            self._cond.notify()
+
+    def mark_dirty(self):
+        with self._cond:
+            if self._closed: return
+            if self._mode is None:
+                run_now = True
+            else:
+                run_now = False
+                if self._dirty: return # Bereits vorgemerkt, wird im laufenden Fenster mitgesendet
+                self._dirty = True
+                if self._mode == "thread":
+                    self._cond.notify()
+        if run_now:
+            self.flush_now()
+        elif self._mode == "asyncio":
+            self._loop.call_soon_threadsafe(self._arm_async_timer)
+
+    def flush_now(self):
+        """Sendet sofort (z.B. bei Spielstart/-ende) und verwirft eine eventuell vorgemerkte Anforderung."""
+        with self._cond:
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        self._flush_callback()
+
+    def _delay_until_next_flush(self):
+        return max(0.0, self._last_flush + self.window_seconds - time.monotonic())
+
+    def run_thread(self):
+        with self._cond:
+            self._mode = "thread"
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed: return
+                delay = self._delay_until_next_flush()
+            if delay > 0:
+                time.sleep(delay) # Weitere Anforderungen in diesem Fenster werden mitgenommen
+            with self._cond:
+                if not self._dirty: continue # Zwischenzeitlich durch flush_now() erledigt
+            try:
+                self.flush_now()
+            except Exception as e:
+                print(f"SERVER BROADCAST (ERROR): Gebündelter Broadcast fehlgeschlagen: {e}"); traceback.print_exc()
+
+    def attach_loop(self, loop):
+        with self._cond:
+            self._mode = "asyncio"
+            self._loop = loop
+
+    def _arm_async_timer(self): # Läuft im asyncio-Loop
+        if self._async_timer_armed: return
+        self._async_timer_armed = True
+        self._loop.call_later(self._delay_until_next_flush(), self._flush_if_dirty_async)
+
+    def _flush_if_dirty_async(self): # Läuft im asyncio-Loop
+        self._async_timer_armed = False
+        with self._cond:
+            if not self._dirty: return
+        try:
+            self.flush_now()
+        except Exception as e:
+            print(f"SERVER BROADCAST (ERROR): Gebündelter Broadcast fehlgeschlagen: {e}"); traceback.print_exc()
+
+
+class TimerScheduler:
+    """
+    Zeitgesteuerte Ereignisse in einem Min-Heap nach Fälligkeit (Unix-Zeit, wie alle Fristen in game_data).
+    Jeder Timer hat einen Schlüssel: schedule() mit demselben Schlüssel ersetzt den alten Termin (mit keep_earlier nur,
+    wenn der neue früher liegt), cancel() entfernt ihn.
+    Ersetzte Einträge bleiben im Heap und werden beim Herausnehmen verworfen. Callbacks laufen ohne den internen Lock.
+    Wie BroadcastCoalescer mit eigenem Thread (run_thread) oder auf einem asyncio-Loop (attach_loop); geschlafen wird
+    jeweils genau bis zum nächsten Termin, ohne Timer gar nicht. Ohne beides (z.B. in Skripten) führt run_due() aus.
+    """
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap = [] # (Fälligkeit, laufende Nummer, Schlüssel, Callback)
+        self._current = {} # Schlüssel -> laufende Nummer des gültigen Heap-Eintrags
+        self._current_due = {} # Schlüssel -> Fälligkeit des gültigen Heap-Eintrags
+        self._counter = itertools.count()
+        self._loop = None
+        self._async_handle = None
+        self._async_armed_for = None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._current)
+
+    def schedule(self, key, when, callback, keep_earlier=False):
+        """Plant callback für when. Gibt die laufende Nummer des danach gültigen Termins zurück (siehe current_seq)."""
+        with self._cond:
+            if keep_earlier and key in self._current and self._current_due[key] <= when:
+                return self._current[key] # Ein früherer Termin (z.B. sofortiger Tick nach einer Aktion) bleibt bestehen
+            seq = next(self._counter)
+            self._current[key] = seq
+            self._current_due[key] = when
+            heapq.heappush(self._heap, (when, seq, key, callback))
+            if len(self._heap) > 2 * len(self._current) + 64: # Zu viele ersetzte Einträge: Heap neu aufbauen
+                self._heap = [entry for entry in self._heap if self._current.get(entry[2]) == entry[1]]
+                heapq.heapify(self._heap)
+            is_new_head = self._heap[0][1] == seq
+            if is_new_head and self._loop is None: self._cond.notify()
+        if is_new_head and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._arm_async_timer)
+        return seq
+
+    def current_seq(self, key):
+        """Laufende Nummer des geplanten Termins für key (None, wenn keiner geplant ist)."""
+        with self._cond:
+            return self._current.get(key)
+
+    def cancel(self, key, only_seq=None):
+        """Entfernt den Termin; mit only_seq nur, wenn seitdem kein anderer geplant wurde (gleiche laufende Nummer)."""
+        with self._cond:
+            if only_seq is not None and self._current.get(key) != only_seq: return
+            self._current.pop(key, None)
+            self._current_due.pop(key, None)
+
+    def _next_due_locked(self):
+        while self._heap and self._current.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap) # Ersetzt oder abgebrochen
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """Führt alle fälligen Timer aus und gibt die Fälligkeit des nächsten zurück (None, wenn keiner geplant ist)."""
+        due = []
+        with self._cond:
+            now = self._clock()
+            while self._next_due_locked() is not None and self._heap[0][0] <= now:
+                _, _, key, callback = heapq.heappop(self._heap)
+                del self._current[key], self._current_due[key]
+                due.append((key, callback))
+        for key, callback in due:
+            try:
+                callback()
+            except Exception as e:
+                print(f"SERVER TIMER (ERROR): Timer {key} fehlgeschlagen: {e}"); traceback.print_exc()
+        with self._cond:
+            return self._next_due_locked()
 
-def broadcast_server_text_notification(message_text, target_player_ids=None, role_filter=None):
+    def run_thread(self):
+        while True:
+            self.run_due()
+            with self._cond:
+                next_due = self._next_due_locked()
+                if next_due is None:
+                    self._cond.wait() # Kein Termin: schlafen, bis schedule() einen setzt
+                elif next_due > self._clock():
+                    self._cond.wait(next_due - self._clock())
+
+    def attach_loop(self, loop):
+        with self._cond:
+            self._loop = loop
+        loop.call_soon_threadsafe(self._arm_async_timer)
+
+    def _arm_async_timer(self): # Läuft im asyncio-Loop
+        with self._cond:
+            next_due = self._next_due_locked()
+        if next_due == self._async_armed_for: return
+        if self._async_handle: self._async_handle.cancel()
+        self._async_armed_for = next_due
+        self._async_handle = None if next_due is None else self._loop.call_later(max(0.0, next_due - self._clock()), self._run_due_async)
+
+    def _run_due_async(self): # Läuft im asyncio-Loop
+        self._async_handle = self._async_armed_for = None
+        self.run_due()
+        self._arm_async_timer()
+
+
+# --- Räume ---
+# Jeder Raum ist ein eigenständiges Spiel mit eigenem Zustand, eigenem Lock, eigenem Tick-Zustand und eigener
+# Broadcast-Bündelung. Es wird nie mehr als ein Raum-Lock gleichzeitig gehalten; rooms_lock schützt nur das Verzeichnis
+# und wird nie gehalten, während auf einen Raum-Lock gewartet wird.
+DEFAULT_ROOM_ID = "main" # Immer vorhanden; Clients ohne Raumangabe landen hier
+DEFAULT_ROOM_NAME = "Hauptraum"
+MAX_ROOMS = 100
+MAX_ROOM_NAME_LENGTH = 40
+ROOM_IDLE_TIMEOUT_SECONDS = 600 # Leere Räume (außer dem Hauptraum) werden nach dieser Zeit aufgelöst
+
+class GameRoom:
+    """Ein Spielraum: game_data wird ausschließlich unter room.lock gelesen und verändert."""
+    def __init__(self, room_id, name):
+        self.room_id = room_id
+        self.name = name
+        self.game_data = {}
+        self.lock = lock_profiler.new_lock() # Reentrant Lock für den Zugriff auf game_data dieses Raums (RLock bzw. InstrumentedLock)
+        self.tick_state = {"previous_game_status": None} # Zustand zwischen zwei Spiel-Ticks
+        self.task_board = TaskBoard() # Freie Aufgaben und Fristen, abgeleitet aus game_data (unter self.lock)
+        self.broadcast_coalescer = BroadcastCoalescer(BROADCAST_COALESCE_WINDOW_SECONDS, lambda: broadcast_full_game_state_to_all(self))
+        self.closed = False # True, sobald der Raum aus dem Verzeichnis entfernt wurde (unter self.lock gesetzt)
+        self.empty_since = time.time() # None, solange Spieler im Raum sind
+        self.recovery_grace_until = None # Nach Wiederherstellung aus dem Journal: Frist für REJOIN_GAME
+
+    def __repr__(self):
+        return f"<GameRoom {self.room_id} '{self.name}'>"
+
+
+rooms = {} # room_id -> GameRoom
+rooms_lock = threading.Lock()
+broadcast_runtime = {"mode": None, "loop": None} # Wie die Broadcast-Bündelung neuer Räume betrieben wird (Engine-abhängig)
+
+def _start_room_broadcasting(room):
+    if broadcast_runtime["mode"] == "thread":
+        threading.Thread(target=room.broadcast_coalescer.run_thread, daemon=True).start()
+    elif broadcast_runtime["mode"] == "asyncio":
+        room.broadcast_coalescer.attach_loop(broadcast_runtime["loop"])
+
+def start_broadcasting_for_all_rooms(mode, loop=None):
+    """Wird von der Engine beim Start aufgerufen; später angelegte Räume übernehmen den Modus automatisch."""
+    with rooms_lock:
+        broadcast_runtime.update({"mode": mode, "loop": loop})
+        existing_rooms = list(rooms.values())
+    for room in existing_rooms:
+        _start_room_broadcasting(room)
+
+def _new_room_id():
+    alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789" # Ohne leicht verwechselbare Zeichen (0/O, 1/I)
+    while True:
+        room_id = "".join(random.choice(alphabet) for _ in range(4))
+        if room_id not in rooms and is_local_room_id(room_id): return room_id # Im Mehrprozess-Betrieb nur IDs, die zu diesem Worker gehören
+
+def create_room(name, room_id=None):
+    """Legt einen neuen Raum mit frischer Lobby an. Gibt None zurück, wenn das Raumlimit erreicht ist."""
+    name = (name or "").strip()[:MAX_ROOM_NAME_LENGTH] or "Neuer Raum"
+    with rooms_lock:
+        if len(rooms) >= MAX_ROOMS: return None
+        room = GameRoom(room_id or _new_room_id(), name)
+        reset_game_to_initial_state(room) # Noch nicht im Verzeichnis, daher ohne Konkurrenz
+        rooms[room.room_id] = room
+        _start_room_broadcasting(room)
+    journal_event(room, "room_created")
+    schedule_room_tick(room)
+    print(f"SERVER ROOMS: Raum '{room.name}' ({room.room_id}) angelegt. Räume insgesamt: {len(rooms)}.")
+    return room
+
+def get_room(room_id):
+    with rooms_lock:
+        return rooms.get(room_id)
+
+def get_all_rooms():
+    with rooms_lock:
+        return list(rooms.values())
+
+def _count_players_in_all_rooms(index_name):
+    """Für die Metriken: liest nur die Index-Größen, ohne Raum-Locks (ein Wert kann einen Tick alt sein)."""
+    return sum(room.game_data["players"].count(index_name) for room in get_all_rooms() if "players" in room.game_data)
+
+def _count_rooms_by_status():
+    counts = {}
+    for room in get_all_rooms():
+        status_key = (room.game_data.get("status", "unknown"),)
+        counts[status_key] = counts.get(status_key, 0) + 1
+    return counts
+
+server_metrics.set_callback("players_connected", lambda: _count_players_in_all_rooms("connected"))
+server_metrics.set_callback("players_active", lambda: _count_players_in_all_rooms("early_end_voters"))
+server_metrics.set_callback("rooms", _count_rooms_by_status)
+
+def ensure_default_room():
+    return get_room(DEFAULT_ROOM_ID) or create_room(DEFAULT_ROOM_NAME, room_id=DEFAULT_ROOM_ID)
+
+def find_room_of_player(player_id):
+    """Sucht den Raum eines Spielers (für REJOIN_GAME von Clients, die keine room_id mitschicken)."""
+    for room in get_all_rooms():
+        with room.lock:
+            if player_id in room.game_data.get("players", {}): return room
+    return None
+
+def _sort_room_directory(directory):
+    directory.sort(key=lambda r: (r["room_id"] != DEFAULT_ROOM_ID, r["name"].lower()))
+    return directory
+
+def get_room_directory():
+    """Übersicht der Räume dieses Prozesses."""
+    directory = []
+    for room in get_all_rooms():
+        with room.lock:
+            if room.closed: continue
+            players = room.game_data.get("players", {})
+            directory.append({
+                "room_id": room.room_id, "name": room.name,
+                "status": room.game_data.get("status"), "status_display": room.game_data.get("status_display"),
+                "player_count": len(players),
+                "connected_count": players.count("connected")
+            })
+    return _sort_room_directory(directory)
+
+def get_public_room_directory():
+    """Raumverzeichnis für LIST_ROOMS. Im Mehrprozess-Betrieb ergänzt um die (bis zu einen Tick alten) Räume der anderen Worker."""
+    directory = get_room_directory()
+    if shard_runtime["count"] > 1:
+        directory += [r for r in shard_runtime["directory"] if not is_local_room_id(r["room_id"])]
+    return _sort_room_directory(directory)
+
+def remove_room_if_idle(room, current_time):
+    """Löst den Raum auf, wenn er ROOM_IDLE_TIMEOUT_SECONDS ohne Spieler war (der Hauptraum bleibt immer). True, wenn aufgelöst."""
+    if room.room_id == DEFAULT_ROOM_ID: return False
+    with room.lock:
+        if room.game_data.get("players"):
+            room.empty_since = None; return False
+        if room.empty_since is None: room.empty_since = current_time
+        if current_time - room.empty_since < ROOM_IDLE_TIMEOUT_SECONDS: return False
+        room.closed = True # Ab jetzt schlägt JOIN_GAME in diesen Raum fehl
+    room.broadcast_coalescer.close()
+    game_timers.cancel(("room", room.room_id))
+    with rooms_lock:
+        rooms.pop(room.room_id, None)
+    if game_journal: game_journal.room_removed(room.room_id)
+    print(f"SERVER ROOMS: Leerer Raum '{room.name}' ({room.room_id}) aufgelöst.")
+    return True
+
+
+# --- Absturz-Wiederherstellung (Write-Ahead-Log + Snapshots, siehe journal.py) ---
+# Jede Aktion, jeder Tick und jede Trennung meldet den Raum per journal_event() als geändert (ohne I/O). Der
+# Schreib-Thread des Journals kopiert die Räume gebündelt (unveränderte Spieler nicht erneut) und schreibt nur die Unterschiede.
+game_journal = None # GameJournal, wenn JOURNAL_DIR gesetzt ist
+
+def journal_event(room, event):
+    if game_journal and room is not None:
+        game_journal.mark_dirty(room, event)
+
+def _journal_copy(value):
+    """
+    JSON-taugliche Tiefenkopie des Spielzustands ohne Verbindungsobjekte (Sets und Tupel werden zu Listen).
+    Spieler eines PlayerRegistry werden nur kopiert, wenn sie sich seit der letzten Kopie geändert haben (siehe export()).
+    """
+    if isinstance(value, PlayerRegistry):
+        return value.export(_journal_copy)
+    if isinstance(value, PlayerRecord):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {key: _journal_copy(item) for key, item in value.items() if key != "client_conn"}
+    if isinstance(value, (list, tuple)):
+        return [_journal_copy(item) for item in value]
+    if isinstance(value, set):
+        return sorted(value)
+    return value
+
+def capture_room_for_journal(room):
+    with lock_profiler.section("journal"), room.lock:
+        if room.closed: return None
+        return {"name": room.name, "game_data": _journal_copy(room.game_data), "tick_state": dict(room.tick_state)}
+
+def restore_rooms(states):
+    """
+    Baut Räume aus gesicherten Zuständen (Journal oder Server-Übergabe, Format von capture_room_for_journal) wieder auf.
+    Spieler behalten Status, Punkte, Aufgaben und Fristen; ohne Verbindung haben sie RECOVERY_REJOIN_GRACE_SECONDS Zeit
+    für REJOIN_GAME, danach gelten sie als offline (siehe expire_recovery_grace).
+    """
+    grace_until = time.time() + RECOVERY_REJOIN_GRACE_SECONDS
+    for room_id, state in states.items():
+        if not is_local_room_id(room_id): # Anzahl der Worker hat sich geändert
+            print(f"SERVER RECOVERY: Raum {room_id} gehört nicht zu diesem Worker und wird übersprungen."); continue
+        room = GameRoom(room_id, state.get("name") or room_id)
+        game_data = state.get("game_data", {})
+        game_data["early_end_requests"] = set(game_data.get("early_end_requests", []))
+        for p_info in game_data.get("players", {}).values():
+            p_info["client_conn"] = None
+            if isinstance(p_info.get("addr"), list): p_info["addr"] = tuple(p_info["addr"])
+        game_data["players"] = PlayerRegistry(game_data.get("players", {})) # Datensätze und Indizes neu aufbauen
+        room.game_data.update(game_data)
+        room.task_board.rebuild(game_data.get("available_tasks", []), game_data.get("players", {}))
+        room.tick_state.update(state.get("tick_state", {}))
+        room.recovery_grace_until = grace_until
+        with rooms_lock:
+            rooms[room_id] = room
+        schedule_room_tick(room)
+        print(f"SERVER RECOVERY: Raum '{room.name}' ({room_id}) wiederhergestellt: Status {game_data.get('status')}, {len(game_data.get('players', {}))} Spieler.")
+
+def expire_recovery_grace(room, current_time):
+    """Markiert nach Ablauf der Frist alle Spieler als offline, die nach der Wiederherstellung nicht zurückgekehrt sind."""
+    if room.recovery_grace_until is None or current_time < room.recovery_grace_until: return
+    marked_offline = []
+    with room.lock:
+        room.recovery_grace_until = None
+        for p_id, p_info in room.game_data.get("players", {}).items():
+            if p_info.client_conn is None and p_info.status_ingame not in ["offline", "caught", "failed_task", "failed_loc_update"]:
+                p_info.status_before_offline = p_info.status_ingame
+                p_info.status_ingame = "offline"
+                marked_offline.append(p_info.name)
+        if not marked_offline: return
+        print(f"SERVER RECOVERY: Frist abgelaufen, offline in Raum {room.room_id}: {', '.join(marked_offline)}.")
+        game_ended = check_game_conditions_and_end(room) if room.game_data.get("status") == GAME_STATE_RUNNING else False
+    journal_event(room, "recovery_grace_expired")
+    request_game_state_broadcast(room, immediate=game_ended)
+
+def start_journal(directory, handed_over_states=None):
+    """
+    Lädt den letzten Stand aus `directory` (falls vorhanden) und startet das Mitschreiben. Vor dem Server-Start aufrufen.
+    Bei einer Server-Übergabe ist der übergebene Stand aktueller; das Journal wird dann nur fortgesetzt.
+    """
+    global game_journal
+    journal = GameJournal(directory, capture_room_for_journal)
+    journal_states = journal.load()
+    restore_rooms(journal_states if handed_over_states is None else handed_over_states)
+    game_journal = journal
+    for room in get_all_rooms():
+        journal_event(room, "recovered")
+    journal.start()
+
+
+# --- Unterbrechungsfreier Neustart (Übergabe an einen neuen Serverprozess) ---
+# Der laufende Server lauscht mit --control-socket PATH zusätzlich auf einem Unix-Socket. Ein neuer Prozess mit
+# --control-socket PATH --takeover meldet sich dort; der alte Prozess nimmt dann keine Verbindungen mehr an, hält
+# Spiel-Ticks und Aktionen an, übergibt Listening-Socket (SCM_RIGHTS) und den Stand aller Räume und wartet auf "ready".
+# Danach schickt er allen Clients "server_restart" (sofort neu verbinden) und beendet sich. Der neue Prozess nimmt auf
+# demselben Socket an, es gehen also keine Verbindungsversuche verloren; Fristen sind absolute Zeiten und laufen weiter.
+# Nachrichten auf dem Steuer-Socket: JSON-Kopfzeile (mit "body_bytes") + Nutzdaten; Dateideskriptoren hängen am Kopf.
+CONTROL_SOCKET_PATH = None # per --control-socket
+TAKEOVER_ON_START = False # per --takeover: beim Start einen laufenden Server über CONTROL_SOCKET_PATH ablösen
+TAKEOVER_TIMEOUT_SECONDS = 30
+RESTART_DRAIN_SECONDS = 1.0 # So lange bekommen die Ausgangs-Warteschlangen Zeit für den server_restart-Hinweis
+SERVER_RESTART_HINT = {"type": "server_restart", "message": "Server wird aktualisiert. Bitte sofort neu verbinden.", "reconnect_delay_ms": 0}
+
+# Von der Engine gesetzt: pause_accepting()/resume_accepting() blockieren, bis die Annahme wirklich ruht bzw. wieder läuft;
+# shutdown() beendet die Engine. accept_paused/accept_lock/stopped nutzt nur die Thread-Engine.
+restart_runtime = {"draining": False, "listen_socket": None, "pause_accepting": None, "resume_accepting": None, "shutdown": None,
+                   "accept_paused": False, "accept_lock": threading.Lock(), "stopped": threading.Event()}
+
+def _send_handover_message(sock, header, body=b"", fds=()):
+    socket.send_fds(sock, [json.dumps(dict(header, body_bytes=len(body))).encode("utf-8") + b"\n"], list(fds))
+    if body: sock.sendall(body)
+
+def _recv_handover_message(sock):
+    """Gibt (header, body, fds) zurück. ConnectionError, wenn die Gegenseite vorher schließt."""
+    buffer, fds = bytearray(), []
+    while b"\n" not in buffer:
+        data, new_fds, _, _ = socket.recv_fds(sock, 65536, 4)
+        fds += new_fds
+        if not data: raise ConnectionError("Steuer-Socket vorzeitig geschlossen.")
+        buffer += data
+    header_bytes, _, body = bytes(buffer).partition(b"\n")
+    header = json.loads(header_bytes)
+    body = bytearray(body)
+    while len(body) < header.get("body_bytes", 0):
+        data = sock.recv(1024 * 1024)
+        if not data: raise ConnectionError("Steuer-Socket während der Übertragung geschlossen.")
+        body += data
+    return header, bytes(body), fds
+
+def capture_all_rooms():
+    states = {}
+    for room in get_all_rooms():
+        state = capture_room_for_journal(room)
+        if state is not None: states[room.room_id] = state
+    return states
+
+def hand_over_to_new_process(control_conn):
+    """Alter Prozess: übergibt Listening-Socket und Spielstand. Gibt True zurück, wenn der neue Prozess übernommen hat."""
+    print("SERVER RESTART: Neuer Serverprozess meldet sich. Annahme und Spiellogik werden angehalten.")
+    restart_runtime["draining"] = True # Ab jetzt keine Aktionen und Ticks mehr, der Stand bleibt eingefroren
+    restart_runtime["pause_accepting"]()
+    if game_journal: game_journal.close() # Der neue Prozess schreibt das Journal fort
+    try:
+        body = json.dumps({"rooms": capture_all_rooms()}).encode("utf-8")
+        _send_handover_message(control_conn, {"type": "state"}, body, [restart_runtime["listen_socket"].fileno()])
+        control_conn.settimeout(TAKEOVER_TIMEOUT_SECONDS)
+        header, _, _ = _recv_handover_message(control_conn)
+        if header.get("type") != "ready": raise ConnectionError(f"Unerwartete Antwort: {header}")
+    except (OSError, ValueError) as e: # ConnectionError und socket.timeout sind OSErrors
+        print(f"SERVER RESTART: Übergabe gescheitert ({e}). Dieser Prozess läuft weiter.")
+        restart_runtime["draining"] = False
+        if game_journal: game_journal.start()
+        restart_runtime["resume_accepting"]()
+        return False
+    print(f"SERVER RESTART: Neuer Prozess hat übernommen ({len(body)} Bytes Spielstand). Clients werden zum Neuverbinden aufgefordert.")
+    for room in get_all_rooms():
+        with room.lock:
+            connections = [(p_id, p_info.client_conn, p_info.name) for p_id, p_info in room.game_data["players"].entries("connected")]
+        for p_id, conn, name in connections:
+            if _safe_send_json(conn, SERVER_RESTART_HINT, p_id, name):
+                try: conn.close() # Geordnet: der Hinweis wird vorher noch zugestellt
+                except OSError: pass
+    return True
+
+def control_socket_thread(path):
+    """Wartet auf einen neuen Serverprozess (--takeover) und übergibt an ihn."""
+    if os.path.exists(path): os.unlink(path) # Überbleibsel eines abgestürzten Prozesses
+    control_server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control_server.bind(path)
+    control_server.listen(1)
+    print(f"SERVER RESTART: Steuer-Socket bereit unter {path} (Neustart mit --takeover).")
+    while True:
+        control_conn, _ = control_server.accept()
+        try:
+            header, _, fds = _recv_handover_message(control_conn)
+            for fd in fds: socket.close(fd)
+            if header.get("type") == "takeover" and hand_over_to_new_process(control_conn):
+                control_server.close()
+                os.unlink(path) # Der neue Prozess legt den Steuer-Socket neu an, sobald wir die Verbindung schließen
+                time.sleep(RESTART_DRAIN_SECONDS)
+                control_conn.close()
+                restart_runtime["shutdown"]()
+                return
+        except (OSError, ValueError) as e:
+            print(f"SERVER RESTART: Fehler auf dem Steuer-Socket: {e}")
+        control_conn.close()
+
+def start_control_socket():
+    if CONTROL_SOCKET_PATH:
+        threading.Thread(target=control_socket_thread, args=(CONTROL_SOCKET_PATH,), daemon=True).start()
+
+def take_over_from_running_server(path):
+    """Neuer Prozess: holt Listening-Socket und Spielstand vom laufenden Server. Gibt (listen_socket, rooms, control_conn) zurück."""
+    print(f"SERVER RESTART: Übernehme laufenden Server über {path}...")
+    control_conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control_conn.settimeout(TAKEOVER_TIMEOUT_SECONDS)
+    control_conn.connect(path)
+    _send_handover_message(control_conn, {"type": "takeover"})
+    header, body, fds = _recv_handover_message(control_conn)
+    if header.get("type") != "state" or not fds:
+        raise OSError(f"Unerwartete Übergabe-Nachricht: {header}")
+    for fd in fds[1:]: socket.close(fd)
+    listen_socket = socket.socket(fileno=fds[0])
+    rooms_state = json.loads(body)["rooms"]
+    print(f"SERVER RESTART: Listening-Socket und {len(rooms_state)} Räume übernommen.")
+    return listen_socket, rooms_state, control_conn
+
+def complete_takeover(control_conn):
+    """Neuer Prozess, sobald er annimmt: meldet "ready", wartet auf das Ende des alten Prozesses und übernimmt den Steuer-Socket."""
+    try:
+        _send_handover_message(control_conn, {"type": "ready"})
+        control_conn.settimeout(None)
+        while control_conn.recv(4096): pass # Der alte Prozess schließt, nachdem er den Steuer-Socket freigegeben hat
+    except OSError as e:
+        print(f"SERVER RESTART: Steuerverbindung zum alten Prozess: {e}")
+    finally:
+        control_conn.close()
+    print("SERVER RESTART: Alter Prozess ist beendet. Übernahme abgeschlossen.")
+    start_control_socket()
+
+def open_listen_socket_and_restore_rooms():
+    """
+    Gemeinsamer Start beider Engines: Listening-Socket neu binden oder (mit --takeover) übernehmen, Räume aus der Übergabe
+    bzw. dem Journal wiederherstellen. Gibt (listen_socket, control_conn) zurück; control_conn ist None ohne Übergabe.
+    """
+    listen_socket = control_conn = handed_over_states = None
+    if TAKEOVER_ON_START:
+        listen_socket, handed_over_states, control_conn = take_over_from_running_server(CONTROL_SOCKET_PATH)
+    if JOURNAL_DIR: start_journal(JOURNAL_DIR, handed_over_states) # Stellt die Räume nach einem Absturz wieder her
+    elif handed_over_states is not None: restore_rooms(handed_over_states)
+    ensure_default_room() # Hauptraum mit frischer Lobby (falls nicht wiederhergestellt)
+    if listen_socket is None:
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Erlaube Wiederverwendung der Adresse
+        listen_socket.bind((HOST, PORT))
+        listen_socket.listen()
+    restart_runtime["listen_socket"] = listen_socket
+    if METRICS_PORT: start_metrics_http_server(server_metrics, METRICS_HOST, METRICS_PORT, METRICS_JSON_ROUTES)
+    return listen_socket, control_conn
+
+def announce_serving(control_conn):
+    """Aufruf der Engine, sobald sie annimmt: Übernahme abschließen bzw. den Steuer-Socket für spätere Neustarts öffnen."""
+    if control_conn is not None:
+        threading.Thread(target=complete_takeover, args=(control_conn,), daemon=True).start()
+    else:
+        start_control_socket()
+
+
+# --- Mehrprozess-Betrieb: Zuordnung Raum -> Worker ---
+# Mit --workers N nimmt ein Front-End-Prozess alle Verbindungen an und reicht jede an den Worker-Prozess ihres Raums weiter
+# (siehe ShardFrontEnd). Jeder Raum gehört fest zu genau einem Worker; shard_for_room() ist ein stabiler Hash, den
+# Front-End und Worker gleich berechnen. Im Einzelprozess-Betrieb (count == 1) ist jeder Raum lokal.
+shard_runtime = {"index": 0, "count": 1, "handoff": None, "directory": []}
+
+def shard_for_room(room_id, shard_count):
+    return zlib.crc32(room_id.encode("utf-8")) % shard_count # hash() ist pro Prozess zufällig und taugt hier nicht
+
+def is_local_room_id(room_id):
+    return shard_runtime["count"] <= 1 or shard_for_room(room_id, shard_runtime["count"]) == shard_runtime["index"]
+
+def shard_for_message(message, shard_count):
+    """
+    Worker, der eine Beitritts-/Erstnachricht bedienen muss, oder None, wenn jeder Worker sie bedienen kann (neuer Raum).
+    Ohne room_id ist der Hauptraum gemeint; REJOIN_GAME ohne room_id (ältere Clients) landet damit ebenfalls dort.
+    """
+    new_room_name = message.get("new_room_name")
+    if message.get("action") == "JOIN_GAME" and isinstance(new_room_name, str) and new_room_name.strip():
+        return None
+    room_id = message.get("room_id")
+    return shard_for_room(room_id if isinstance(room_id, str) else DEFAULT_ROOM_ID, shard_count)
+
+def remote_shard_for_join(message):
+    """Index des Workers, dem der Zielraum eines JOIN_GAME/REJOIN_GAME gehört, falls das nicht dieser Prozess ist."""
+    if shard_runtime["count"] <= 1: return None
+    shard = shard_for_message(message, shard_runtime["count"])
+    return shard if shard is not None and shard != shard_runtime["index"] else None
+
+
+def request_game_state_broadcast(room, immediate=False):
+    """Fordert einen Voll-Broadcast für einen Raum an. Normalerweise gebündelt, mit immediate=True (Spielstart/-ende) sofort."""
+    if immediate:
+        room.broadcast_coalescer.flush_now()
+    else:
+        room.broadcast_coalescer.mark_dirty()
+
+
+def broadcast_server_text_notification(room, message_text, target_player_ids=None, role_filter=None):
     """ Sendet eine einfache Text-Benachrichtigung an bestimmte oder alle Spieler. """
+    game_data = room.game_data
     message_data = {"type": "server_text_notification", "message": message_text}
     players_to_notify = []
-    with data_lock:
-        player_pool = target_player_ids if target_player_ids is not None else game_data.get("players", {}).keys()
+    with room.lock:
+        players = game_data["players"]
+        if target_player_ids is not None: player_pool = target_player_ids
+        elif role_filter in ("hider", "seeker"): player_pool = players.ids(role_filter + "s") # Rollenindex statt aller Spieler
+        else: player_pool = players.ids("connected")
         for p_id in player_pool:
-            p_info = game_data.get("players", {}).get(p_id)
-            if not p_info or not p_info.get("client_conn"): continue # Spieler nicht vorhanden oder nicht verbunden
-            if role_filter and p_info.get("current_role") != role_filter: continue # Rollenfilter
-            players_to_notify.append((p_id, p_info["client_conn"], p_info.get("name", "N/A")))
+            p_info = players.get(p_id)
+            if not p_info or not p_info.client_conn: continue # Spieler nicht vorhanden oder nicht verbunden
+            if role_filter and p_info.current_role != role_filter: continue # Rollenfilter
+            players_to_notify.append((p_id, p_info.client_conn, p_info.name))
 
     for p_id, conn, name in players_to_notify:
         _safe_send_json(conn, message_data, p_id, name)
 
 
-def check_game_conditions_and_end():
+def check_game_conditions_and_end(room):
     """Prüft, ob das Spiel beendet werden soll (Zeit abgelaufen, alle Hider gefangen etc.)."""
-    with data_lock:
+    game_data = room.game_data
+    with room.lock:
         current_game_status = game_data.get("status")
         if current_game_status != GAME_STATE_RUNNING: return False # Nur im laufenden Spiel prüfen
 
         current_time = time.time()
-        original_hiders_exist = False # Gab es überhaupt Hider zu Beginn?
-        active_hiders_in_game = 0 # Wie viele Hider sind noch aktiv?
-
-        # Iteriere über eine Kopie der Spielerliste, falls Spieler entfernt werden
-        for p_id, p_info in list(game_data.get("players", {}).items()): # list(...) erstellt eine Kopie
-            if not p_info: continue # Spieler wurde möglicherweise gerade entfernt
-
-            if p_info.get("original_role") == "hider":
-                original_hiders_exist = True
-                if p_info.get("status_ingame") == "active": # Zähle aktive Hider
-                    active_hiders_in_game += 1
-
-                # Hider-Task-Deadline-Prüfung
-                if p_info.get("current_role") == "hider" and p_info.get("status_ingame") == "active":
-                    if p_info.get("task") and p_info.get("task_deadline") and current_time > p_info["task_deadline"]:
-                        # Task-Zeit abgelaufen
-                        task_description_for_log = p_info.get('task',{}).get('description','N/A')
-                        player_name_for_log = p_info.get('name','N/A')
-                        if p_id in game_data.get("players", {}): # Sicherstellen, dass Spieler noch da ist
-                            game_data["players"][p_id]["task"] = None # Aufgabe entfernen
-                            game_data["players"][p_id]["task_deadline"] = None
-                            broadcast_server_text_notification(f"Hider {player_name_for_log} hat Aufgabe '{task_description_for_log}' NICHT rechtzeitig geschafft! Aufgabe entfernt.")
-                            assign_task_to_hider(p_id) # Neue Aufgabe zuweisen
+        players = game_data["players"]
+
+        # Hider-Task-Deadline-Prüfung: nur die abgelaufenen Fristen aus dem Index, nicht alle Spieler
+        for p_id in room.task_board.pop_expired(current_time):
+            p_info = players.get(p_id)
+            if not p_info or not p_info.task: # Spieler entfernt oder Aufgabe inzwischen weg
+                room.task_board.release(p_id); continue
+            if p_info.current_role != "hider" or p_info.status_ingame != "active":
+                room.task_board.defer_overdue(p_id); continue # z.B. offline: kann die Aufgabe noch nachreichen
+            # Task-Zeit abgelaufen
+            task_description_for_log = p_info.task.get('description','N/A')
+            player_name_for_log = p_info.name
+            clear_hider_task(room, p_info, p_id) # Aufgabe entfernen
+            broadcast_server_text_notification(room, f"Hider {player_name_for_log} hat Aufgabe '{task_description_for_log}' NICHT rechtzeitig geschafft! Aufgabe entfernt.")
+            assign_task_to_hider(room, p_id) # Neue Aufgabe zuweisen
+            request_game_state_broadcast(room) # Neue Aufgabe sofort zeigen, nicht erst mit dem nächsten Countdown-Update
+
+        original_hiders_exist = players.count("original_hiders") > 0 # Gab es überhaupt Hider zu Beginn?
+        active_hiders_in_game = players.count("remaining_hiders") # Wie viele Hider sind noch aktiv?
 
         # Gewinnbedingung: Alle Hider gefangen/ausgeschieden
         if original_hiders_exist and active_hiders_in_game == 0:
@@ -523,8 +1644,7 @@ def check_game_conditions_and_end():
             return True # Spiel ist beendet
 
         # Gewinnbedingung: Keine Hider zu Spielbeginn (oder alle haben vor Start verlassen)
-        if not original_hiders_exist and len(game_data.get("players", {})) >= 1 and \
-           any(p.get("confirmed_for_lobby") for p in game_data.get("players", {}).values()):
+        if not original_hiders_exist and len(players) >= 1 and players.count("lobby_confirmed") > 0:
             game_data["status"] = GAME_STATE_SEEKER_WINS
             game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_SEEKER_WINS]
             game_data["game_over_message"] = "Keine Hider im Spiel gestartet. Seeker gewinnen!"
@@ -533,10 +1653,9 @@ def check_game_conditions_and_end():
             return True
 
         # Gewinnbedingung: Spielzeit abgelaufen
-        if game_data.get("game_end_time") and current_time > game_data["game_end_time"]:
+        if game_data.get("game_end_time") and current_time >= game_data["game_end_time"]:
             # Zähle finale aktive Hider
-            final_active_hiders_at_timeout = sum(1 for p_info_final in game_data.get("players", {}).values()
-                                                 if p_info_final.get("current_role") == "hider" and p_info_final.get("status_ingame") == "active")
+            final_active_hiders_at_timeout = players.count("active_hiders")
             if final_active_hiders_at_timeout > 0:
                 game_data["status"] = GAME_STATE_HIDER_WINS
                 game_data["game_over_message"] = "Zeit abgelaufen. Hider gewinnen!"
@@ -550,407 +1669,476 @@ def check_game_conditions_and_end():
 
         return False # Spiel läuft weiter
 
-def handle_client_connection(conn, addr):
-    player_id = None
-    player_name_for_log = "Unbekannt_Init" # Für Logs, bevor Spieler-ID bekannt ist
-    action_for_log = "N/A" # Für Logging bei Fehlern
+def new_client_session():
+    """Erstellt den Verbindungszustand eines Clients (unabhängig davon, ob Thread- oder asyncio-Engine)."""
+    return {
+        "player_id": None,
+        "room": None, # GameRoom nach JOIN_GAME/REJOIN_GAME
+        "player_name_for_log": "Unbekannt_Init", # Für Logs, bevor Spieler-ID bekannt ist
+        "action_for_log": "N/A", # Für Logging bei Fehlern
+    }
+
+def resolve_room_for_join(message):
+    """
+    Bestimmt den Zielraum für JOIN_GAME/REJOIN_GAME: neuer Raum ("new_room_name", nur JOIN_GAME), bestehender Raum
+    ("room_id") oder - ohne Angabe - der Raum des zurückkehrenden Spielers bzw. der Hauptraum.
+    Gibt (room, None) oder (None, Fehlermeldung) zurück.
+    """
+    new_room_name = message.get("new_room_name")
+    if message.get("action") == "JOIN_GAME" and isinstance(new_room_name, str) and new_room_name.strip():
+        room = create_room(new_room_name)
+        return (room, None) if room else (None, f"Maximale Anzahl an Räumen ({MAX_ROOMS}) erreicht.")
+    room_id = message.get("room_id")
+    if room_id is not None:
+        room = get_room(room_id) if isinstance(room_id, str) else None
+        return (room, None) if room else (None, f"Raum '{room_id}' nicht gefunden.")
+    if message.get("action") == "REJOIN_GAME" and isinstance(message.get("player_id"), str):
+        room = find_room_of_player(message["player_id"])
+        if room: return room, None
+    return ensure_default_room(), None
+
+def process_client_message(conn, addr, session, message):
+    """
+    Verarbeitet eine einzelne, bereits geparste Client-Nachricht.
+    Wird von beiden Server-Engines (Threads und asyncio) verwendet, damit die Aktions-Semantik identisch bleibt.
+    Gibt False zurück, wenn die Verbindung anschließend beendet werden soll.
+    """
+    player_id = session["player_id"]
+    player_name_for_log = session["player_name_for_log"]
+    action = message.get("action"); session["action_for_log"] = action # Für Logging
     # NEUES LOG
-    print(f"SERVER HANDLER: Thread für {addr} gestartet. Socket: {conn}")
-    try:
-        buffer = ""
-        while True: # Schleife für Nachrichtenempfang
-            try:
-                # Das folgende Log kann sehr gesprächig sein. Für Debugging von Verbindungsabbrüchen aktivieren.
-                # print(f"SERVER HANDLER ({addr}, P:{player_id}, Name:{player_name_for_log}): Wartet auf Daten (recv)...")
-                data_chunk = conn.recv(4096) # Empfange bis zu 4KB Daten
-                # NEUES LOG - Dieses ist sehr wichtig!
-                print(f"SERVER HANDLER ({addr}, P:{player_id}, Name:{player_name_for_log}): Empfangen {len(data_chunk)} bytes.")
-                if not data_chunk: # Client hat Verbindung geschlossen
-                    print(f"SERVER COMM: Client {addr} (P:{player_id}, Name:{player_name_for_log}) hat Verbindung geschlossen (recv returned empty).")
-                    break # Beendet die while True Schleife -> führt zu finally Block
-                buffer += data_chunk.decode('utf-8') # Dekodiere und füge zum Puffer hinzu
-
-                # Verarbeite alle vollständigen Nachrichten im Puffer (durch '\n' getrennt)
-                while '\n' in buffer:
-                    message_str, buffer = buffer.split('\n', 1) # Trenne erste Nachricht ab
-                    if not message_str.strip(): continue # Ignoriere leere Zeilen
-                    message = json.loads(message_str) # Parse JSON
-                    action = message.get("action"); action_for_log = action # Für Logging
-                    # NEUES LOG
-                    print(f"SERVER HANDLER ({addr}, P:{player_id}, Name:{player_name_for_log}): Aktion '{action}' empfangen.")
-
-
-                    # *** BEGINN der Nachrichtenverarbeitung unter Lock ***
-                    with data_lock:
-                        current_game_status_in_handler = game_data.get("status")
-
-                        # --- FORCE_SERVER_RESET_FROM_CLIENT ---
-                        if action == "FORCE_SERVER_RESET_FROM_CLIENT":
-                            client_name_for_reset_log = player_name_for_log if player_id else f"Client {addr[0]}:{addr[1]}"
-                            print(f"SERVER ADMIN: {client_name_for_reset_log} hat Server-Reset (FORCE_SERVER_RESET_FROM_CLIENT) angefordert.")
-                            reset_message_for_clients = f"Server wurde von '{client_name_for_reset_log}' zurückgesetzt. Bitte neu beitreten."
-                            reset_game_to_initial_state(notify_clients_about_reset=True, reset_message=reset_message_for_clients)
-                            ack_payload = {"type": "acknowledgement", "message": "Server wurde erfolgreich zurückgesetzt."}
-                            _safe_send_json(conn, ack_payload, player_id, player_name_for_log)
-                            # NEUES LOG
-                            print(f"SERVER ADMIN: Reset durch {client_name_for_reset_log} abgeschlossen. Handler-Thread wird beendet.")
-                            return # Beendet den Handler-Thread nach Reset
-
-                        # --- JOIN_GAME (Neuer Spieler) ---
-                        if action == "JOIN_GAME" and player_id is None: # Nur wenn noch keine player_id für diesen Handler
-                            p_name = message.get("name", f"Anon_{random.randint(1000,9999)}")
-                            MAX_NICKNAME_LENGTH = 50
-                            if len(p_name) > MAX_NICKNAME_LENGTH:
-                                p_name = p_name[:MAX_NICKNAME_LENGTH] + "..."
-                                print(f"SERVER JOIN WARN: Nickname von {addr} auf {MAX_NICKNAME_LENGTH} Zeichen gekürzt.")
-                            p_role_pref = message.get("role_preference", "hider") # Standard "hider"
-                            if p_role_pref not in ["hider", "seeker"]: p_role_pref = "hider"
-                            player_name_for_log = p_name # Aktualisiere Log-Namen
-
-                            # Prüfe, ob Name bereits von einem aktiven Spieler verwendet wird
-                            is_name_taken = False
-                            for pid_check, pinfo_check in game_data.get("players", {}).items():
-                                if pinfo_check.get("name") == p_name and pinfo_check.get("client_conn") is not None and pid_check != player_id: # Ignoriere eigenen Eintrag, falls Rejoin-Logik später angepasst wird
-                                    is_name_taken = True; break
-                            if is_name_taken:
-                                print(f"SERVER JOIN (FAIL): Name '{p_name}' ist bereits von einem aktiven Spieler belegt. {addr}")
-                                error_payload = {
-                                    "type": "game_update", "player_id": None, # Wichtig: Client ID bleibt None
-                                    "error_message": f"Name '{p_name}' bereits vergeben. Wähle einen anderen Namen.",
-                                    "join_error": f"Name '{p_name}' bereits vergeben.", # Spezifischer Fehler für Join-Screen
-                                    "game_state": { "status": "disconnected", "status_display": "Beitritt fehlgeschlagen."}
-                                }
-                                _safe_send_json(conn, error_payload, "N/A_JOIN_FAIL_NAME_TAKEN", p_name)
-                                return # Beendet Handler, Client muss neuen Namen wählen
-
-                            # Generiere eindeutige Player-ID
-                            base_id = str(addr[1]) + "_" + str(random.randint(1000, 9999)) # Port + Zufallszahl
-                            id_counter = 0; temp_id_candidate = base_id
-                            while temp_id_candidate in game_data.get("players", {}): # Sicherstellen, dass ID wirklich neu ist
-                                id_counter += 1; temp_id_candidate = f"{base_id}_{id_counter}"
-                            player_id = temp_id_candidate # Eindeutige ID für diesen Handler/Spieler
-                            player_entry_data = {
-                                "addr": addr, "name": p_name, "original_role": p_role_pref, "current_role": p_role_pref,
-                                "location": None, "last_seen": time.time(), "client_conn": conn,
-                                "confirmed_for_lobby": True, "is_ready": False, "status_ingame": "active",
-                                "status_before_offline": "active", "points": 0, "has_pending_location_warning": False,
-                                "last_location_update_after_warning": 0, "warning_sent_time": 0, "last_location_timestamp": 0,
-                                "task": None, "task_deadline": None,
-                                "task_skips_available": INITIAL_TASK_SKIPS if p_role_pref == "hider" else 0,
-                                "is_waiting_for_lobby": False # Standardmäßig nicht wartend
-                            }
-
-                            if current_game_status_in_handler in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS]:
-                                # Wenn das Spiel gerade beendet wurde und ein neuer Spieler joined, resette den Server für eine neue Runde
-                                print(f"SERVER JOIN: Spiel war beendet. Server wird für neue Runde zurückgesetzt, {p_name} ({player_id}) tritt bei.")
-                                reset_game_to_initial_state(notify_clients_about_reset=False) # Kein Broadcast an alte Spieler nötig hier
-                                current_game_status_in_handler = game_data.get("status") # Status ist jetzt 'lobby'
-                                game_data.setdefault("players", {})[player_id] = player_entry_data
-                                send_data_to_one_client(conn, player_id) # Sende Zustand an neuen Spieler
-                                broadcast_full_game_state_to_all(exclude_pid=player_id) # Informiere andere
-                            elif current_game_status_in_handler in [GAME_STATE_HIDER_WAIT, GAME_STATE_RUNNING]:
-                                # Spiel läuft, Spieler kommt auf die Warteliste
-                                player_entry_data["is_waiting_for_lobby"] = True
-                                game_data.setdefault("players", {})[player_id] = player_entry_data
-                                print(f"SERVER JOIN-PLAYER-WAITING: {p_name} ({player_id}) von {addr} zur Warteliste hinzugefügt (Spiel läuft).")
-                                join_wait_message = {
-                                    "type": "game_update", "player_id": player_id,
-                                    "player_name": p_name, "role": p_role_pref, "is_waiting_for_lobby": True,
-                                    "game_state": { "status": "waiting_for_lobby", "status_display": "Warten auf nächste Lobby-Runde. Du bist registriert." },
-                                    "message": "Spiel läuft. Du bist auf der Warteliste."
-                                }
-                                _safe_send_json(conn, join_wait_message, player_id, p_name)
-                            else: # Spiel ist in der Lobby, normaler Beitritt
-                                game_data.setdefault("players", {})[player_id] = player_entry_data
-                                print(f"SERVER JOIN-PLAYER-CREATED (lobby): {p_name} ({player_id}) von {addr}.")
-                                send_data_to_one_client(conn, player_id) # Sende Zustand an neuen Spieler
-                                broadcast_full_game_state_to_all(exclude_pid=player_id) # Informiere andere (falls vorhanden)
-                            continue # Zurück zum Anfang der recv-Schleife für diesen Client
-
-                        # --- REJOIN_GAME (Spieler kehrt zurück) ---
-                        elif action == "REJOIN_GAME" and player_id is None: # Nur wenn dieser Handler noch keine ID hat
-                            rejoin_player_id = message.get("player_id")
-                            rejoin_player_name = message.get("name") # Client sendet seinen gespeicherten Namen
-                            action_for_log = f"REJOIN_GAME (Attempt ID: {rejoin_player_id}, Name: {rejoin_player_name})"
-                            found_player_to_rejoin = False
-                            if rejoin_player_id and rejoin_player_id in game_data.get("players", {}):
-                                player_entry = game_data["players"][rejoin_player_id]
-                                # Überprüfe, ob der Name übereinstimmt (optional, aber gut für Konsistenz)
-                                if player_entry.get("name") != rejoin_player_name:
-                                    print(f"SERVER REJOIN WARN: Name mismatch for ID {rejoin_player_id}. Client: '{rejoin_player_name}', Server: '{player_entry.get('name')}'. Rejoin trotzdem erlaubt.")
-                                
-                                # Alte Verbindung des Spielers (falls vorhanden und anders) schließen
-                                old_conn = player_entry.get("client_conn")
-                                if old_conn and old_conn != conn:
-                                    print(f"SERVER REJOIN: Spieler {player_entry.get('name')} ({rejoin_player_id}) hatte alte Verbindung. Aktualisiere auf neue.")
-                                    try: # Versuche alte Verbindung sauber zu schließen
-                                        old_conn.shutdown(socket.SHUT_RDWR)
-                                        old_conn.close()
-                                    except Exception as e: print(f"SERVER REJOIN WARN: Fehler beim Schließen alter Verbindung für {rejoin_player_id}: {e}")
-                                
-                                # Aktualisiere Spielerdaten mit neuer Verbindung
-                                player_entry["client_conn"] = conn # Neue Verbindung zuweisen
-                                player_entry["addr"] = addr
-                                player_entry["last_seen"] = time.time() # Update "zuletzt gesehen"
-                                player_id = rejoin_player_id # Handler ist jetzt diesem Spieler zugeordnet
-                                player_name_for_log = player_entry.get("name", rejoin_player_name) # Für Logs
-                                found_player_to_rejoin = True
-
-                                # Wenn Spieler als "offline" markiert war, wieder aktivieren
-                                if player_entry.get("status_ingame") == "offline":
-                                    previous_status = player_entry.get("status_before_offline", "active")
-                                    player_entry["status_ingame"] = previous_status
-                                    player_entry.pop("status_before_offline", None) # Entferne temporären Status
-                                    broadcast_server_text_notification(f"Spieler {player_entry.get('name', rejoin_player_name)} ist wieder online (Status: {previous_status}).")
-                                    print(f"SERVER REJOIN: Spieler {player_name_for_log} ({player_id}) Status von 'offline' auf '{previous_status}' gesetzt.")
-                                
-                                print(f"SERVER REJOIN (SUCCESS): Spieler {player_name_for_log} ({player_id}) re-assoziiert mit neuer Verbindung von {addr}")
-                                send_data_to_one_client(conn, player_id) # Sende aktuellen Zustand an den re-joined Spieler
-                                broadcast_full_game_state_to_all(exclude_pid=player_id) # Informiere andere
-                            else:
-                                print(f"SERVER REJOIN (FAIL): Spieler-ID '{rejoin_player_id}' nicht gefunden für {addr}.")
-                                rejoin_fail_payload = {
-                                    "type": "game_update", "player_id": None, # Signalisiert Client, dass Rejoin fehlgeschlagen
-                                    "error_message": f"Rejoin fehlgeschlagen. Spieler-ID '{rejoin_player_id}' nicht mehr gültig oder gefunden.",
-                                    "join_error": f"Rejoin fehlgeschlagen. Spieler-ID '{rejoin_player_id}' nicht mehr gültig oder gefunden.",
-                                    "game_state": { "status": "disconnected", "status_display": "Rejoin fehlgeschlagen."}
-                                }
-                                _safe_send_json(conn, rejoin_fail_payload, "N/A_REJOIN_FAIL", "N/A_REJOIN_FAIL")
-                                return # Beendet Handler, Client muss sich neu als neuer Spieler registrieren
-                            continue # Zurück zum Anfang der recv-Schleife
-
-                        # --- Authentifizierung für weitere Aktionen ---
-                        if not player_id or player_id not in game_data.get("players", {}):
-                            print(f"SERVER WARN: Unauthentifizierter/Entfernter Client von {addr} sendet Aktion '{action}'. Player_id im Handler: {player_id}. Verbindung wird getrennt.")
-                            error_payload_unauth = {
-                                "type":"game_update", "player_id": None, # Wichtig: Client ID entfernen
-                                "message":"Nicht authentifiziert oder aus Spiel entfernt. Bitte neu beitreten.",
-                                "join_error": "Sitzung ungültig oder abgelaufen. Bitte neu beitreten.",
-                                "game_state": {"status": "disconnected", "status_display": "Sitzung ungültig."}
-                            }
-                            _safe_send_json(conn, error_payload_unauth, "N/A_UNAUTH", "N/A_UNAUTH")
-                            return # Beendet Handler-Thread
-
-                        # Ab hier hat der Client eine gültige player_id und ist im Spiel
-                        current_player_data = game_data["players"][player_id]
-                        current_player_data["last_seen"] = time.time() # Update "zuletzt gesehen"
-                        if current_player_data.get("client_conn") != conn: # Falls sich Conn geändert hat (sollte durch Rejoin abgedeckt sein)
-                            current_player_data["client_conn"] = conn
-                        player_name_for_log = current_player_data.get("name", "N/A") # Aktualisiere für Logs
-
-
-                        # --- Weitere Spielaktionen ---
-                        if action == "SET_READY":
-                            if current_game_status_in_handler == GAME_STATE_LOBBY and current_player_data.get("confirmed_for_lobby"):
-                                current_player_data["is_ready"] = message.get("ready_status") == True
-                                print(f"SERVER ACTION: P:{player_id} ({player_name_for_log}) gesetzt auf is_ready={current_player_data['is_ready']}.")
-                                broadcast_full_game_state_to_all()
-                            else:
-                                print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) SET_READY in falschem Status/Konf. ({current_game_status_in_handler}, confirmed={current_player_data.get('confirmed_for_lobby')}).")
-                                send_data_to_one_client(conn, player_id) # Sende aktuellen (unveränderten) Zustand
-                        elif action == "UPDATE_LOCATION":
-                            lat, lon = message.get("lat"), message.get("lon")
-                            accuracy = message.get("accuracy") # Kann None sein, wenn nicht vom Client gesendet
-                            if isinstance(lat, (float, int)) and isinstance(lon, (float, int)):
-                                current_player_data["location"] = [lat, lon, accuracy]
-                                current_player_data["last_location_timestamp"] = time.time()
-                                # Prüfe, ob dies ein Update nach einer Warnung ist
-                                if current_player_data.get("has_pending_location_warning"):
-                                    if time.time() > current_player_data.get("warning_sent_time", 0): # Nur wenn Warnung schon gesendet wurde
-                                         current_player_data["last_location_update_after_warning"] = time.time()
-                                # Kein voller Broadcast hier, da Standortupdates häufig sind.
-                                # Der Client erhält eine Bestätigung indirekt durch das nächste reguläre game_update.
-                                # Optional: eine kleine Ack-Nachricht senden, wenn Performance kein Problem ist.
-                                send_data_to_one_client(conn, player_id) # Update an den Client selbst ist ok
-                            else:
-                                print(f"SERVER WARN: Ungültige Standortdaten von P:{player_id} ({player_name_for_log}): lat={lat}, lon={lon}")
-                                _safe_send_json(conn, {"type":"error", "message":"Ungültige Standortdaten empfangen."}, player_id, player_name_for_log)
-                        elif action == "TASK_COMPLETE":
-                            status_changed = False
-                            if current_player_data["current_role"] == "hider" and \
-                               current_player_data["status_ingame"] == "active" and \
-                               current_player_data.get("task"): # Spieler muss eine aktive Aufgabe haben
-                                task_details = current_player_data["task"]
-                                if time.time() <= current_player_data.get("task_deadline", 0): # Innerhalb der Zeit
-                                    current_player_data["points"] += task_details.get("points", 0)
-                                    broadcast_server_text_notification(f"Hider {player_name_for_log} hat Aufgabe '{task_details.get('description', 'N/A')}' erledigt!")
-                                    current_player_data["task"], current_player_data["task_deadline"] = None, None
-                                    assign_task_to_hider(player_id); status_changed = True
-                                else: # Aufgabe zu spät
-                                    task_description_for_log = current_player_data.get("task",{}).get('description','N/A')
-                                    current_player_data["task"], current_player_data["task_deadline"] = None, None
-                                    broadcast_server_text_notification(f"Hider {player_name_for_log} hat Aufgabe '{task_description_for_log}' zu spät eingereicht! Aufgabe entfernt.")
-                                    assign_task_to_hider(player_id); status_changed = True # Status änderte sich (Aufgabe weg)
-                            if status_changed:
-                                if check_game_conditions_and_end(): pass # Prüfe ob Spiel vorbei
-                                broadcast_full_game_state_to_all()
-                            else:
-                                print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) TASK_COMPLETE nicht möglich (kein Hider, nicht aktiv, keine Aufgabe).")
-                                send_data_to_one_client(conn, player_id)
-                        elif action == "TASK_COMPLETE_OFFLINE":
-                            task_id_offline = message.get("task_id")
-                            completed_at_offline_ts = message.get("completed_at_timestamp_offline")
-                            status_changed_offline, ack_msg_to_client, err_msg_to_client = False, None, None
-                            if not task_id_offline or not isinstance(completed_at_offline_ts, (int, float)):
-                                err_msg_to_client = "Ungültige Daten für Offline-Aufgabenerledigung."
-                            elif current_player_data.get("current_role") == "hider" and \
-                                 current_player_data.get("status_ingame") not in ["caught", "failed_task", "failed_loc_update"]: # Muss noch im Spiel sein
-                                server_task_info = current_player_data.get("task")
-                                server_task_deadline = current_player_data.get("task_deadline")
-                                if server_task_info and server_task_info.get("id") == task_id_offline:
-                                    # Aufgabe stimmt überein
-                                    if completed_at_offline_ts <= server_task_deadline:
-                                        current_player_data["points"] += server_task_info.get("points", 0)
-                                        task_desc_log = server_task_info.get('description', 'N/A')
-                                        time_diff_str = format_time_ago(time.time() - completed_at_offline_ts)
-                                        broadcast_server_text_notification(f"Hider {player_name_for_log} hat Aufgabe '{task_desc_log}' erledigt (offline vor ca. {time_diff_str} nachgereicht).")
-                                        ack_msg_to_client = f"Offline erledigte Aufgabe '{task_desc_log}' erfolgreich angerechnet."
-                                        current_player_data["task"], current_player_data["task_deadline"] = None, None
-                                        assign_task_to_hider(player_id); status_changed_offline = True
-                                    else:
-                                        err_msg_to_client = f"Offline erledigte Aufgabe (ID: {task_id_offline}) war laut Server-Deadline bereits zum Offline-Zeitpunkt abgelaufen."
-                                        # Aufgabe trotzdem entfernen und neue zuweisen
-                                        current_player_data["task"], current_player_data["task_deadline"] = None, None
-                                        assign_task_to_hider(player_id) ; status_changed_offline = True # Aufgabe hat sich geändert
-                                else: # Client meldet eine Aufgabe, die nicht (mehr) die aktuelle serverseitige ist
-                                    err_msg_to_client = f"Gemeldete Offline-Aufgabe (ID: {task_id_offline}) ist nicht (mehr) deine aktuelle Server-Aufgabe."
-                            else: err_msg_to_client = "Offline-Aufgabe kann nicht angerechnet werden (falsche Rolle oder Spielerstatus)."
-
-                            if err_msg_to_client: _safe_send_json(conn, {"type": "error", "message": err_msg_to_client}, player_id, player_name_for_log)
-                            if ack_msg_to_client: _safe_send_json(conn, {"type": "acknowledgement", "message": ack_msg_to_client}, player_id, player_name_for_log)
-
-                            if status_changed_offline:
-                                if check_game_conditions_and_end(): pass # Prüfe ob Spiel vorbei
-                                broadcast_full_game_state_to_all()
-                            else: send_data_to_one_client(conn, player_id) # Nur eigenen Status aktualisieren
-                        elif action == "SKIP_TASK":
-                            task_skipped_successfully = False; error_message_to_client = None; ack_message_to_client = None
-                            if current_player_data["current_role"] == "hider" and current_player_data["status_ingame"] == "active":
-                                if current_player_data.get("task"): # Hat eine Aufgabe
-                                    if current_player_data.get("task_skips_available", 0) > 0:
-                                        current_player_data["task_skips_available"] -= 1
-                                        skipped_task_desc = current_player_data["task"].get("description", "Unbekannte Aufgabe")
-                                        current_player_data["task"], current_player_data["task_deadline"] = None, None
-                                        assign_task_to_hider(player_id); task_skipped_successfully = True
-                                        ack_message_to_client = f"Aufgabe '{skipped_task_desc}' übersprungen. Verbleibende Skips: {current_player_data['task_skips_available']}."
-                                        broadcast_server_text_notification(f"Hider {player_name_for_log} hat eine Aufgabe übersprungen.")
-                                    else: error_message_to_client = "Keine Aufgaben-Skips mehr verfügbar."
-                                else: error_message_to_client = "Du hast keine aktive Aufgabe zum Überspringen."
-                            else: error_message_to_client = "Aufgabe kann derzeit nicht übersprungen werden (falsche Rolle/Status)."
-
-                            if error_message_to_client: _safe_send_json(conn, {"type": "error", "message": error_message_to_client}, player_id, player_name_for_log)
-                            if ack_message_to_client: _safe_send_json(conn, {"type": "acknowledgement", "message": ack_message_to_client}, player_id, player_name_for_log)
-
-                            if task_skipped_successfully:
-                                if check_game_conditions_and_end(): pass
-                                broadcast_full_game_state_to_all()
-                            else: send_data_to_one_client(conn,player_id) # Nur eigenen Status aktualisieren (z.B. für Fehlermeldung)
-                        elif action == "CATCH_HIDER":
-                            hider_id_to_catch = message.get("hider_id_to_catch"); caught = False
-                            if current_player_data["current_role"] == "seeker" and \
-                               current_game_status_in_handler == GAME_STATE_RUNNING and \
-                               hider_id_to_catch in game_data.get("players", {}): # Hider muss existieren
-                                hider_player_data = game_data["players"][hider_id_to_catch]
-                                if hider_player_data.get("current_role") == "hider" and hider_player_data.get("status_ingame") == "active":
-                                    hider_player_data["current_role"] = "seeker" # Gefangener Hider wird zum Seeker
-                                    hider_player_data["status_ingame"] = "caught"
-                                    hider_player_data["task"], hider_player_data["task_deadline"] = None, None # Keine Aufgaben mehr
-                                    hider_player_data["task_skips_available"] = 0 # Keine Skips mehr
-                                    broadcast_server_text_notification(f"Seeker {player_name_for_log} hat Hider {hider_player_data.get('name','N/A')} gefangen!")
-                                    print(f"SERVER ACTION: Seeker {player_name_for_log} ({player_id}) hat Hider {hider_player_data.get('name','N/A')} ({hider_id_to_catch}) gefangen.")
-                                    caught = True
-                                else: _safe_send_json(conn, {"type":"error", "message":f"Hider {hider_player_data.get('name','N/A')} kann nicht gefangen werden (falsche Rolle/Status oder Offline)."}, player_id, player_name_for_log)
-                            else: _safe_send_json(conn, {"type":"error", "message":f"Aktion 'Fangen' nicht möglich (falsche Rolle/Status oder Hider nicht gefunden)."}, player_id, player_name_for_log)
-                            if caught:
-                                if check_game_conditions_and_end(): pass # Prüfe, ob Spiel vorbei ist
-                                broadcast_full_game_state_to_all()
-                            else: send_data_to_one_client(conn, player_id) # Nur eigenen Status aktualisieren
-                        elif action == "RETURN_TO_REGISTRATION": # Spieler will Name/Rolle in Lobby ändern
-                            if current_game_status_in_handler == GAME_STATE_LOBBY and player_id in game_data.get("players", {}):
-                                print(f"SERVER ACTION: Spieler {player_name_for_log} ({player_id}) kehrt zur Registrierung zurück.")
-                                del game_data["players"][player_id] # Spieler aus dem Spiel entfernen
-                                # Client-seitig wird player_id auf None gesetzt durch diese Nachricht
-                                reset_payload = { "type": "game_update", "player_id": None, "join_error": None, "game_message": "Bitte gib deine Details erneut ein." }
-                                _safe_send_json(conn, reset_payload, player_id, player_name_for_log)
-                                player_id = None; player_name_for_log = "Unbekannt_Nach_Reset" # Handler hat keine ID mehr
-                                broadcast_full_game_state_to_all() # Andere Spieler informieren
-                            else: send_data_to_one_client(conn, player_id) # Nicht erlaubte Aktion, nur Status senden
-                        elif action == "LEAVE_GAME_AND_GO_TO_JOIN": # Spieler verlässt das Spiel komplett
-                            print(f"SERVER LEAVE: Spieler {player_name_for_log} ({player_id}) verlässt das Spiel.")
-                            if player_id in game_data.get("players", {}):
-                                # Markiere Spieler als "ausgeschieden" oder ähnlich, falls das Spiel noch läuft
-                                if game_data["players"][player_id].get("status_ingame") == "active":
-                                     game_data["players"][player_id]["status_ingame"] = "failed_loc_update" # Oder ein spezifischer "left_game" Status
-                                     game_data["players"][player_id]["current_role"] = "seeker" # Verhindert, dass er als Hider gewinnt
-                                     game_data["players"][player_id]["task"] = None; game_data["players"][player_id]["task_deadline"] = None
-                                     game_data["players"][player_id]["task_skips_available"] = 0
-                                     game_data["players"][player_id].pop("status_before_offline", None) # Offline Status irrelevant
-                                     broadcast_server_text_notification(f"Spieler {player_name_for_log} hat das Spiel vorzeitig verlassen.")
-                                # Spieler wird nicht aus game_data["players"] gelöscht, um ihn im Leaderboard etc. zu behalten,
-                                # aber seine Verbindung wird getrennt und er kann nicht mehr teilnehmen.
-                            # Sende eine Bestätigung, aber setze player_id in der Antwort nicht auf None.
-                            # Der Client wird selbst user_has_initiated_connection auf False setzen.
-                            _safe_send_json(conn, {"type": "acknowledgement", "message": "Du hast das Spiel verlassen."}, player_id, player_name_for_log)
-                            # Wichtig: Der Handler-Thread wird durch return beendet, Client muss Socket schließen.
-                            # Der player_id bleibt für diesen Handler-Aufruf bestehen, wird aber im finally-Block behandelt.
-                            player_id = None # Signalisiert dem finally Block, dass dieser Spieler nicht mehr aktiv ist.
-                            broadcast_full_game_state_to_all() # Andere informieren
-                            return # Beendet den Handler-Thread
-                        elif action == "REQUEST_EARLY_ROUND_END":
-                            if current_game_status_in_handler in [GAME_STATE_RUNNING, GAME_STATE_HIDER_WAIT] and \
-                               current_player_data.get("status_ingame") == "active" and \
-                               current_player_data.get("confirmed_for_lobby"):
-                                game_data.setdefault("early_end_requests", set()).add(player_id)
-                                game_data["total_active_players_for_early_end"] = count_active_players_for_early_end() # Neu zählen
-                                # Prüfe, ob genug Spieler für ein vorzeitiges Ende gestimmt haben
-                                if game_data["total_active_players_for_early_end"] > 0 and \
-                                   len(game_data["early_end_requests"]) >= game_data["total_active_players_for_early_end"]:
-                                    # Alle aktiven Spieler wollen das Spiel beenden
-                                    game_data["status"] = GAME_STATE_SEEKER_WINS # Standardmäßig gewinnen Seeker bei Abbruch
-                                    game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_SEEKER_WINS]
-                                    game_data["game_over_message"] = f"Spiel durch Konsens vorzeitig beendet (während {GAME_STATE_DISPLAY_NAMES.get(current_game_status_in_handler, current_game_status_in_handler)}). Seeker gewinnen!"
-                                    game_data["early_end_requests"].clear()
-                                    print(f"SERVER LOGIC: Spiel vorzeitig beendet durch Konsens ({len(game_data.get('early_end_requests',set()))}/{game_data['total_active_players_for_early_end']}).") # .get mit default für early_end_requests
-                                broadcast_full_game_state_to_all()
-                            else:
-                                print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) REQUEST_EARLY_ROUND_END in falschem Status/Konf. ({current_game_status_in_handler}, active={current_player_data.get('status_ingame')}).")
-                                send_data_to_one_client(conn, player_id) # Nur eigenen Status aktualisieren
-                        else: # Unbekannte Aktion
-                            print(f"SERVER WARN: Unbekannte/unerwartete Aktion '{action}' von P:{player_id} ({player_name_for_log}) empfangen.")
-                            _safe_send_json(conn, {"type":"error", "message": f"Aktion '{action}' unbekannt oder derzeit nicht erlaubt."}, player_id, player_name_for_log)
-                    # *** ENDE der Nachrichtenverarbeitung unter Lock ***
-
-            except json.JSONDecodeError:
-                print(f"SERVER JSON DECODE ERROR ({addr}, P:{player_id}, Name:{player_name_for_log}): Buffer war '{buffer[:200]}...'")
-                _safe_send_json(conn, {"type":"error", "message":"Fehlerhafte JSON-Daten empfangen. Verbindung könnte instabil sein."}, player_id, player_name_for_log)
-                buffer = "" # Puffer leeren, um Fehler nicht zu wiederholen
-            except (ConnectionResetError, BrokenPipeError, OSError) as e_comm_loop:
-                print(f"SERVER COMM ERROR in handler loop ({addr}, P:{player_id}, Name:{player_name_for_log}). Aktion: {action_for_log}. Fehler: {e_comm_loop}")
-                break # Beendet die while True Schleife für Nachrichtenempfang -> führt zu finally
-            except Exception as e_inner_loop: # Fange alle anderen Fehler in der Nachrichtenverarbeitung ab
-                print(f"SERVER UNEXPECTED INNER LOOP ERROR ({addr}, P:{player_id}, Name:{player_name_for_log}). Aktion: {action_for_log}. Fehler: {e_inner_loop}"); traceback.print_exc()
-                _safe_send_json(conn, {"type":"error", "message":"Interner Serverfehler bei Nachrichtenverarbeitung."}, player_id, player_name_for_log)
-                # Hier nicht breaken, vielleicht erholt sich der Handler für die nächste Nachricht.
+    if gamelog.enabled_for(gamelog.DEBUG):
+        gamelog.log(gamelog.DEBUG, "SERVER HANDLER", f"({addr}, P:{player_id}, Name:{player_name_for_log}) Aktion '{action}' empfangen.")
 
-    except Exception as e_outer_handler: # Fängt Fehler in der äußeren while True oder beim initialen recv ab
-        print(f"SERVER UNEXPECTED HANDLER ERROR ({addr}, P:{player_id}, Name:{player_name_for_log}). Fehler: {e_outer_handler}"); traceback.print_exc()
+    if restart_runtime["draining"]: # Übergabe an einen neuen Serverprozess läuft, der Stand ist eingefroren
+        _safe_send_json(conn, SERVER_RESTART_HINT, player_id, player_name_for_log)
+        return False
+
+    # --- LIST_ROOMS (Raumverzeichnis, auch ohne Beitritt erlaubt) ---
+    if action == "LIST_ROOMS":
+        current_room_id = session["room"].room_id if session["room"] else None
+        _safe_send_json(conn, {"type": "room_list", "rooms": get_public_room_directory(), "current_room_id": current_room_id}, player_id, player_name_for_log)
+        return True
+
+    # --- LIST_REPLAYS / GET_REPLAY (archivierte Spiele, ohne Beitritt; liest höchstens einen Block pro Nachricht) ---
+    if action in ("LIST_REPLAYS", "GET_REPLAY"):
+        if not ARCHIVE_DIR:
+            _safe_send_json(conn, {"type": "error", "message": "Das Spielarchiv ist auf diesem Server nicht aktiviert."}, player_id, player_name_for_log)
+        elif action == "LIST_REPLAYS":
+            _safe_send_json(conn, {"type": "replay_list", "replays": list_archives(ARCHIVE_DIR)}, player_id, player_name_for_log)
+        else:
+            send_replay_chunk(conn, message, player_id, player_name_for_log)
+        return True
+
+    room = session["room"]
+    if action in ["JOIN_GAME", "REJOIN_GAME"] and player_id is None:
+        if remote_shard_for_join(message) is not None: # Raum gehört einem anderen Worker-Prozess
+            if shard_runtime["handoff"] and conn.uses_default_protocol() and hasattr(conn, "detach"):
+                print(f"SERVER SHARD: {addr} wechselt für '{action}' zu Worker {remote_shard_for_join(message)}. Verbindung wird übergeben.")
+                session["handoff_message"] = message # handle_client_connection übergibt die Verbindung samt dieser Nachricht
+                return False
+            join_error = "Dieser Raum läuft in einem anderen Server-Prozess. Bitte neu verbinden und dann beitreten."
+            _safe_send_json(conn, {
+                "type": "game_update", "player_id": None, "error_message": join_error, "join_error": join_error,
+                "game_state": { "status": "disconnected", "status_display": "Beitritt fehlgeschlagen."}
+            }, "N/A_JOIN_FAIL_SHARD", player_name_for_log)
+            return True
+        room, room_error = resolve_room_for_join(message)
+        if room is None:
+            print(f"SERVER JOIN (FAIL): {room_error} ({addr})")
+            _safe_send_json(conn, {
+                "type": "game_update", "player_id": None, "error_message": room_error, "join_error": room_error,
+                "game_state": { "status": "disconnected", "status_display": "Beitritt fehlgeschlagen."}
+            }, "N/A_JOIN_FAIL_ROOM", player_name_for_log)
+            return True # Verbindung bleibt offen, Client kann einen anderen Raum wählen
+        session["room"] = conn.room = room # Sendefehler und Aufräumen beziehen sich ab jetzt auf diesen Raum
+    elif room is None: # Noch keinem Raum beigetreten (z.B. Reset-Befehl aus der Offline-Queue)
+        room = get_room(message.get("room_id")) if isinstance(message.get("room_id"), str) else None
+        if room is None and is_local_room_id(DEFAULT_ROOM_ID): room = ensure_default_room()
+        if room is None: # Mehrprozess-Betrieb: Der Raum liegt in einem anderen Worker
+            _safe_send_json(conn, {"type": "error", "message": f"Aktion '{action}' ist ohne Beitritt zu einem Raum dieses Server-Prozesses nicht möglich."}, player_id, player_name_for_log)
+            return True
+    game_data = room.game_data
+
+    try:
+        # *** BEGINN der Nachrichtenverarbeitung unter dem Lock des Raums ***
+        with room.lock:
+            if room.closed: # Raum wurde zwischen Auswahl und Beitritt aufgelöst
+                session["room"] = conn.room = None
+                _safe_send_json(conn, {"type": "game_update", "player_id": None, "join_error": "Raum existiert nicht mehr. Bitte einen anderen wählen.",
+                                       "game_state": { "status": "disconnected", "status_display": "Raum aufgelöst."}}, player_id, player_name_for_log)
+                return True
+            current_game_status_in_handler = game_data.get("status")
+
+            # --- FORCE_SERVER_RESET_FROM_CLIENT ---
+            if action == "FORCE_SERVER_RESET_FROM_CLIENT":
+                client_name_for_reset_log = player_name_for_log if player_id else f"Client {addr[0]}:{addr[1]}"
+                print(f"SERVER ADMIN: {client_name_for_reset_log} hat Server-Reset (FORCE_SERVER_RESET_FROM_CLIENT) angefordert.")
+                reset_message_for_clients = f"Server wurde von '{client_name_for_reset_log}' zurückgesetzt. Bitte neu beitreten."
+                reset_game_to_initial_state(room, notify_clients_about_reset=True, reset_message=reset_message_for_clients)
+                ack_payload = {"type": "acknowledgement", "message": "Server wurde erfolgreich zurückgesetzt."}
+                _safe_send_json(conn, ack_payload, player_id, player_name_for_log)
+                # NEUES LOG
+                print(f"SERVER ADMIN: Reset durch {client_name_for_reset_log} abgeschlossen. Handler-Thread wird beendet.")
+                return False # Beendet den Handler-Thread nach Reset
+
+            # --- JOIN_GAME (Neuer Spieler) ---
+            if action == "JOIN_GAME" and player_id is None: # Nur wenn noch keine player_id für diesen Handler
+                _apply_protocol_options(conn, message)
+                p_name = message.get("name", f"Anon_{random.randint(1000,9999)}")
+                MAX_NICKNAME_LENGTH = 50
+                if len(p_name) > MAX_NICKNAME_LENGTH:
+                    p_name = p_name[:MAX_NICKNAME_LENGTH] + "..."
+                    print(f"SERVER JOIN WARN: Nickname von {addr} auf {MAX_NICKNAME_LENGTH} Zeichen gekürzt.")
+                p_role_pref = message.get("role_preference", "hider") # Standard "hider"
+                if p_role_pref not in ["hider", "seeker"]: p_role_pref = "hider"
+                player_name_for_log = p_name # Aktualisiere Log-Namen
+
+                # Prüfe, ob Name bereits von einem aktiven Spieler verwendet wird
+                is_name_taken = any(game_data["players"].contains("connected", pid_check) and pid_check != player_id # Ignoriere eigenen Eintrag, falls Rejoin-Logik später angepasst wird
+                                    for pid_check in game_data["players"].ids_with_name(p_name))
+                if is_name_taken:
+                    print(f"SERVER JOIN (FAIL): Name '{p_name}' ist bereits von einem aktiven Spieler belegt. {addr}")
+                    error_payload = {
+                        "type": "game_update", "player_id": None, # Wichtig: Client ID bleibt None
+                        "error_message": f"Name '{p_name}' bereits vergeben. Wähle einen anderen Namen.",
+                        "join_error": f"Name '{p_name}' bereits vergeben.", # Spezifischer Fehler für Join-Screen
+                        "game_state": { "status": "disconnected", "status_display": "Beitritt fehlgeschlagen."}
+                    }
+                    _safe_send_json(conn, error_payload, "N/A_JOIN_FAIL_NAME_TAKEN", p_name)
+                    return False # Beendet Handler, Client muss neuen Namen wählen
+
+                # Generiere eindeutige Player-ID
+                base_id = str(addr[1]) + "_" + str(random.randint(1000, 9999)) # Port + Zufallszahl
+                id_counter = 0; temp_id_candidate = base_id
+                while temp_id_candidate in game_data.get("players", {}): # Sicherstellen, dass ID wirklich neu ist
+                    id_counter += 1; temp_id_candidate = f"{base_id}_{id_counter}"
+                player_id = temp_id_candidate # Eindeutige ID für diesen Handler/Spieler
+                player_entry_data = PlayerRecord( # Alle übrigen Felder mit den Standardwerten aus players.PLAYER_FIELD_DEFAULTS
+                    addr=addr, name=p_name, original_role=p_role_pref, current_role=p_role_pref,
+                    last_seen=time.time(), client_conn=conn, confirmed_for_lobby=True,
+                    task_skips_available=INITIAL_TASK_SKIPS if p_role_pref == "hider" else 0,
+                )
+
+                if current_game_status_in_handler in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS]:
+                    # Wenn das Spiel gerade beendet wurde und ein neuer Spieler joined, resette den Server für eine neue Runde
+                    print(f"SERVER JOIN: Spiel war beendet. Server wird für neue Runde zurückgesetzt, {p_name} ({player_id}) tritt bei.")
+                    reset_game_to_initial_state(room, notify_clients_about_reset=False) # Kein Broadcast an alte Spieler nötig hier
+                    current_game_status_in_handler = game_data.get("status") # Status ist jetzt 'lobby'
+                    game_data["players"][player_id] = player_entry_data
+                    send_data_to_one_client(room, conn, player_id) # Sende Zustand an neuen Spieler
+                    request_game_state_broadcast(room) # Informiere andere, gebündelt
+                elif current_game_status_in_handler in [GAME_STATE_HIDER_WAIT, GAME_STATE_RUNNING]:
+                    # Spiel läuft, Spieler kommt auf die Warteliste
+                    player_entry_data.is_waiting_for_lobby = True
+                    game_data["players"][player_id] = player_entry_data
+                    print(f"SERVER JOIN-PLAYER-WAITING: {p_name} ({player_id}) von {addr} zur Warteliste hinzugefügt (Spiel läuft).")
+                    join_wait_message = {
+                        "type": "game_update", "player_id": player_id, "room_id": room.room_id, "room_name": room.name,
+                        "player_name": p_name, "role": p_role_pref, "is_waiting_for_lobby": True,
+                        "game_state": { "status": "waiting_for_lobby", "status_display": "Warten auf nächste Lobby-Runde. Du bist registriert." },
+                        "message": "Spiel läuft. Du bist auf der Warteliste."
+                    }
+                    _safe_send_json(conn, join_wait_message, player_id, p_name)
+                else: # Spiel ist in der Lobby, normaler Beitritt
+                    game_data["players"][player_id] = player_entry_data
+                    print(f"SERVER JOIN-PLAYER-CREATED (lobby): {p_name} ({player_id}) von {addr}.")
+                    send_data_to_one_client(room, conn, player_id) # Sende Zustand an neuen Spieler
+                    request_game_state_broadcast(room) # Informiere andere (falls vorhanden), gebündelt
+                return True # Zurück zum Anfang der recv-Schleife für diesen Client
+
+            # --- REJOIN_GAME (Spieler kehrt zurück) ---
+            elif action == "REJOIN_GAME" and player_id is None: # Nur wenn dieser Handler noch keine ID hat
+                _apply_protocol_options(conn, message)
+                rejoin_player_id = message.get("player_id")
+                rejoin_player_name = message.get("name") # Client sendet seinen gespeicherten Namen
+                session["action_for_log"] = f"REJOIN_GAME (Attempt ID: {rejoin_player_id}, Name: {rejoin_player_name})"
+                found_player_to_rejoin = False
+                if rejoin_player_id and rejoin_player_id in game_data.get("players", {}):
+                    player_entry = game_data["players"][rejoin_player_id]
+                    # Überprüfe, ob der Name übereinstimmt (optional, aber gut für Konsistenz)
+                    if player_entry.name != rejoin_player_name:
+                        print(f"SERVER REJOIN WARN: Name mismatch for ID {rejoin_player_id}. Client: '{rejoin_player_name}', Server: '{player_entry.name}'. Rejoin trotzdem erlaubt.")
+
+                    # Alte Verbindung des Spielers (falls vorhanden und anders) schließen
+                    old_conn = player_entry.client_conn
+                    if old_conn and old_conn != conn:
+                        print(f"SERVER REJOIN: Spieler {player_entry.name} ({rejoin_player_id}) hatte alte Verbindung. Aktualisiere auf neue.")
+                        try: # Versuche alte Verbindung sauber zu schließen
+                            old_conn.shutdown(socket.SHUT_RDWR)
+                            old_conn.close()
+                        except Exception as e: print(f"SERVER REJOIN WARN: Fehler beim Schließen alter Verbindung für {rejoin_player_id}: {e}")
+
+                    # Aktualisiere Spielerdaten mit neuer Verbindung
+                    player_entry.client_conn = conn # Neue Verbindung zuweisen
+                    player_entry.addr = addr
+                    player_entry.last_seen = time.time() # Update "zuletzt gesehen"
+                    player_id = rejoin_player_id # Handler ist jetzt diesem Spieler zugeordnet
+                    player_name_for_log = player_entry.name # Für Logs
+                    found_player_to_rejoin = True
+
+                    # Wenn Spieler als "offline" markiert war, wieder aktivieren
+                    if player_entry.status_ingame == "offline":
+                        previous_status = player_entry.status_before_offline
+                        player_entry.status_ingame = previous_status
+                        player_entry.status_before_offline = "active" # Temporären Status auf den Standardwert zurücksetzen
+                        broadcast_server_text_notification(room, f"Spieler {player_entry.name} ist wieder online (Status: {previous_status}).")
+                        print(f"SERVER REJOIN: Spieler {player_name_for_log} ({player_id}) Status von 'offline' auf '{previous_status}' gesetzt.")
+
+                    print(f"SERVER REJOIN (SUCCESS): Spieler {player_name_for_log} ({player_id}) re-assoziiert mit neuer Verbindung von {addr}")
+                    send_data_to_one_client(room, conn, player_id) # Sende aktuellen Zustand an den re-joined Spieler
+                    request_game_state_broadcast(room) # Informiere andere, gebündelt
+                else:
+                    print(f"SERVER REJOIN (FAIL): Spieler-ID '{rejoin_player_id}' nicht gefunden für {addr}.")
+                    rejoin_fail_payload = {
+                        "type": "game_update", "player_id": None, # Signalisiert Client, dass Rejoin fehlgeschlagen
+                        "error_message": f"Rejoin fehlgeschlagen. Spieler-ID '{rejoin_player_id}' nicht mehr gültig oder gefunden.",
+                        "join_error": f"Rejoin fehlgeschlagen. Spieler-ID '{rejoin_player_id}' nicht mehr gültig oder gefunden.",
+                        "game_state": { "status": "disconnected", "status_display": "Rejoin fehlgeschlagen."}
+                    }
+                    _safe_send_json(conn, rejoin_fail_payload, "N/A_REJOIN_FAIL", "N/A_REJOIN_FAIL")
+                    return False # Beendet Handler, Client muss sich neu als neuer Spieler registrieren
+                return True # Zurück zum Anfang der recv-Schleife
+
+            # --- Authentifizierung für weitere Aktionen ---
+            if not player_id or player_id not in game_data.get("players", {}):
+                print(f"SERVER WARN: Unauthentifizierter/Entfernter Client von {addr} sendet Aktion '{action}'. Player_id im Handler: {player_id}. Verbindung wird getrennt.")
+                error_payload_unauth = {
+                    "type":"game_update", "player_id": None, # Wichtig: Client ID entfernen
+                    "message":"Nicht authentifiziert oder aus Spiel entfernt. Bitte neu beitreten.",
+                    "join_error": "Sitzung ungültig oder abgelaufen. Bitte neu beitreten.",
+                    "game_state": {"status": "disconnected", "status_display": "Sitzung ungültig."}
+                }
+                _safe_send_json(conn, error_payload_unauth, "N/A_UNAUTH", "N/A_UNAUTH")
+                return False # Beendet Handler-Thread
+
+            # Ab hier hat der Client eine gültige player_id und ist im Spiel
+            current_player_data = game_data["players"][player_id]
+            current_player_data.last_seen = time.time() # Update "zuletzt gesehen"
+            if current_player_data.client_conn != conn: # Falls sich Conn geändert hat (sollte durch Rejoin abgedeckt sein)
+                current_player_data.client_conn = conn
+            player_name_for_log = current_player_data.name # Aktualisiere für Logs
+
+
+            # --- Weitere Spielaktionen ---
+            if action == "REQUEST_FULL_SYNC": # Client hat eine Lücke in den Delta-Sequenzen erkannt
+                print(f"SERVER ACTION: P:{player_id} ({player_name_for_log}) fordert vollständigen Snapshot an (seq bisher {conn.update_seq}).")
+                conn.last_game_update = None
+                send_data_to_one_client(room, conn, player_id)
+            elif action == "SET_READY":
+                if current_game_status_in_handler == GAME_STATE_LOBBY and current_player_data.confirmed_for_lobby:
+                    current_player_data.is_ready = message.get("ready_status") == True
+                    print(f"SERVER ACTION: P:{player_id} ({player_name_for_log}) gesetzt auf is_ready={current_player_data.is_ready}.")
+                    request_game_state_broadcast(room)
+                else:
+                    print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) SET_READY in falschem Status/Konf. ({current_game_status_in_handler}, confirmed={current_player_data.confirmed_for_lobby}).")
+                    send_data_to_one_client(room, conn, player_id) # Sende aktuellen (unveränderten) Zustand
+            elif action == "UPDATE_LOCATION":
+                lat, lon = message.get("lat"), message.get("lon")
+                accuracy = message.get("accuracy") # Kann None sein, wenn nicht vom Client gesendet
+                fix = parse_fix(lat, lon, accuracy) # None bei Text, NaN/Infinity, außerhalb ±90/±180 oder negativer Genauigkeit
+                if fix is not None:
+                    current_player_data.record_location(*fix, time.time())
+                    # Prüfe, ob dies ein Update nach einer Warnung ist
+                    if current_player_data.has_pending_location_warning:
+                        if time.time() > current_player_data.warning_sent_time: # Nur wenn Warnung schon gesendet wurde
+                             current_player_data.last_location_update_after_warning = time.time()
+                    if AUTO_CATCH_RADIUS_METERS is not None and current_player_data.current_role == "seeker" and \
+                       current_game_status_in_handler == GAME_STATE_RUNNING and run_auto_catch(room):
+                        game_over = check_game_conditions_and_end(room)
+                        request_game_state_broadcast(room, immediate=game_over) # Spielende sofort senden, sonst gebündelt
+                        if game_over: schedule_room_tick(room) # UPDATE_LOCATION plant sonst keinen Tick (Spielende-Zeit, Reset-Countdown, Archiv)
+                    # Kein voller Broadcast hier, da Standortupdates häufig sind.
+                    # Der Client erhält eine Bestätigung indirekt durch das nächste reguläre game_update.
+                    # Optional: eine kleine Ack-Nachricht senden, wenn Performance kein Problem ist.
+                    send_data_to_one_client(room, conn, player_id) # Update an den Client selbst ist ok
+                else:
+                    print(f"SERVER WARN: Ungültige Standortdaten von P:{player_id} ({player_name_for_log}): lat={lat!r}, lon={lon!r}, accuracy={accuracy!r}")
+                    _safe_send_json(conn, {"type":"error", "message":"Ungültige Standortdaten empfangen."}, player_id, player_name_for_log)
+            elif action == "TASK_COMPLETE":
+                status_changed = False
+                if current_player_data.current_role == "hider" and \
+                   current_player_data.status_ingame == "active" and \
+                   current_player_data.task: # Spieler muss eine aktive Aufgabe haben
+                    task_details = current_player_data.task
+                    if time.time() <= current_player_data.task_deadline: # Innerhalb der Zeit
+                        current_player_data.points += task_details.get("points", 0)
+                        record_game_event(room, "task", player=player_id, task_id=task_details.get("id"), points=task_details.get("points", 0))
+                        broadcast_server_text_notification(room, f"Hider {player_name_for_log} hat Aufgabe '{task_details.get('description', 'N/A')}' erledigt!")
+                        clear_hider_task(room, current_player_data, player_id)
+                        assign_task_to_hider(room, player_id); status_changed = True
+                    else: # Aufgabe zu spät
+                        task_description_for_log = current_player_data.task.get('description','N/A')
+                        clear_hider_task(room, current_player_data, player_id)
+                        broadcast_server_text_notification(room, f"Hider {player_name_for_log} hat Aufgabe '{task_description_for_log}' zu spät eingereicht! Aufgabe entfernt.")
+                        assign_task_to_hider(room, player_id); status_changed = True # Status änderte sich (Aufgabe weg)
+                if status_changed:
+                    request_game_state_broadcast(room, immediate=check_game_conditions_and_end(room)) # Spielende sofort senden, sonst gebündelt
+                else:
+                    print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) TASK_COMPLETE nicht möglich (kein Hider, nicht aktiv, keine Aufgabe).")
+                    send_data_to_one_client(room, conn, player_id)
+            elif action == "TASK_COMPLETE_OFFLINE":
+                task_id_offline = message.get("task_id")
+                completed_at_offline_ts = message.get("completed_at_timestamp_offline")
+                status_changed_offline, ack_msg_to_client, err_msg_to_client = False, None, None
+                if not task_id_offline or not isinstance(completed_at_offline_ts, (int, float)):
+                    err_msg_to_client = "Ungültige Daten für Offline-Aufgabenerledigung."
+                elif current_player_data.current_role == "hider" and \
+                     current_player_data.status_ingame not in ["caught", "failed_task", "failed_loc_update"]: # Muss noch im Spiel sein
+                    server_task_info = current_player_data.task
+                    server_task_deadline = current_player_data.task_deadline
+                    if server_task_info and server_task_info.get("id") == task_id_offline:
+                        # Aufgabe stimmt überein
+                        if completed_at_offline_ts <= server_task_deadline:
+                            current_player_data.points += server_task_info.get("points", 0)
+                            record_game_event(room, "task", player=player_id, task_id=task_id_offline, points=server_task_info.get("points", 0), offline=True)
+                            task_desc_log = server_task_info.get('description', 'N/A')
+                            time_diff_str = format_time_ago(time.time() - completed_at_offline_ts)
+                            broadcast_server_text_notification(room, f"Hider {player_name_for_log} hat Aufgabe '{task_desc_log}' erledigt (offline vor ca. {time_diff_str} nachgereicht).")
+                            ack_msg_to_client = f"Offline erledigte Aufgabe '{task_desc_log}' erfolgreich angerechnet."
+                            clear_hider_task(room, current_player_data, player_id)
+                            assign_task_to_hider(room, player_id); status_changed_offline = True
+                        else:
+                            err_msg_to_client = f"Offline erledigte Aufgabe (ID: {task_id_offline}) war laut Server-Deadline bereits zum Offline-Zeitpunkt abgelaufen."
+                            # Aufgabe trotzdem entfernen und neue zuweisen
+                            clear_hider_task(room, current_player_data, player_id)
+                            assign_task_to_hider(room, player_id) ; status_changed_offline = True # Aufgabe hat sich geändert
+                    else: # Client meldet eine Aufgabe, die nicht (mehr) die aktuelle serverseitige ist
+                        err_msg_to_client = f"Gemeldete Offline-Aufgabe (ID: {task_id_offline}) ist nicht (mehr) deine aktuelle Server-Aufgabe."
+                else: err_msg_to_client = "Offline-Aufgabe kann nicht angerechnet werden (falsche Rolle oder Spielerstatus)."
+
+                if err_msg_to_client: _safe_send_json(conn, {"type": "error", "message": err_msg_to_client}, player_id, player_name_for_log)
+                if ack_msg_to_client: _safe_send_json(conn, {"type": "acknowledgement", "message": ack_msg_to_client}, player_id, player_name_for_log)
+
+                if status_changed_offline:
+                    request_game_state_broadcast(room, immediate=check_game_conditions_and_end(room)) # Spielende sofort senden, sonst gebündelt
+                else: send_data_to_one_client(room, conn, player_id) # Nur eigenen Status aktualisieren
+            elif action == "SKIP_TASK":
+                task_skipped_successfully = False; error_message_to_client = None; ack_message_to_client = None
+                if current_player_data.current_role == "hider" and current_player_data.status_ingame == "active":
+                    if current_player_data.task: # Hat eine Aufgabe
+                        if current_player_data.task_skips_available > 0:
+                            current_player_data.task_skips_available -= 1
+                            skipped_task_desc = current_player_data.task.get("description", "Unbekannte Aufgabe")
+                            clear_hider_task(room, current_player_data, player_id)
+                            assign_task_to_hider(room, player_id); task_skipped_successfully = True
+                            ack_message_to_client = f"Aufgabe '{skipped_task_desc}' übersprungen. Verbleibende Skips: {current_player_data.task_skips_available}."
+                            broadcast_server_text_notification(room, f"Hider {player_name_for_log} hat eine Aufgabe übersprungen.")
+                        else: error_message_to_client = "Keine Aufgaben-Skips mehr verfügbar."
+                    else: error_message_to_client = "Du hast keine aktive Aufgabe zum Überspringen."
+                else: error_message_to_client = "Aufgabe kann derzeit nicht übersprungen werden (falsche Rolle/Status)."
+
+                if error_message_to_client: _safe_send_json(conn, {"type": "error", "message": error_message_to_client}, player_id, player_name_for_log)
+                if ack_message_to_client: _safe_send_json(conn, {"type": "acknowledgement", "message": ack_message_to_client}, player_id, player_name_for_log)
+
+                if task_skipped_successfully:
+                    request_game_state_broadcast(room, immediate=check_game_conditions_and_end(room)) # Spielende sofort senden, sonst gebündelt
+                else: send_data_to_one_client(room, conn,player_id) # Nur eigenen Status aktualisieren (z.B. für Fehlermeldung)
+            elif action == "CATCH_HIDER":
+                hider_id_to_catch = message.get("hider_id_to_catch"); caught = False
+                if current_player_data.current_role == "seeker" and \
+                   current_game_status_in_handler == GAME_STATE_RUNNING and \
+                   hider_id_to_catch in game_data.get("players", {}): # Hider muss existieren
+                    hider_player_data = game_data["players"][hider_id_to_catch]
+                    catch_in_range, catch_distance = check_catch_distance(current_player_data, hider_player_data)
+                    if not catch_in_range:
+                        print(f"SERVER ACTION DENIED: Seeker {player_name_for_log} ({player_id}) wollte Hider {hider_player_data.name} aus {catch_distance:.0f} m fangen.")
+                        _safe_send_json(conn, {"type":"error", "message":f"Hider {hider_player_data.name} ist zu weit entfernt (ca. {catch_distance:.0f} m)."}, player_id, player_name_for_log)
+                    elif catch_hider(room, player_id, hider_id_to_catch):
+                        caught = True
+                    else: _safe_send_json(conn, {"type":"error", "message":f"Hider {hider_player_data.name} kann nicht gefangen werden (falsche Rolle/Status oder Offline)."}, player_id, player_name_for_log)
+                else: _safe_send_json(conn, {"type":"error", "message":f"Aktion 'Fangen' nicht möglich (falsche Rolle/Status oder Hider nicht gefunden)."}, player_id, player_name_for_log)
+                if caught:
+                    request_game_state_broadcast(room, immediate=check_game_conditions_and_end(room)) # Spielende sofort senden, sonst gebündelt
+                else: send_data_to_one_client(room, conn, player_id) # Nur eigenen Status aktualisieren
+            elif action == "RETURN_TO_REGISTRATION": # Spieler will Name/Rolle in Lobby ändern
+                if current_game_status_in_handler == GAME_STATE_LOBBY and player_id in game_data.get("players", {}):
+                    print(f"SERVER ACTION: Spieler {player_name_for_log} ({player_id}) kehrt zur Registrierung zurück.")
+                    del game_data["players"][player_id] # Spieler aus dem Spiel entfernen
+                    # Client-seitig wird player_id auf None gesetzt durch diese Nachricht
+                    reset_payload = { "type": "game_update", "player_id": None, "join_error": None, "game_message": "Bitte gib deine Details erneut ein." }
+                    _safe_send_json(conn, reset_payload, player_id, player_name_for_log)
+                    player_id = None; player_name_for_log = "Unbekannt_Nach_Reset" # Handler hat keine ID mehr
+                    request_game_state_broadcast(room) # Andere Spieler informieren
+                else: send_data_to_one_client(room, conn, player_id) # Nicht erlaubte Aktion, nur Status senden
+            elif action == "LEAVE_GAME_AND_GO_TO_JOIN": # Spieler verlässt das Spiel komplett
+                print(f"SERVER LEAVE: Spieler {player_name_for_log} ({player_id}) verlässt das Spiel.")
+                if player_id in game_data.get("players", {}):
+                    # Markiere Spieler als "ausgeschieden" oder ähnlich, falls das Spiel noch läuft
+                    if game_data["players"][player_id].status_ingame == "active":
+                         game_data["players"][player_id].status_ingame = "failed_loc_update" # Oder ein spezifischer "left_game" Status
+                         game_data["players"][player_id].current_role = "seeker" # Verhindert, dass er als Hider gewinnt
+                         clear_hider_task(room, game_data["players"][player_id], player_id)
+                         game_data["players"][player_id].task_skips_available = 0
+                         game_data["players"][player_id].status_before_offline = "active" # Offline Status irrelevant
+                         broadcast_server_text_notification(room, f"Spieler {player_name_for_log} hat das Spiel vorzeitig verlassen.")
+                    # Spieler wird nicht aus game_data["players"] gelöscht, um ihn im Leaderboard etc. zu behalten,
+                    # aber seine Verbindung wird getrennt und er kann nicht mehr teilnehmen.
+                # Sende eine Bestätigung, aber setze player_id in der Antwort nicht auf None.
+                # Der Client wird selbst user_has_initiated_connection auf False setzen.
+                _safe_send_json(conn, {"type": "acknowledgement", "message": "Du hast das Spiel verlassen."}, player_id, player_name_for_log)
+                # Wichtig: Der Handler-Thread wird durch return beendet, Client muss Socket schließen.
+                # Der player_id bleibt für diesen Handler-Aufruf bestehen, wird aber im finally-Block behandelt.
+                player_id = None # Signalisiert dem finally Block, dass dieser Spieler nicht mehr aktiv ist.
+                request_game_state_broadcast(room) # Andere informieren
+                return False # Beendet den Handler-Thread
+            elif action == "REQUEST_EARLY_ROUND_END":
+                if current_game_status_in_handler in [GAME_STATE_RUNNING, GAME_STATE_HIDER_WAIT] and \
+                   current_player_data.status_ingame == "active" and \
+                   current_player_data.confirmed_for_lobby:
+                    game_data.setdefault("early_end_requests", set()).add(player_id)
+                    game_data["total_active_players_for_early_end"] = count_active_players_for_early_end(room) # Neu zählen
+                    # Prüfe, ob genug Spieler für ein vorzeitiges Ende gestimmt haben
+                    ended_by_consensus = False
+                    if game_data["total_active_players_for_early_end"] > 0 and \
+                       len(game_data["early_end_requests"]) >= game_data["total_active_players_for_early_end"]:
+                        # Alle aktiven Spieler wollen das Spiel beenden
+                        game_data["status"] = GAME_STATE_SEEKER_WINS # Standardmäßig gewinnen Seeker bei Abbruch
+                        game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_SEEKER_WINS]
+                        game_data["game_over_message"] = f"Spiel durch Konsens vorzeitig beendet (während {GAME_STATE_DISPLAY_NAMES.get(current_game_status_in_handler, current_game_status_in_handler)}). Seeker gewinnen!"
+                        game_data["early_end_requests"].clear()
+                        print(f"SERVER LOGIC: Spiel vorzeitig beendet durch Konsens ({len(game_data.get('early_end_requests',set()))}/{game_data['total_active_players_for_early_end']}).") # .get mit default für early_end_requests
+                        ended_by_consensus = True
+                    request_game_state_broadcast(room, immediate=ended_by_consensus)
+                else:
+                    print(f"SERVER ACTION DENIED: P:{player_id} ({player_name_for_log}) REQUEST_EARLY_ROUND_END in falschem Status/Konf. ({current_game_status_in_handler}, active={current_player_data.status_ingame}).")
+                    send_data_to_one_client(room, conn, player_id) # Nur eigenen Status aktualisieren
+            else: # Unbekannte Aktion
+                print(f"SERVER WARN: Unbekannte/unerwartete Aktion '{action}' von P:{player_id} ({player_name_for_log}) empfangen.")
+                _safe_send_json(conn, {"type":"error", "message": f"Aktion '{action}' unbekannt oder derzeit nicht erlaubt."}, player_id, player_name_for_log)
+        # *** ENDE der Nachrichtenverarbeitung unter Lock ***
     finally:
-        # --- Aufräumarbeiten beim Beenden des Handler-Threads ---
-        # NEUES LOG
-        print(f"SERVER CLEANUP ENTERED ({addr}, P:{player_id}, Name: {player_name_for_log}). Socket: {conn}")
-        player_affected_by_disconnect = False
-        player_rejoined_meanwhile = False # Hat sich der Spieler in der Zwischenzeit mit einem neuen Socket verbunden?
-        with data_lock:
-            if player_id and player_id in game_data.get("players", {}): # Spieler war dem Spiel bekannt
+        session["player_id"] = player_id
+        session["player_name_for_log"] = player_name_for_log
+        journal_event(room, str(action)[:40])
+        if action not in ACTIONS_WITHOUT_ROOM_TICK: schedule_room_tick(room) # Zustand kann sich geändert haben (bereit, gefangen, ...)
+    return True
+
+def cleanup_client_connection(conn, addr, session):
+    """Aufräumarbeiten, wenn die Verbindung eines Clients endet (Offline-Markierung, Broadcast, Socket schließen)."""
+    player_id = session["player_id"]
+    player_name_for_log = session["player_name_for_log"]
+    # --- Aufräumarbeiten beim Beenden des Handler-Threads ---
+    # NEUES LOG
+    print(f"SERVER CLEANUP ENTERED ({addr}, P:{player_id}, Name: {player_name_for_log}). Socket: {conn}")
+    player_affected_by_disconnect = False
+    player_rejoined_meanwhile = False # Hat sich der Spieler in der Zwischenzeit mit einem neuen Socket verbunden?
+    room = session["room"] # None, wenn die Verbindung nie einem Raum beigetreten ist
+    game_data = room.game_data if room else {}
+    if restart_runtime["draining"]: # Übergabe: Der neue Prozess führt das Spiel fort, hier ändert sich nichts mehr
+        print(f"SERVER CLEANUP ({addr}, P:{player_id}): Server wird übergeben, Spielstand bleibt unverändert.")
+    elif room is not None and player_id:
+        with room.lock:
+            if player_id in game_data.get("players", {}): # Spieler war dem Spiel bekannt
                 player_entry = game_data["players"][player_id]
                 # NEUES LOG
-                print(f"SERVER CLEANUP ({addr}, P:{player_id}): Spieler in game_data gefunden. Aktuelle conn des Spielers: {player_entry.get('client_conn')}, Handler conn: {conn}")
-                if player_entry.get("client_conn") == conn: # Ist dies die aktuelle Verbindung des Spielers?
-                    player_entry["client_conn"] = None # Verbindung als getrennt markieren
+                print(f"SERVER CLEANUP ({addr}, P:{player_id}): Spieler in game_data gefunden. Aktuelle conn des Spielers: {player_entry.client_conn}, Handler conn: {conn}")
+                if player_entry.client_conn == conn: # Ist dies die aktuelle Verbindung des Spielers?
+                    player_entry.client_conn = None # Verbindung als getrennt markieren
                     # Spieler als "offline" markieren, wenn er nicht bereits "gefangen" etc. ist
-                    if player_entry.get("status_ingame") not in ["offline", "caught", "failed_task", "failed_loc_update"]:
-                        player_entry["status_before_offline"] = player_entry.get("status_ingame", "active") # Alten Status merken
-                        player_entry["status_ingame"] = "offline"
+                    if player_entry.status_ingame not in ["offline", "caught", "failed_task", "failed_loc_update"]:
+                        player_entry.status_before_offline = player_entry.status_ingame # Alten Status merken
+                        player_entry.status_ingame = "offline"
                         player_affected_by_disconnect = True
                         print(f"SERVER DISCONNECT: Spieler {player_name_for_log} ({player_id}) Status auf 'offline' gesetzt.")
                     else: # Spieler war bereits in einem Endstatus oder offline
@@ -958,275 +2146,478 @@ def handle_client_connection(conn, addr):
                 else: # Der Spieler hat sich anscheinend mit einer neuen Verbindung re-joined.
                     player_rejoined_meanwhile = True
                     # NEUES LOG
-                    print(f"SERVER CLEANUP ({addr}, P:{player_id}): Spieler hat sich bereits mit neuer Verbindung verbunden ({player_entry.get('client_conn')}). Alte Handler-Verbindung ({conn}) wird nur geschlossen.")
-            elif player_id: # player_id ist nicht None, aber nicht in game_data.players (z.B. nach Server-Reset oder RETURN_TO_REGISTRATION)
+                    print(f"SERVER CLEANUP ({addr}, P:{player_id}): Spieler hat sich bereits mit neuer Verbindung verbunden ({player_entry.client_conn}). Alte Handler-Verbindung ({conn}) wird nur geschlossen.")
+            else: # player_id ist nicht None, aber nicht in game_data.players (z.B. nach Server-Reset oder RETURN_TO_REGISTRATION)
                  # NEUES LOG
                  print(f"SERVER CLEANUP ({addr}, P:{player_id}): Spieler-ID bekannt, aber Spieler NICHT MEHR in game_data (z.B. nach Reset oder RETURN_TO_REGISTRATION).")
-            else: # player_id war None (z.B. Join nie erfolgt oder nach LEAVE_GAME)
-                 # NEUES LOG
-                 print(f"SERVER CLEANUP ({addr}): Keine Spieler-ID für diesen Handler gesetzt (z.B. Join nie erfolgt, nach RETURN_TO_REGISTRATION oder LEAVE_GAME).")
-
-        # Broadcast, wenn ein aktiver Spieler offline geht
-        if player_affected_by_disconnect: # Nur wenn sich der Status wirklich geändert hat
-            if game_data.get("status") == GAME_STATE_RUNNING: # Im laufenden Spiel prüfen, ob Spielende
-                if check_game_conditions_and_end(): pass # Prüft und setzt ggf. Spielende-Status
-            broadcast_full_game_state_to_all() # Informiere alle über Statusänderung
-            broadcast_server_text_notification(f"Spieler {player_name_for_log} ist offline gegangen.")
-        elif player_rejoined_meanwhile:
+    else: # player_id war None (z.B. Join nie erfolgt oder nach LEAVE_GAME) oder kein Raum betreten
+         # NEUES LOG
+         print(f"SERVER CLEANUP ({addr}): Keine Spieler-ID für diesen Handler gesetzt (z.B. Join nie erfolgt, nach RETURN_TO_REGISTRATION oder LEAVE_GAME).")
+
+    # Broadcast, wenn ein aktiver Spieler offline geht
+    if player_affected_by_disconnect: # Nur wenn sich der Status wirklich geändert hat
+        journal_event(room, "disconnect")
+        schedule_room_tick(room) # z.B. startet die Lobby, wenn nur noch bereite Spieler verbunden sind
+        game_ended_by_disconnect = False
+        if game_data.get("status") == GAME_STATE_RUNNING: # Im laufenden Spiel prüfen, ob Spielende
+            game_ended_by_disconnect = check_game_conditions_and_end(room) # Prüft und setzt ggf. Spielende-Status
+        request_game_state_broadcast(room, immediate=game_ended_by_disconnect) # Informiere alle über Statusänderung
+        broadcast_server_text_notification(room, f"Spieler {player_name_for_log} ist offline gegangen.")
+    elif player_rejoined_meanwhile:
+        # NEUES LOG
+         print(f"SERVER CLEANUP ({addr}, P:{player_id}): Kein Broadcast nötig, da Spieler bereits rejoined und die neue Verbindung aktiv ist.")
+    # Ansonsten (Spieler war nicht in game_data oder schon offline) kein Broadcast nötig.
+
+    # Schließe die Verbindung dieses Handler-Threads
+    if conn: # Nur wenn conn existiert
+        try:
             # NEUES LOG
-             print(f"SERVER CLEANUP ({addr}, P:{player_id}): Kein Broadcast nötig, da Spieler bereits rejoined und die neue Verbindung aktiv ist.")
-        # Ansonsten (Spieler war nicht in game_data oder schon offline) kein Broadcast nötig.
+            print(f"SERVER CLEANUP ({addr}, P:{player_id}, Name:{player_name_for_log}): Schließe Socket dieses Handlers ({conn}).")
+            conn.close()
+        except Exception as e_close:
+            print(f"SERVER CLEANUP: Fehler beim Schließen des Sockets für {addr} ({conn}): {e_close}")
+    # NEUES LOG
+    print(f"SERVER CLEANUP EXIT ({addr}, P:{player_id}, Name:{player_name_for_log}). Handler-Thread beendet.")
+
+def process_received_frames(conn, addr, session, frame_decoder):
+    """
+    Verarbeitet alle vollständigen Frames im Decoder. Gibt False zurück, wenn die Verbindung beendet werden soll
+    (Aktion verlangt Trennung oder Frame zu groß). Fehlerhaftes JSON verwirft nur den betroffenen Frame.
+    """
+    while True:
+        try:
+            frame = frame_decoder.next_frame()
+        except FrameTooLargeError as e_frame:
+            print(f"SERVER FRAME ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}): {e_frame} Verbindung wird getrennt.")
+            _safe_send_json(conn, {"type":"error", "message":"Nachricht zu groß. Verbindung wird getrennt."}, session["player_id"], session["player_name_for_log"])
+            return False
+        if frame is None:
+            return True
+        if not frame.strip(): continue # Ignoriere leere Zeilen
+        try:
+            message = json.loads(frame) # json.loads akzeptiert UTF-8-Bytes direkt
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            print(f"SERVER JSON DECODE ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}): Frame war '{frame[:200]!r}...'")
+            _safe_send_json(conn, {"type":"error", "message":"Fehlerhafte JSON-Daten empfangen. Verbindung könnte instabil sein."}, session["player_id"], session["player_name_for_log"])
+            continue
+        if not isinstance(message, dict):
+            _safe_send_json(conn, {"type":"error", "message":"Nachricht muss ein JSON-Objekt sein."}, session["player_id"], session["player_name_for_log"])
+            continue
+        action = message.get("action")
+        action_label = action if isinstance(action, str) and action in METRICS_ACTION_LABELS else "other"
+        action_started = time.perf_counter()
+        with lock_profiler.section("action:" + action_label):
+            keep_connection = process_client_message(conn, addr, session, message)
+        server_metrics.observe("action_duration_seconds", time.perf_counter() - action_started, (action_label,))
+        if not keep_connection:
+            return False
+
+
+def hand_off_connection(conn, addr, session, frame_decoder):
+    """Mehrprozess-Betrieb: Übergibt die Verbindung samt der auslösenden Nachricht und ungelesener Bytes ans Front-End."""
+    pending_data = json.dumps(session.pop("handoff_message")).encode("utf-8") + b"\n" + frame_decoder.drain()
+    sock = conn.detach() # Bereits eingereihte Antworten (z.B. room_list) gehen vorher noch raus
+    if sock is None:
+        print(f"SERVER SHARD: Verbindung zu {addr} brach vor der Übergabe ab."); return
+    try:
+        shard_runtime["handoff"](sock, addr, pending_data)
+    except OSError as e:
+        print(f"SERVER SHARD: Übergabe von {addr} an das Front-End fehlgeschlagen: {e}")
+    finally:
+        sock.close() # Nur unsere Kopie des Sockets; die Verbindung selbst lebt im Empfänger weiter
+
+def _process_frames_or_hand_off(conn, addr, session, frame_decoder):
+    if process_received_frames(conn, addr, session, frame_decoder): return True
+    if session.get("handoff_message") is not None:
+        hand_off_connection(conn, addr, session, frame_decoder)
+    return False
 
-        # Schließe die Verbindung dieses Handler-Threads
-        if conn: # Nur wenn conn existiert
+def handle_client_connection(conn, addr, initial_data=b""):
+    session = new_client_session()
+    # NEUES LOG
+    print(f"SERVER HANDLER: Thread für {addr} gestartet. Socket: {conn}")
+    try:
+        frame_decoder = FrameDecoder() # Client -> Server: zeilenbasiert, auf Byte-Ebene dekodiert
+        if initial_data: # Mehrprozess-Betrieb: Bytes, die das Front-End zum Routen bereits gelesen hat
+            frame_decoder.feed(initial_data)
+            if not _process_frames_or_hand_off(conn, addr, session, frame_decoder): return
+        while True: # Schleife für Nachrichtenempfang
             try:
+                # Das folgende Log kann sehr gesprächig sein. Für Debugging von Verbindungsabbrüchen aktivieren.
+                # print(f"SERVER HANDLER ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}): Wartet auf Daten (recv)...")
+                data_chunk = conn.recv(4096) # Empfange bis zu 4KB Daten
+                # NEUES LOG - Dieses ist sehr wichtig!
+                print(f"SERVER HANDLER ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}): Empfangen {len(data_chunk)} bytes.")
+                if not data_chunk: # Client hat Verbindung geschlossen
+                    print(f"SERVER COMM: Client {addr} (P:{session['player_id']}, Name:{session['player_name_for_log']}) hat Verbindung geschlossen (recv returned empty).")
+                    break # Beendet die while True Schleife -> führt zu finally Block
+                frame_decoder.feed(data_chunk)
+                if not _process_frames_or_hand_off(conn, addr, session, frame_decoder):
+                    return # Beendet den Handler-Thread (finally räumt auf)
+
+            except (ConnectionResetError, BrokenPipeError, OSError) as e_comm_loop:
+                print(f"SERVER COMM ERROR in handler loop ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Aktion: {session['action_for_log']}. Fehler: {e_comm_loop}")
+                break # Beendet die while True Schleife für Nachrichtenempfang -> führt zu finally
+            except Exception as e_inner_loop: # Fange alle anderen Fehler in der Nachrichtenverarbeitung ab
+                print(f"SERVER UNEXPECTED INNER LOOP ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Aktion: {session['action_for_log']}. Fehler: {e_inner_loop}"); traceback.print_exc()
+                _safe_send_json(conn, {"type":"error", "message":"Interner Serverfehler bei Nachrichtenverarbeitung."}, session["player_id"], session["player_name_for_log"])
+                # Hier nicht breaken, vielleicht erholt sich der Handler für die nächste Nachricht.
+
+    except Exception as e_outer_handler: # Fängt Fehler in der äußeren while True oder beim initialen recv ab
+        print(f"SERVER UNEXPECTED HANDLER ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Fehler: {e_outer_handler}"); traceback.print_exc()
+    finally:
+        cleanup_client_connection(conn, addr, session)
+
+
+def _hider_warning_allowed(game_data):
+    """Keine Warnung vor dem Standort-Broadcast, wenn das Intervall der aktuellen Phase dafür zu kurz ist."""
+    current_phase_idx_for_warn = game_data.get("current_phase_index", -1)
+    if 0 <= current_phase_idx_for_warn < len(PHASE_DEFINITIONS):
+        phase_def_warn = PHASE_DEFINITIONS[current_phase_idx_for_warn]
+        # Berechne das effektive Intervall der aktuellen Phase
+        interval_check = phase_def_warn.get("update_interval_seconds")
+        if interval_check is None and phase_def_warn.get("updates_in_phase", 0) > 0 and phase_def_warn.get("duration_seconds",0) > 0 :
+            interval_check = phase_def_warn["duration_seconds"] / phase_def_warn["updates_in_phase"]
+        elif interval_check is None:
+            interval_check = 1000 # Hoher Wert, falls nicht anders definiert (z.B. initial reveal)
+
+        if interval_check < HIDER_WARNING_BEFORE_SEEKER_UPDATE_SECONDS + 5: # Puffer von 5s
+            return False
+    return True
+
+def _next_aligned_time(deadline, interval, current_time):
+    """Nächster Zeitpunkt nach current_time, der ein ganzzahliges Vielfaches von interval vor deadline liegt (Countdown-Takt)."""
+    aligned = deadline - math.floor((deadline - current_time) / interval) * interval
+    return aligned if aligned > current_time else aligned + interval
+
+def run_game_logic_tick(room):
+    """
+    Führt einen Tick der Spiellogik eines Raums aus (Phasenwechsel, Warnungen, Standort-Broadcasts, Spielende).
+    room.tick_state hält den Zustand zwischen den Ticks, darunter die Termine der regelmäßigen Updates
+    (*_time-Schlüssel). Aufgerufen vom Timer des Raums (run_room_timer), der danach next_room_tick_time() plant.
+    """
+    game_data = room.game_data
+    tick_state = room.tick_state
+    game_ended_this_tick = False # Wird hier nicht direkt verwendet, aber kann für komplexere Logik nützlich sein
+    broadcast_needed_due_to_time_or_state_change = False
+
+    with room.lock:
+        current_time = time.time()
+        current_game_status = game_data.get("status")
+        if current_game_status is None: # Sollte nicht passieren, aber als Fallback
+            print("SERVER GAMELOGIC (ERROR): Game status is None. Resetting game to initial state.")
+            reset_game_to_initial_state(room); current_game_status = game_data.get("status")
+
+        # Prüfe, ob sich der Spielstatus seit dem letzten Tick geändert hat
+        status_changed_since_last_tick = tick_state["previous_game_status"] != current_game_status
+        if status_changed_since_last_tick:
+            broadcast_needed_due_to_time_or_state_change = True
+            # NEUES LOG
+            print(f"SERVER GAMELOGIC: Game status changed from '{tick_state['previous_game_status']}' to '{current_game_status}'.")
+            tick_state["previous_game_status"] = current_game_status
+            if current_game_status != GAME_STATE_LOBBY: record_game_event(room, "status", status=current_game_status)
+            for timer_key in ("countdown_broadcast_time", "early_end_recount_time", "game_over_broadcast_time"):
+                tick_state.pop(timer_key, None) # Takt beginnt im neuen Status neu
+            # Wenn das Spiel gerade erst gestartet wurde (egal ob HIDER_WAIT oder RUNNING), leere die Abstimmungsanfragen.
+            if current_game_status in [GAME_STATE_RUNNING, GAME_STATE_HIDER_WAIT]:
+                game_data["early_end_requests"] = set()
+                game_data["total_active_players_for_early_end"] = count_active_players_for_early_end(room)
+
+        # --- Logik für GAME_STATE_LOBBY ---
+        if current_game_status == GAME_STATE_LOBBY:
+            active_lobby_player_count = 0; all_in_active_lobby_ready = True
+            current_players_in_lobby = game_data["players"]
+            if not current_players_in_lobby: all_in_active_lobby_ready = False # Keine Spieler -> nicht bereit
+            else:
+                confirmed_players_for_lobby = [p for _, p in current_players_in_lobby.entries("lobby_active")] # Bestätigt und verbunden
+                if not confirmed_players_for_lobby: # Keine bestätigten Spieler in der Lobby
+                    all_in_active_lobby_ready = False
+                else:
+                    active_lobby_player_count = len(confirmed_players_for_lobby)
+                    for p_info_check in confirmed_players_for_lobby:
+                        if not p_info_check.is_ready:
+                            all_in_active_lobby_ready = False; break
+
+            MIN_PLAYERS_TO_START = 1 # Mindestanzahl Spieler, damit das Spiel startet
+            if all_in_active_lobby_ready and active_lobby_player_count >= MIN_PLAYERS_TO_START:
+                # Alle bereit und genug Spieler -> Starte Hider-Vorbereitungszeit
+                game_data["status"] = GAME_STATE_HIDER_WAIT
+                game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_HIDER_WAIT]
+                game_data["hider_wait_end_time"] = current_time + HIDER_INITIAL_DEPARTURE_TIME_SECONDS
+                for p_info_track in current_players_in_lobby.values():
+                    p_info_track.track.clear() # Standortverläufe gelten pro Runde
                 # NEUES LOG
-                print(f"SERVER CLEANUP ({addr}, P:{player_id}, Name:{player_name_for_log}): Schließe Socket dieses Handlers ({conn}).")
-                conn.close()
-            except Exception as e_close:
-                print(f"SERVER CLEANUP: Fehler beim Schließen des Sockets für {addr} ({conn}): {e_close}")
-        # NEUES LOG
-        print(f"SERVER CLEANUP EXIT ({addr}, P:{player_id}, Name:{player_name_for_log}). Handler-Thread beendet.")
+                print(f"SERVER GAMELOGIC: Wechsel zu HIDER_WAIT. Endzeit: {time.strftime('%H:%M:%S', time.localtime(game_data['hider_wait_end_time']))}. Spieler: {active_lobby_player_count}")
+                broadcast_needed_due_to_time_or_state_change = True # Wird am Ende des Ticks ausgelöst
+
+        # --- Logik für GAME_STATE_HIDER_WAIT ---
+        elif current_game_status == GAME_STATE_HIDER_WAIT:
+            if game_data.get("hider_wait_end_time") and current_time >= game_data["hider_wait_end_time"]:
+                # Hider-Vorbereitungszeit abgelaufen -> Starte das Spiel
+                game_data["status"] = GAME_STATE_RUNNING
+                game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_RUNNING]
+                game_data["game_start_time_actual"] = current_time
+                game_data["game_end_time"] = current_time + GAME_DURATION_SECONDS
+                # NEUES LOG
+                print(f"SERVER GAMELOGIC: Wechsel zu RUNNING. Spielende: {time.strftime('%H:%M:%S', time.localtime(game_data['game_end_time']))}")
+
+                # Initialisiere Phasen-Tracking für Hider-Standort-Updates
+                game_data["current_phase_index"] = 0 # Beginne mit der ersten Phase
+                record_game_event(room, "phase", phase=0, name=PHASE_DEFINITIONS[0]["name"])
+                game_data["current_phase_start_time"] = current_time
+                game_data["updates_done_in_current_phase"] = 0
+                _calculate_and_set_next_broadcast_time(room, current_time) # Berechne den ersten Broadcast-Zeitpunkt
+
+                # Aufgaben an Hider verteilen
+                for p_id_task, p_info_task in game_data["players"].entries("active_hiders"): # Kopie, sichere Iteration
+                    if p_info_task.confirmed_for_lobby:
+                        assign_task_to_hider(room, p_id_task)
+
+                # Event an Clients senden, dass das Spiel gestartet ist
+                event_payload_gs = {"type": "game_event", "event_name": "game_started"}
+                player_list_copy_gs = game_data["players"].entries("connected")
+                for p_id_event, p_info_event in player_list_copy_gs:
+                    conn_gs = p_info_event.client_conn
+                    if conn_gs: _safe_send_json(conn_gs, event_payload_gs, p_id_event, p_info_event.name)
+
+                broadcast_needed_due_to_time_or_state_change = True
+            elif game_data.get("hider_wait_end_time") and current_time >= tick_state.get("countdown_broadcast_time", 0): # Regelmäßige Updates für Countdown
+                tick_state["countdown_broadcast_time"] = _next_aligned_time(game_data["hider_wait_end_time"], HIDER_WAIT_COUNTDOWN_BROADCAST_SECONDS, current_time)
+                broadcast_needed_due_to_time_or_state_change = True
+
+        # --- Logik für GAME_STATE_RUNNING ---
+        elif current_game_status == GAME_STATE_RUNNING:
+            if check_game_conditions_and_end(room): # Prüft, ob Spiel vorbei (z.B. alle Hider gefangen, Zeit abgelaufen)
+                game_ended_this_tick = True # Markiere, dass das Spiel in diesem Tick beendet wurde
+                # broadcast_full_game_state_to_all(room) wird am Ende des Ticks ausgelöst, wenn game_ended_this_tick oder broadcast_needed... True ist.
+            else:
+                # Logik für Hider-Standort-Warnungen und Broadcasts
+                next_b_time = game_data.get("next_location_broadcast_time", float('inf'))
+                warning_time_trigger = next_b_time - HIDER_WARNING_BEFORE_SEEKER_UPDATE_SECONDS
+
+                allow_warning = _hider_warning_allowed(game_data)
+
+                if allow_warning and \
+                   not game_data.get("hider_warning_active_for_current_cycle", False) and \
+                   current_time >= warning_time_trigger and current_time < next_b_time:
+                    # Hider-Warnung ist fällig
+                    game_data["hider_warning_active_for_current_cycle"] = True
+                    hiders_needing_warning_update = False
+                    event_payload_warn = {"type": "game_event", "event_name": "hider_location_update_due"}
+                    player_list_copy_warn = game_data["players"].entries("active_hiders") # Kopie für sichere Iteration
+                    for p_id, p_info in player_list_copy_warn:
+                        if p_id not in game_data.get("players",{}): continue # Spieler könnte zwischenzeitlich entfernt worden sein
+                        if p_info.current_role == "hider" and \
+                           p_info.status_ingame == "active" and \
+                           p_info.client_conn:
+                            if not p_info.has_pending_location_warning: # Nur einmal pro Zyklus setzen
+                                game_data["players"][p_id].has_pending_location_warning = True
+                                game_data["players"][p_id].warning_sent_time = current_time
+                                game_data["players"][p_id].last_location_update_after_warning = 0 # Zurücksetzen
+                                hiders_needing_warning_update = True
+                                conn_warn = p_info.client_conn
+                                if conn_warn: _safe_send_json(conn_warn, event_payload_warn, p_id, p_info.name)
+                    if hiders_needing_warning_update: broadcast_needed_due_to_time_or_state_change = True
+
+                if current_time >= next_b_time and next_b_time != float('inf'):
+                    # Zeit für Hider-Standort-Broadcast an Seeker
+                    game_data["hider_warning_active_for_current_cycle"] = False # Reset für den nächsten Zyklus
+
+                    active_hiders_who_failed_update_names = []
+                    player_list_copy_bc = game_data["players"].entries("active_hiders") # Kopie für sichere Iteration
+                    for p_id_h, p_info_h in player_list_copy_bc:
+                        if p_id_h not in game_data.get("players", {}): continue # Spieler könnte zwischenzeitlich entfernt worden sein
+                        if p_info_h.current_role == "hider" and p_info_h.status_ingame == "active":
+                            # Überprüfe, ob eine Warnung aktiv war und ob seitdem ein Update kam
+                            if p_info_h.has_pending_location_warning and p_info_h.client_conn:
+                                if p_info_h.last_location_update_after_warning <= p_info_h.warning_sent_time:
+                                    # Kein Update oder Update war vor der Warnung
+                                    active_hiders_who_failed_update_names.append(p_info_h.name)
+                            # Warnflag für diesen Spieler zurücksetzen, egal ob Update kam oder nicht
+                            game_data["players"][p_id_h].has_pending_location_warning = False
+
+                    if active_hiders_who_failed_update_names:
+                         broadcast_server_text_notification(room, f"Hider haben Standort nach Warnung NICHT aktualisiert: {', '.join(active_hiders_who_failed_update_names)}. Sie bleiben aktiv (keine Strafe).")
+
+                    # Standort-Broadcast durchführen
+                    game_data["updates_done_in_current_phase"] += 1
+                    print(f"SERVER GAMELOGIC: Hider-Standort-Broadcast durchgeführt (Update {game_data['updates_done_in_current_phase']} in Phase {game_data.get('current_phase_index',0)}).")
+                    event_payload_seeker = {"type": "game_event", "event_name": "seeker_locations_updated"}
+                    player_list_copy_seek_ev = game_data["players"].entries("seekers") # Kopie
+                    for p_id_s, p_info_s in player_list_copy_seek_ev:
+                        if p_id_s not in game_data.get("players",{}): continue
+                        if p_info_s.current_role == "seeker" and p_info_s.client_conn:
+                            conn_seek_ev = p_info_s.client_conn
+                            if conn_seek_ev: _safe_send_json(conn_seek_ev, event_payload_seeker, p_id_s, p_info_s.name)
+
+                    _calculate_and_set_next_broadcast_time(room, current_time) # Nächsten Broadcast planen
+                    broadcast_needed_due_to_time_or_state_change = True
 
+                # Regelmäßiger Broadcast für Countdown, falls keine andere Aktion einen Broadcast auslöst
+                if game_data.get("game_end_time") and current_time >= tick_state.get("countdown_broadcast_time", 0):
+                    tick_state["countdown_broadcast_time"] = _next_aligned_time(game_data["game_end_time"], GAME_COUNTDOWN_BROADCAST_SECONDS, current_time)
+                    broadcast_needed_due_to_time_or_state_change = True
 
-def game_logic_thread():
-    previous_game_status_for_logic = None
-    # NEUES LOG
-    print("SERVER GAMELOGIC: Game Logic Thread gestartet.")
-    while True:
-        try:
-            time.sleep(1) # Haupt-Tick des Spiels (1 Sekunde)
-            game_ended_this_tick = False # Wird hier nicht direkt verwendet, aber kann für komplexere Logik nützlich sein
-            broadcast_needed_due_to_time_or_state_change = False
-
-            with data_lock:
-                current_time = time.time()
-                current_game_status = game_data.get("status")
-                if current_game_status is None: # Sollte nicht passieren, aber als Fallback
-                    print("SERVER GAMELOGIC (ERROR): Game status is None. Resetting game to initial state.")
-                    reset_game_to_initial_state(); current_game_status = game_data.get("status")
-
-                # Prüfe, ob sich der Spielstatus seit dem letzten Tick geändert hat
-                if previous_game_status_for_logic != current_game_status:
+                # Regelmäßige Überprüfung der aktiven Spieler für die Early-End-Abstimmung
+                if current_time >= tick_state.get("early_end_recount_time", 0): # Alle EARLY_END_RECOUNT_SECONDS
+                    tick_state["early_end_recount_time"] = current_time + EARLY_END_RECOUNT_SECONDS
+                    new_active_count = count_active_players_for_early_end(room)
+                    if game_data.get("total_active_players_for_early_end") != new_active_count:
+                        game_data["total_active_players_for_early_end"] = new_active_count
+                        broadcast_needed_due_to_time_or_state_change = True # Update an Clients senden
+
+        # --- Logik für GAME_STATE_HIDER_WINS oder GAME_STATE_SEEKER_WINS ---
+        elif current_game_status in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS]:
+            if "actual_game_over_time" not in game_data or game_data["actual_game_over_time"] is None:
+                # Spiel ist gerade eben in den Game-Over-Status gewechselt
+                game_data["actual_game_over_time"] = current_time
+                if not game_data.get("game_end_time"): # Sicherstellen, dass ein Endzeitpunkt existiert
+                     game_data["game_end_time"] = current_time
+                archive_finished_game(room, current_time) # Vor dem Reset nach POST_GAME_LOBBY_RETURN_DELAY_SECONDS
+                # Wichtig: Sofort broadcasten, damit Clients den Game-Over-Screen sehen
+                broadcast_needed_due_to_time_or_state_change = True
+
+            elif current_time >= game_data.get("actual_game_over_time", float('inf')) + POST_GAME_LOBBY_RETURN_DELAY_SECONDS:
+                # Zeit für den Game-Over-Screen ist abgelaufen -> "HARD RESET"
+                print("SERVER GAMELOGIC: Game over screen timeout. Performing hard reset for new game.")
+                reset_message_for_clients = "Das Spiel ist beendet. Der Server wurde für eine neue Runde zurückgesetzt. Bitte neu beitreten."
+
+                # Führe einen Hard Reset durch. Diese Funktion ändert game_data["status"] zu GAME_STATE_LOBBY
+                # und benachrichtigt die Clients, indem sie player_id auf None setzt und deren Sockets schließt.
+                reset_game_to_initial_state(room, notify_clients_about_reset=True, reset_message=reset_message_for_clients)
+
+                print("SERVER GAMELOGIC: Hard-Reset nach Spielende abgeschlossen.")
+                # Der broadcast_needed_due_to_time_or_state_change wird im nächsten Tick durch den
+                # Statuswechsel zu GAME_STATE_LOBBY (der in reset_game_to_initial_state passiert)
+                # automatisch auf True gesetzt und löst einen Broadcast aus.
+            else:
+                # Während der Game-Over-Anzeige: Regelmäßiger Broadcast, um Clients auf dem Laufenden zu halten
+                time_since_actual_game_over = current_time - game_data.get("actual_game_over_time", current_time)
+                if current_time >= tick_state.get("game_over_broadcast_time", 0):
+                    # Häufiger am Anfang: alle 0.5s für die ersten GAME_OVER_FAST_BROADCAST_SECONDS, danach alle 5s
+                    tick_state["game_over_broadcast_time"] = current_time + (0.5 if time_since_actual_game_over < GAME_OVER_FAST_BROADCAST_SECONDS else 5)
                     broadcast_needed_due_to_time_or_state_change = True
-                    # NEUES LOG
-                    print(f"SERVER GAMELOGIC: Game status changed from '{previous_game_status_for_logic}' to '{current_game_status}'.")
-                    previous_game_status_for_logic = current_game_status
-                    # Wenn das Spiel gerade erst gestartet wurde (egal ob HIDER_WAIT oder RUNNING), leere die Abstimmungsanfragen.
-                    if current_game_status in [GAME_STATE_RUNNING, GAME_STATE_HIDER_WAIT]:
-                        game_data["early_end_requests"] = set()
-                        game_data["total_active_players_for_early_end"] = count_active_players_for_early_end()
-
-                # --- Logik für GAME_STATE_LOBBY ---
-                if current_game_status == GAME_STATE_LOBBY:
-                    active_lobby_player_count = 0; all_in_active_lobby_ready = True
-                    current_players_in_lobby = game_data.get("players", {})
-                    if not current_players_in_lobby: all_in_active_lobby_ready = False # Keine Spieler -> nicht bereit
-                    else:
-                        confirmed_players_for_lobby = [p for p in current_players_in_lobby.values()
-                                                       if p.get("confirmed_for_lobby") and p.get("client_conn") is not None]
-                        if not confirmed_players_for_lobby: # Keine bestätigten Spieler in der Lobby
-                            all_in_active_lobby_ready = False
-                        else:
-                            active_lobby_player_count = len(confirmed_players_for_lobby)
-                            for p_info_check in confirmed_players_for_lobby:
-                                if not p_info_check.get("is_ready", False):
-                                    all_in_active_lobby_ready = False; break
-
-                    MIN_PLAYERS_TO_START = 1 # Mindestanzahl Spieler, damit das Spiel startet
-                    if all_in_active_lobby_ready and active_lobby_player_count >= MIN_PLAYERS_TO_START:
-                        # Alle bereit und genug Spieler -> Starte Hider-Vorbereitungszeit
-                        game_data["status"] = GAME_STATE_HIDER_WAIT
-                        game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_HIDER_WAIT]
-                        game_data["hider_wait_end_time"] = current_time + HIDER_INITIAL_DEPARTURE_TIME_SECONDS
-                        # NEUES LOG
-                        print(f"SERVER GAMELOGIC: Wechsel zu HIDER_WAIT. Endzeit: {time.strftime('%H:%M:%S', time.localtime(game_data['hider_wait_end_time']))}. Spieler: {active_lobby_player_count}")
-                        broadcast_needed_due_to_time_or_state_change = True # Wird am Ende des Ticks ausgelöst
-
-                # --- Logik für GAME_STATE_HIDER_WAIT ---
-                elif current_game_status == GAME_STATE_HIDER_WAIT:
-                    if game_data.get("hider_wait_end_time") and current_time >= game_data["hider_wait_end_time"]:
-                        # Hider-Vorbereitungszeit abgelaufen -> Starte das Spiel
-                        game_data["status"] = GAME_STATE_RUNNING
-                        game_data["status_display"] = GAME_STATE_DISPLAY_NAMES[GAME_STATE_RUNNING]
-                        game_data["game_start_time_actual"] = current_time
-                        game_data["game_end_time"] = current_time + GAME_DURATION_SECONDS
-                        # NEUES LOG
-                        print(f"SERVER GAMELOGIC: Wechsel zu RUNNING. Spielende: {time.strftime('%H:%M:%S', time.localtime(game_data['game_end_time']))}")
-
-                        # Initialisiere Phasen-Tracking für Hider-Standort-Updates
-                        game_data["current_phase_index"] = 0 # Beginne mit der ersten Phase
-                        game_data["current_phase_start_time"] = current_time
-                        game_data["updates_done_in_current_phase"] = 0
-                        _calculate_and_set_next_broadcast_time(current_time) # Berechne den ersten Broadcast-Zeitpunkt
-
-                        # Aufgaben an Hider verteilen
-                        for p_id_task, p_info_task in list(game_data.get("players", {}).items()): # Kopie für sichere Iteration
-                            if p_info_task.get("current_role") == "hider" and \
-                               p_info_task.get("confirmed_for_lobby") and \
-                               p_info_task.get("status_ingame") == "active":
-                                assign_task_to_hider(p_id_task)
-
-                        # Event an Clients senden, dass das Spiel gestartet ist
-                        event_payload_gs = {"type": "game_event", "event_name": "game_started"}
-                        player_list_copy_gs = list(game_data.get("players", {}).items())
-                        for p_id_event, p_info_event in player_list_copy_gs:
-                            conn_gs = p_info_event.get("client_conn")
-                            if conn_gs: _safe_send_json(conn_gs, event_payload_gs, p_id_event, p_info_event.get("name"))
-
-                        broadcast_needed_due_to_time_or_state_change = True
-                    elif game_data.get("hider_wait_end_time") and int(game_data["hider_wait_end_time"] - current_time) % 3 == 0 : # Regelmäßige Updates für Countdown
-                        broadcast_needed_due_to_time_or_state_change = True
-
-                # --- Logik für GAME_STATE_RUNNING ---
-                elif current_game_status == GAME_STATE_RUNNING:
-                    if check_game_conditions_and_end(): # Prüft, ob Spiel vorbei (z.B. alle Hider gefangen, Zeit abgelaufen)
-                        game_ended_this_tick = True # Markiere, dass das Spiel in diesem Tick beendet wurde
-                        # broadcast_full_game_state_to_all() wird am Ende des Ticks ausgelöst, wenn game_ended_this_tick oder broadcast_needed... True ist.
-                    else:
-                        # Logik für Hider-Standort-Warnungen und Broadcasts
-                        next_b_time = game_data.get("next_location_broadcast_time", float('inf'))
-                        warning_time_trigger = next_b_time - HIDER_WARNING_BEFORE_SEEKER_UPDATE_SECONDS
-
-                        current_phase_idx_for_warn = game_data.get("current_phase_index", -1)
-                        allow_warning = True # Standardmäßig Warnung erlauben
-                        if 0 <= current_phase_idx_for_warn < len(PHASE_DEFINITIONS):
-                            phase_def_warn = PHASE_DEFINITIONS[current_phase_idx_for_warn]
-                            # Berechne das effektive Intervall der aktuellen Phase
-                            interval_check = phase_def_warn.get("update_interval_seconds")
-                            if interval_check is None and phase_def_warn.get("updates_in_phase", 0) > 0 and phase_def_warn.get("duration_seconds",0) > 0 :
-                                interval_check = phase_def_warn["duration_seconds"] / phase_def_warn["updates_in_phase"]
-                            elif interval_check is None:
-                                interval_check = 1000 # Hoher Wert, falls nicht anders definiert (z.B. initial reveal)
-
-                            if interval_check < HIDER_WARNING_BEFORE_SEEKER_UPDATE_SECONDS + 5: # Puffer von 5s
-                                allow_warning = False # Keine Warnung, wenn das Intervall zu kurz ist
-
-                        if allow_warning and \
-                           not game_data.get("hider_warning_active_for_current_cycle", False) and \
-                           current_time >= warning_time_trigger and current_time < next_b_time:
-                            # Hider-Warnung ist fällig
-                            game_data["hider_warning_active_for_current_cycle"] = True
-                            hiders_needing_warning_update = False
-                            event_payload_warn = {"type": "game_event", "event_name": "hider_location_update_due"}
-                            player_list_copy_warn = list(game_data.get("players", {}).items()) # Kopie für sichere Iteration
-                            for p_id, p_info in player_list_copy_warn:
-                                if p_id not in game_data.get("players",{}): continue # Spieler könnte zwischenzeitlich entfernt worden sein
-                                if p_info.get("current_role") == "hider" and \
-                                   p_info.get("status_ingame") == "active" and \
-                                   p_info.get("client_conn"):
-                                    if not p_info.get("has_pending_location_warning"): # Nur einmal pro Zyklus setzen
-                                        game_data["players"][p_id]["has_pending_location_warning"] = True
-                                        game_data["players"][p_id]["warning_sent_time"] = current_time
-                                        game_data["players"][p_id]["last_location_update_after_warning"] = 0 # Zurücksetzen
-                                        hiders_needing_warning_update = True
-                                        conn_warn = p_info.get("client_conn")
-                                        if conn_warn: _safe_send_json(conn_warn, event_payload_warn, p_id, p_info.get("name"))
-                            if hiders_needing_warning_update: broadcast_needed_due_to_time_or_state_change = True
-
-                        if current_time >= next_b_time and next_b_time != float('inf'):
-                            # Zeit für Hider-Standort-Broadcast an Seeker
-                            game_data["hider_warning_active_for_current_cycle"] = False # Reset für den nächsten Zyklus
-
-                            active_hiders_who_failed_update_names = []
-                            player_list_copy_bc = list(game_data.get("players", {}).items()) # Kopie für sichere Iteration
-                            for p_id_h, p_info_h in player_list_copy_bc:
-                                if p_id_h not in game_data.get("players", {}): continue # Spieler könnte zwischenzeitlich entfernt worden sein
-                                if p_info_h.get("current_role") == "hider" and p_info_h.get("status_ingame") == "active":
-                                    # Überprüfe, ob eine Warnung aktiv war und ob seitdem ein Update kam
-                                    if p_info_h.get("has_pending_location_warning") and p_info_h.get("client_conn"):
-                                        if p_info_h.get("last_location_update_after_warning", 0) <= p_info_h.get("warning_sent_time", 0):
-                                            # Kein Update oder Update war vor der Warnung
-                                            active_hiders_who_failed_update_names.append(p_info_h.get('name', 'Unbekannt'))
-                                    # Warnflag für diesen Spieler zurücksetzen, egal ob Update kam oder nicht
-                                    game_data["players"][p_id_h]["has_pending_location_warning"] = False
-
-                            if active_hiders_who_failed_update_names:
-                                 broadcast_server_text_notification(f"Hider haben Standort nach Warnung NICHT aktualisiert: {', '.join(active_hiders_who_failed_update_names)}. Sie bleiben aktiv (keine Strafe).")
-
-                            # Standort-Broadcast durchführen
-                            game_data["updates_done_in_current_phase"] += 1
-                            print(f"SERVER GAMELOGIC: Hider-Standort-Broadcast durchgeführt (Update {game_data['updates_done_in_current_phase']} in Phase {game_data.get('current_phase_index',0)}).")
-                            event_payload_seeker = {"type": "game_event", "event_name": "seeker_locations_updated"}
-                            player_list_copy_seek_ev = list(game_data.get("players", {}).items()) # Kopie
-                            for p_id_s, p_info_s in player_list_copy_seek_ev:
-                                if p_id_s not in game_data.get("players",{}): continue
-                                if p_info_s.get("current_role") == "seeker" and p_info_s.get("client_conn"):
-                                    conn_seek_ev = p_info_s.get("client_conn")
-                                    if conn_seek_ev: _safe_send_json(conn_seek_ev, event_payload_seeker, p_id_s, p_info_s.get("name"))
-
-                            _calculate_and_set_next_broadcast_time(current_time) # Nächsten Broadcast planen
-                            broadcast_needed_due_to_time_or_state_change = True
-
-                        # Regelmäßiger Broadcast für Countdown, falls keine andere Aktion einen Broadcast auslöst
-                        if game_data.get("game_end_time") and int(game_data.get("game_end_time",0) - current_time) % 5 == 0 :
-                            broadcast_needed_due_to_time_or_state_change = True
-
-                        # Regelmäßige Überprüfung der aktiven Spieler für die Early-End-Abstimmung
-                        if int(current_time) % 10 == 0 : # Alle 10 Sekunden
-                            new_active_count = count_active_players_for_early_end()
-                            if game_data.get("total_active_players_for_early_end") != new_active_count:
-                                game_data["total_active_players_for_early_end"] = new_active_count
-                                broadcast_needed_due_to_time_or_state_change = True # Update an Clients senden
-
-                # --- Logik für GAME_STATE_HIDER_WINS oder GAME_STATE_SEEKER_WINS ---
-                elif current_game_status in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS]:
-                    if "actual_game_over_time" not in game_data or game_data["actual_game_over_time"] is None:
-                        # Spiel ist gerade eben in den Game-Over-Status gewechselt
-                        game_data["actual_game_over_time"] = current_time
-                        if not game_data.get("game_end_time"): # Sicherstellen, dass ein Endzeitpunkt existiert
-                             game_data["game_end_time"] = current_time
-                        # Wichtig: Sofort broadcasten, damit Clients den Game-Over-Screen sehen
-                        broadcast_needed_due_to_time_or_state_change = True
-
-                    elif current_time >= game_data.get("actual_game_over_time", float('inf')) + POST_GAME_LOBBY_RETURN_DELAY_SECONDS:
-                        # Zeit für den Game-Over-Screen ist abgelaufen -> "HARD RESET"
-                        print("SERVER GAMELOGIC: Game over screen timeout. Performing hard reset for new game.")
-                        reset_message_for_clients = "Das Spiel ist beendet. Der Server wurde für eine neue Runde zurückgesetzt. Bitte neu beitreten."
-
-                        # Führe einen Hard Reset durch. Diese Funktion ändert game_data["status"] zu GAME_STATE_LOBBY
-                        # und benachrichtigt die Clients, indem sie player_id auf None setzt und deren Sockets schließt.
-                        reset_game_to_initial_state(notify_clients_about_reset=True, reset_message=reset_message_for_clients)
-
-                        print("SERVER GAMELOGIC: Hard-Reset nach Spielende abgeschlossen.")
-                        # Der broadcast_needed_due_to_time_or_state_change wird im nächsten Tick durch den
-                        # Statuswechsel zu GAME_STATE_LOBBY (der in reset_game_to_initial_state passiert)
-                        # automatisch auf True gesetzt und löst einen Broadcast aus.
-                    else:
-                        # Während der Game-Over-Anzeige: Regelmäßiger Broadcast, um Clients auf dem Laufenden zu halten
-                        time_since_actual_game_over = current_time - game_data.get("actual_game_over_time", current_time)
-                        if time_since_actual_game_over < 3: # Häufiger am Anfang
-                            if int(current_time * 2) % 2 == 0: # Alle 0.5s für die ersten 3s
-                                broadcast_needed_due_to_time_or_state_change = True
-                        elif int(current_time) % 5 == 0: # Alle 5s danach
-                             broadcast_needed_due_to_time_or_state_change = True
-
-            # Führe einen Broadcast durch, wenn sich der Zustand geändert hat oder ein Timer-Update notwendig ist.
-            if game_ended_this_tick or broadcast_needed_due_to_time_or_state_change:
-                broadcast_full_game_state_to_all()
 
-        except Exception as e:
-            print(f"!!! CRITICAL ERROR IN GAME LOGIC THREAD !!!")
-            print(f"Error: {e}")
-            traceback.print_exc()
-            print(f"Game logic thread wird versuchen, nach einer kurzen Pause fortzufahren.")
-            time.sleep(5) # Kurze Pause vor dem nächsten Versuch
+        # Spielstart, Spielende und andere Statuswechsel gehen sofort raus, Countdown-Updates werden gebündelt
+        state_transition_this_tick = status_changed_since_last_tick or game_data.get("status") != current_game_status
+
+    # Führe einen Broadcast durch, wenn sich der Zustand geändert hat oder ein Timer-Update notwendig ist.
+    if game_ended_this_tick or state_transition_this_tick:
+        request_game_state_broadcast(room, immediate=True)
+    elif broadcast_needed_due_to_time_or_state_change:
+        request_game_state_broadcast(room)
+
+
+# --- Zeitsteuerung der Räume ---
+# Jeder Raum hat genau einen Timer ("room", room_id) in game_timers: fällig zum nächsten Termin aus
+# next_room_tick_time() oder sofort nach einer Aktion/Trennung. Ein Raum ohne Termine (z.B. Lobby) kostet nichts.
+game_timers = TimerScheduler()
+ACTIONS_WITHOUT_ROOM_TICK = {"UPDATE_LOCATION"} # Häufig und ohne Einfluss auf Phasen oder Spielende
+
+def schedule_room_tick(room, when=None, keep_earlier=False):
+    """
+    Plant den nächsten Tick eines Raums (ohne Zeitangabe: sofort) und ersetzt den bisherigen Termin, mit keep_earlier
+    nur, wenn der neue früher liegt. Gibt die laufende Nummer des gültigen Termins zurück (None bei geschlossenem Raum).
+    """
+    if room is None or room.closed: return None
+    return game_timers.schedule(("room", room.room_id), time.time() if when is None else when, lambda: run_room_timer(room), keep_earlier)
+
+def next_room_tick_time(room, current_time):
+    """Frühester Termin, zu dem run_game_logic_tick für diesen Raum etwas zu tun hat (None: erst nach der nächsten Aktion)."""
+    game_data, tick_state = room.game_data, room.tick_state
+    with room.lock:
+        current_game_status = game_data.get("status")
+        if tick_state["previous_game_status"] != current_game_status: return current_time
+        candidates = [room.recovery_grace_until]
+        if not game_data.get("players") and room.room_id != DEFAULT_ROOM_ID:
+            candidates.append((room.empty_since or current_time) + ROOM_IDLE_TIMEOUT_SECONDS)
+        if current_game_status == GAME_STATE_HIDER_WAIT:
+            candidates += [game_data.get("hider_wait_end_time"), tick_state.get("countdown_broadcast_time")]
+        elif current_game_status == GAME_STATE_RUNNING:
+            next_b_time = game_data.get("next_location_broadcast_time")
+            candidates += [game_data.get("game_end_time"), next_b_time,
+                           tick_state.get("countdown_broadcast_time"), tick_state.get("early_end_recount_time")]
+            if next_b_time is not None and not game_data.get("hider_warning_active_for_current_cycle") and _hider_warning_allowed(game_data):
+                candidates.append(next_b_time - HIDER_WARNING_BEFORE_SEEKER_UPDATE_SECONDS)
+            candidates.append(room.task_board.next_deadline())
+        elif current_game_status in [GAME_STATE_HIDER_WINS, GAME_STATE_SEEKER_WINS]:
+            if game_data.get("actual_game_over_time") is None: return current_time
+            candidates += [game_data["actual_game_over_time"] + POST_GAME_LOBBY_RETURN_DELAY_SECONDS, tick_state.get("game_over_broadcast_time")]
+    candidates = [c for c in candidates if c is not None and c != float('inf')]
+    if not candidates: return None
+    return max(min(candidates), current_time + MIN_ROOM_TICK_SPACING_SECONDS)
+
+def run_room_timer(room):
+    """
+    Timer-Callback eines Raums: Tick ausführen und den nächsten Termin planen. Ein Fehler betrifft nur diesen Raum.
+    Plant eine Aktion währenddessen einen Tick (schedule_room_tick), bleibt dieser bestehen: danach wird nur ein früherer
+    Termin eingetragen bzw. nur abgebrochen, wenn seit dem Start des Ticks nichts Neues geplant wurde.
+    """
+    if room.closed: return
+    timer_key = ("room", room.room_id)
+    if restart_runtime["draining"]: # Übergabe läuft; scheitert sie, geht es hier weiter
+        schedule_room_tick(room, time.time() + 1, keep_earlier=True); return
+    seq_at_start = game_timers.current_seq(timer_key) # Normalerweise None (run_due hat den Termin entfernt)
+    next_tick_time = time.time() + 1
+    try:
+        current_time = time.time()
+        tick_started = time.perf_counter()
+        with lock_profiler.section(f"tick:{room.game_data.get('status')}"): # Status ohne Lock gelesen, nur als Beschriftung
+            expire_recovery_grace(room, current_time)
+            run_game_logic_tick(room)
+            server_metrics.observe("tick_duration_seconds", time.perf_counter() - tick_started)
+            if room.game_data.get("players"): journal_event(room, "tick") # Der Schreib-Thread schreibt nur echte Änderungen
+            if remove_room_if_idle(room, current_time): return
+            next_tick_time = next_room_tick_time(room, time.time())
+    except Exception as e:
+        print(f"!!! ERROR IN GAME LOGIC TICK (Raum {room.room_id}) !!! Error: {e}")
+        traceback.print_exc()
+    if next_tick_time is None:
+        if seq_at_start is not None: game_timers.cancel(timer_key, only_seq=seq_at_start)
+    else:
+        schedule_room_tick(room, next_tick_time, keep_earlier=True)
+
+
+def game_logic_thread():
+    # NEUES LOG
+    print("SERVER GAMELOGIC: Game Logic Thread gestartet (zeitgesteuert).")
+    game_timers.run_thread() # Schläft bis zum nächsten Termin eines Raums; Fehler fängt run_due() pro Timer ab
+
+def _accept_unless_paused(server_socket):
+    """Thread-Engine: accept(), das sich für eine Server-Übergabe anhalten lässt. Gibt (None, None) zurück, wenn der Server endet."""
+    while not restart_runtime["stopped"].is_set():
+        if restart_runtime["accept_paused"]:
+            time.sleep(0.1); continue
+        readable, _, _ = select.select([server_socket], [], [], 0.5)
+        if not readable: continue
+        with restart_runtime["accept_lock"]:
+            if restart_runtime["accept_paused"]: continue
+            return server_socket.accept()
+    return None, None
+
+def _pause_accepting_threads():
+    restart_runtime["accept_paused"] = True
+    with restart_runtime["accept_lock"]: pass # Wartet ein gerade laufendes accept() ab
+
+def _resume_accepting_threads():
+    restart_runtime["accept_paused"] = False
 
 def main_server():
     # NEUES LOG
     print("SERVER: Initialisiere Spielzustand beim Serverstart...")
-    reset_game_to_initial_state() # Initialer Reset ohne Benachrichtigung
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Erlaube Wiederverwendung der Adresse
     try:
-        server_socket.bind((HOST, PORT))
+        server_socket, takeover_conn = open_listen_socket_and_restore_rooms()
     except OSError as e:
-        print(f"!!! SERVER FATAL: Fehler beim Binden an {HOST}:{PORT}: {e}. Läuft Server bereits? !!!"); return
-    server_socket.listen()
+        print(f"!!! SERVER FATAL: Fehler beim Binden an {HOST}:{PORT} bzw. bei der Übernahme: {e}. Läuft Server bereits? !!!"); return
+    server_socket.setblocking(True) # Ein übernommener Socket kann vom asyncio-Vorgänger nicht blockierend sein
+    restart_runtime.update({"pause_accepting": _pause_accepting_threads, "resume_accepting": _resume_accepting_threads,
+                            "shutdown": restart_runtime["stopped"].set})
     print(f"Hide and Seek Server lauscht auf {HOST}:{PORT}")
 
     # Starte den Game Logic Thread als Daemon, damit er mit dem Hauptprogramm beendet wird
     threading.Thread(target=game_logic_thread, daemon=True).start()
+    start_broadcasting_for_all_rooms("thread") # Gebündelte Broadcasts: ein Thread pro Raum
+    announce_serving(takeover_conn)
     # Das folgende Log wird jetzt im game_logic_thread selbst ausgegeben.
     # print("SERVER: Game Logic Thread gestartet.")
 
@@ -1234,11 +2625,14 @@ def main_server():
         while True:
             # NEUES LOG
             print("SERVER MAIN LOOP: Warte auf neue Verbindung (accept)...")
-            conn, addr = server_socket.accept() # Blockiert, bis eine Verbindung eingeht
+            conn, addr = _accept_unless_paused(server_socket) # Blockiert, bis eine Verbindung eingeht
+            if conn is None:
+                print("SERVER: Server wurde an einen neuen Prozess übergeben."); break
             # NEUES LOG
             print(f"SERVER MAIN LOOP: Verbindung von {addr} akzeptiert. Starte Handler-Thread.")
             # Starte einen neuen Thread für jeden Client
-            thread = threading.Thread(target=handle_client_connection, args=(conn, addr), daemon=True)
+            queued_conn = QueuedClientConnection(conn, addr) # Alle Sendungen laufen über die Ausgangs-Warteschlange
+            thread = threading.Thread(target=handle_client_connection, args=(queued_conn, addr), daemon=True)
             thread.start()
     except KeyboardInterrupt:
         print("SERVER: KeyboardInterrupt. Fahre herunter.")
@@ -1247,9 +2641,417 @@ def main_server():
     finally:
         print("SERVER: Schließe Server-Socket...");
         if server_socket:
-            try: server_socket.close()
+            try: server_socket.close() # Nach einer Übergabe nur unsere Kopie, der neue Prozess nimmt weiter an
             except Exception as e: print(f"SERVER: Fehler beim Schließen des Hauptsockets: {e}")
         print("SERVER: Server beendet.")
 
+
+# --- asyncio-Engine (Alternative zum Thread-pro-Verbindung-Modell) ---
+
+class AsyncioClientConnection(ClientConnection):
+    """
+    Socket-ähnlicher Adapter um einen asyncio-StreamWriter.
+    Die Spiellogik ruft weiterhin sendall/shutdown/close auf, ohne zu wissen, welche Engine läuft.
+    """
+    def __init__(self, writer, loop):
+        super().__init__()
+        self._writer = writer
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident() # Wird im Loop-Thread erzeugt
+        self.peername = writer.get_extra_info("peername")
+
+    def _call_in_loop(self, func, *args):
+        if threading.get_ident() == self._loop_thread_id:
+            func(*args)
+        else: # Aufruf aus einem fremden Thread (z.B. Admin-Werkzeuge) -> an den Loop übergeben
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def sendall(self, data):
+        transport = self._writer.transport
+        if transport.is_closing():
+            raise BrokenPipeError(f"Transport zu {self.peername} wird bereits geschlossen.")
+        if transport.get_write_buffer_size() + len(data) > OUTBOUND_BUFFER_MAX_BYTES:
+            print(f"SERVER OUTBOUND: Sendepuffer für {self.peername} voll (> {OUTBOUND_BUFFER_MAX_BYTES} Bytes). Client zu langsam, Verbindung wird getrennt.")
+            self._call_in_loop(transport.abort)
+            raise BrokenPipeError(f"Sendepuffer für {self.peername} übergelaufen.")
+        self._call_in_loop(self._writer.write, data) # Nicht blockierend, asyncio puffert (begrenzt durch OUTBOUND_BUFFER_MAX_BYTES)
+
+    def shutdown(self, how):
+        self.close() # Halbes Schließen wird nicht benötigt, SHUT_RDWR entspricht close()
+
+    def close(self):
+        if not self._writer.transport.is_closing():
+            self._call_in_loop(self._writer.close)
+
+    def __repr__(self):
+        return f"<AsyncioClientConnection peer={self.peername}>"
+
+
+async def handle_client_connection_async(reader, writer):
+    """asyncio-Gegenstück zu handle_client_connection: gleiches Protokoll, gleiche Aktionen, kein eigener Thread."""
+    addr = writer.get_extra_info("peername")
+    conn = AsyncioClientConnection(writer, asyncio.get_running_loop())
+    session = new_client_session()
+    # NEUES LOG
+    print(f"SERVER HANDLER (ASYNC): Verbindung von {addr} angenommen. Conn: {conn}")
+    try:
+        frame_decoder = FrameDecoder()
+        while True: # Schleife für Nachrichtenempfang
+            try:
+                data_chunk = await reader.read(4096) # Wartet ohne Thread auf Daten
+                print(f"SERVER HANDLER ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}): Empfangen {len(data_chunk)} bytes.")
+                if not data_chunk: # Client hat Verbindung geschlossen
+                    print(f"SERVER COMM: Client {addr} (P:{session['player_id']}, Name:{session['player_name_for_log']}) hat Verbindung geschlossen (read returned empty).")
+                    break
+                frame_decoder.feed(data_chunk)
+                if not process_received_frames(conn, addr, session, frame_decoder):
+                    return # finally räumt auf
+
+            except (ConnectionResetError, BrokenPipeError, OSError) as e_comm_loop:
+                print(f"SERVER COMM ERROR in async handler ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Aktion: {session['action_for_log']}. Fehler: {e_comm_loop}")
+                break
+            except Exception as e_inner_loop:
+                print(f"SERVER UNEXPECTED INNER LOOP ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Aktion: {session['action_for_log']}. Fehler: {e_inner_loop}"); traceback.print_exc()
+                _safe_send_json(conn, {"type":"error", "message":"Interner Serverfehler bei Nachrichtenverarbeitung."}, session["player_id"], session["player_name_for_log"])
+
+    except Exception as e_outer_handler:
+        print(f"SERVER UNEXPECTED HANDLER ERROR ({addr}, P:{session['player_id']}, Name:{session['player_name_for_log']}). Fehler: {e_outer_handler}"); traceback.print_exc()
+    finally:
+        cleanup_client_connection(conn, addr, session)
+
+
+def start_game_logic_async(loop):
+    """Die Raum-Timer laufen auf dem asyncio-Loop statt in einem eigenen Thread (loop.call_later bis zum nächsten Termin)."""
+    print("SERVER GAMELOGIC: Game Logic (asyncio, zeitgesteuert) gestartet.")
+    game_timers.attach_loop(loop)
+
+
+async def _serve_async(listen_socket, takeover_conn):
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    # asyncio schließt beim Anhalten seinen Socket; es bekommt daher eine Kopie, das Original bleibt für die Übergabe
+    serving = {"server": await asyncio.start_server(handle_client_connection_async, sock=listen_socket.dup())}
+
+    async def pause_serving(): serving["server"].close() # Kein wait_closed(): das würde auf alle Verbindungen warten
+    async def resume_serving(): serving["server"] = await asyncio.start_server(handle_client_connection_async, sock=listen_socket.dup())
+    restart_runtime.update({"pause_accepting": lambda: asyncio.run_coroutine_threadsafe(pause_serving(), loop).result(5),
+                            "resume_accepting": lambda: asyncio.run_coroutine_threadsafe(resume_serving(), loop).result(5),
+                            "shutdown": lambda: loop.call_soon_threadsafe(stopped.set)})
+    print(f"Hide and Seek Server (asyncio) lauscht auf {HOST}:{PORT}")
+    start_broadcasting_for_all_rooms("asyncio", loop) # Gebündelte Broadcasts laufen ebenfalls auf dem Loop
+    start_game_logic_async(loop)
+    announce_serving(takeover_conn)
+    try:
+        await stopped.wait() # Angenommen wird im Hintergrund; endet erst nach einer Übergabe an einen neuen Prozess
+        print("SERVER: Server wurde an einen neuen Prozess übergeben.")
+    finally:
+        serving["server"].close()
+        listen_socket.close()
+
+
+def main_server_async():
+    """Startet den Server mit der asyncio-Engine: ein Thread, beliebig viele (auch untätige) Verbindungen."""
+    print("SERVER: Initialisiere Spielzustand beim Serverstart (asyncio-Engine)...")
+    try:
+        listen_socket, takeover_conn = open_listen_socket_and_restore_rooms()
+        asyncio.run(_serve_async(listen_socket, takeover_conn))
+    except KeyboardInterrupt:
+        print("SERVER: KeyboardInterrupt. Fahre herunter.")
+    except OSError as e:
+        print(f"!!! SERVER FATAL: Fehler beim Binden an {HOST}:{PORT} bzw. bei der Übernahme: {e}. Läuft Server bereits? !!!")
+    print("SERVER: Server beendet.")
+
+
+# --- Mehrprozess-Betrieb (Front-End + Worker-Prozesse) ---
+# Spiellogik und Kodierung laufen unter dem GIL, ein Prozess nutzt also nur einen Kern. Mit --workers N nimmt ein
+# Front-End-Prozess die Verbindungen an, beantwortet LIST_ROOMS selbst und reicht jede Verbindung mit ihrer ersten
+# Spielaktion per Socket-Übergabe (SCM_RIGHTS über ein Unix-Socketpaar) an den Worker ihres Raums weiter. Jeder Worker
+# ist ein vollständiger Server (Thread-Engine, eigener game_logic_thread) für seine Räume; ein stark belasteter Raum
+# bremst damit nur die Räume desselben Workers. Steuerkanal: ein Datagramm je Nachricht, JSON-Kopfzeile + Nutzdaten.
+CONTROL_MESSAGE_MAX_BYTES = 256 * 1024
+SHARD_REPORT_INTERVAL_SECONDS = 1.0 # So oft melden Worker ihre Räume (für LIST_ROOMS und die Platzierung neuer Räume)
+
+def _send_control_message(control_sock, header, payload=b"", fds=()):
+    data = json.dumps(header).encode("utf-8") + b"\n" + payload
+    if len(data) > CONTROL_MESSAGE_MAX_BYTES:
+        raise OSError(f"Steuernachricht zu groß ({len(data)} Bytes).")
+    socket.send_fds(control_sock, [data], list(fds))
+
+def _recv_control_message(control_sock):
+    """Gibt (header, payload, fds) zurück; header ist None, wenn die Gegenseite den Kanal geschlossen hat."""
+    data, fds, flags, _ = socket.recv_fds(control_sock, CONTROL_MESSAGE_MAX_BYTES, 4)
+    if not data:
+        for fd in fds: socket.close(fd)
+        return None, b"", []
+    if flags & (socket.MSG_TRUNC | socket.MSG_CTRUNC):
+        for fd in fds: socket.close(fd)
+        raise OSError("Steuernachricht abgeschnitten.")
+    header_bytes, _, payload = data.partition(b"\n")
+    return json.loads(header_bytes), payload, fds
+
+
+def _shard_report_thread(control_sock):
+    while True:
+        try:
+            _send_control_message(control_sock, {"type": "rooms", "rooms": get_room_directory()})
+        except OSError:
+            return # Front-End beendet; die Hauptschleife des Workers endet ebenfalls
+        time.sleep(SHARD_REPORT_INTERVAL_SECONDS)
+
+def run_shard_worker(shard_index, shard_count, control_sock, broadcast_window_seconds, journal_dir=None, auto_catch_radius_meters=None,
+                     catch_max_distance_meters=None, archive_dir=None, metrics_port=None, lock_profiling=False, log_settings=None):
+    """Einstiegspunkt eines Worker-Prozesses: bedient die Räume mit shard_for_room(...) == shard_index."""
+    if log_settings: gamelog.install(*log_settings) # (Stufe, Ratenlimit) wie im Front-End; der Worker hat sein eigenes sys.stdout
+    global BROADCAST_COALESCE_WINDOW_SECONDS, AUTO_CATCH_RADIUS_METERS, CATCH_MAX_DISTANCE_METERS, ARCHIVE_DIR
+    BROADCAST_COALESCE_WINDOW_SECONDS = broadcast_window_seconds
+    AUTO_CATCH_RADIUS_METERS = auto_catch_radius_meters # Worker werden per "spawn" gestartet und sehen die CLI-Optionen nicht
+    CATCH_MAX_DISTANCE_METERS = catch_max_distance_meters
+    ARCHIVE_DIR = archive_dir # Ein gemeinsames Archiv für alle Worker (Dateinamen enthalten die Raum-ID)
+    lock_profiler.enabled = lock_profiling
+    shard_runtime.update({"index": shard_index, "count": shard_count,
+                          "handoff": lambda sock, addr, pending_data: _send_control_message(
+                              control_sock, {"type": "handoff", "addr": list(addr)}, pending_data, [sock.fileno()])})
+    print(f"SERVER SHARD {shard_index}/{shard_count}: Worker gestartet.")
+    if journal_dir: start_journal(os.path.join(journal_dir, f"shard-{shard_index}")) # Eigenes Journal pro Worker
+    if metrics_port: start_metrics_http_server(server_metrics, METRICS_HOST, metrics_port + 1 + shard_index, METRICS_JSON_ROUTES) # Eigener Endpunkt pro Worker
+    if is_local_room_id(DEFAULT_ROOM_ID): ensure_default_room()
+    threading.Thread(target=game_logic_thread, daemon=True).start()
+    start_broadcasting_for_all_rooms("thread")
+    threading.Thread(target=_shard_report_thread, args=(control_sock,), daemon=True).start()
+    while True:
+        try:
+            header, payload, fds = _recv_control_message(control_sock)
+        except OSError as e:
+            print(f"SERVER SHARD {shard_index}: Fehler auf dem Steuerkanal: {e}"); continue
+        if header is None:
+            print(f"SERVER SHARD {shard_index}: Front-End hat den Steuerkanal geschlossen. Worker beendet sich."); return
+        if header.get("type") == "connection" and fds:
+            sock = socket.socket(fileno=fds[0])
+            sock.setblocking(True) # Das Front-End arbeitet nicht blockierend; das Flag gilt für alle Kopien des Sockets
+            addr = tuple(header.get("addr") or ("?", 0))
+            queued_conn = QueuedClientConnection(sock, addr)
+            threading.Thread(target=handle_client_connection, args=(queued_conn, addr, payload), daemon=True).start()
+            fds = fds[1:]
+        elif header.get("type") == "directory":
+            shard_runtime["directory"] = header.get("rooms", [])
+        for fd in fds: socket.close(fd)
+
+
+class ShardFrontEnd:
+    """Front-End im Mehrprozess-Betrieb: Annahme, LIST_ROOMS, Routing nach Raum und Überwachung der Worker."""
+    def __init__(self, worker_count, broadcast_window_seconds, journal_dir=None, auto_catch_radius_meters=None,
+                 catch_max_distance_meters=None, archive_dir=None, metrics_port=None, lock_profiling=False, log_settings=None):
+        self.worker_count = worker_count
+        self.broadcast_window_seconds = broadcast_window_seconds
+        self.journal_dir = journal_dir
+        self.auto_catch_radius_meters = auto_catch_radius_meters
+        self.catch_max_distance_meters = catch_max_distance_meters
+        self.archive_dir = archive_dir
+        self.metrics_port = metrics_port
+        self.lock_profiling = lock_profiling
+        self.log_settings = log_settings
+        self.workers = [None] * worker_count # {"process", "control"}
+        self.room_reports = [[] for _ in range(worker_count)] # Letzte Raumliste je Worker
+        self.new_rooms_since_report = [0] * worker_count
+        self._mp_context = multiprocessing.get_context("spawn") # Worker erben keine Client-Sockets des Front-Ends
+
+    def start_worker(self, index):
+        front_sock, worker_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = self._mp_context.Process(target=run_shard_worker, name=f"hide-and-seek-shard-{index}",
+                                           args=(index, self.worker_count, worker_sock, self.broadcast_window_seconds, self.journal_dir,
+                                                 self.auto_catch_radius_meters, self.catch_max_distance_meters, self.archive_dir, self.metrics_port,
+                                                 self.lock_profiling, self.log_settings), daemon=True)
+        process.start()
+        worker_sock.close()
+        front_sock.setblocking(False)
+        self.workers[index] = {"process": process, "control": front_sock}
+        self.room_reports[index] = []
+        asyncio.get_running_loop().add_reader(front_sock, self._on_control_readable, index, front_sock)
+        print(f"SERVER FRONTEND: Worker {index} gestartet (PID {process.pid}).")
+
+    def stop_workers(self):
+        for worker in self.workers:
+            if not worker: continue
+            worker["control"].close() # Worker beendet sich, sobald der Steuerkanal zu ist
+            worker["process"].join(2)
+            if worker["process"].is_alive(): worker["process"].terminate()
+
+    def room_directory(self):
+        return _sort_room_directory([room for report in self.room_reports for room in report])
+
+    def pick_worker_for_new_room(self):
+        """Neue Räume gehen an den Worker mit den wenigsten Spielern (plus seit der letzten Meldung zugewiesene Räume)."""
+        def load(index):
+            return sum(r.get("player_count", 0) for r in self.room_reports[index]) + self.new_rooms_since_report[index]
+        index = min(range(self.worker_count), key=load)
+        self.new_rooms_since_report[index] += 1
+        return index
+
+    def _on_control_readable(self, index, control_sock):
+        try:
+            header, payload, fds = _recv_control_message(control_sock)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            print(f"SERVER FRONTEND: Fehler auf dem Steuerkanal von Worker {index}: {e}"); return
+        if header is None: # Worker beendet; _supervise startet ihn neu
+            asyncio.get_running_loop().remove_reader(control_sock); return
+        if header.get("type") == "rooms":
+            self.room_reports[index] = header.get("rooms", [])
+            self.new_rooms_since_report[index] = 0
+        elif header.get("type") == "handoff" and fds: # Verbindung will in einen Raum eines anderen Workers
+            sock = socket.socket(fileno=fds[0])
+            sock.setblocking(False)
+            asyncio.create_task(self._route_connection(sock, tuple(header.get("addr") or ("?", 0)), payload))
+            fds = fds[1:]
+        for fd in fds: socket.close(fd)
+
+    async def _send_to_client(self, sock, payload):
+        await asyncio.get_running_loop().sock_sendall(sock, encode_frame(json.dumps(payload).encode("utf-8")))
+
+    async def _route_connection(self, sock, addr, initial_data=b""):
+        """Liest bis zur ersten Spielaktion (LIST_ROOMS wird direkt beantwortet) und übergibt dann an den Ziel-Worker."""
+        loop = asyncio.get_running_loop()
+        frame_decoder = FrameDecoder(max_frame_bytes=CONTROL_MESSAGE_MAX_BYTES // 2)
+        frame_decoder.feed(initial_data)
+        try:
+            while True:
+                frame = frame_decoder.next_frame()
+                if frame is None:
+                    data_chunk = await loop.sock_recv(sock, 4096)
+                    if not data_chunk: sock.close(); return
+                    frame_decoder.feed(data_chunk); continue
+                if not frame.strip(): continue
+                try:
+                    message = json.loads(frame)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    await self._send_to_client(sock, {"type": "error", "message": "Fehlerhafte JSON-Daten empfangen. Verbindung könnte instabil sein."}); continue
+                if not isinstance(message, dict):
+                    await self._send_to_client(sock, {"type": "error", "message": "Nachricht muss ein JSON-Objekt sein."}); continue
+                if message.get("action") == "LIST_ROOMS":
+                    await self._send_to_client(sock, {"type": "room_list", "rooms": self.room_directory(), "current_room_id": None}); continue
+                shard = shard_for_message(message, self.worker_count)
+                if shard is None: shard = self.pick_worker_for_new_room()
+                pending_data = frame + b"\n" + frame_decoder.drain()
+                self._pass_to_worker(shard, sock, addr, pending_data)
+                return
+        except FrameTooLargeError as e:
+            print(f"SERVER FRONTEND: {addr}: {e} Verbindung wird getrennt.")
+            sock.close()
+        except OSError as e:
+            print(f"SERVER FRONTEND: Verbindung zu {addr} beim Routen verloren: {e}")
+            sock.close()
+
+    def _pass_to_worker(self, index, sock, addr, pending_data):
+        worker = self.workers[index]
+        try:
+            if not worker or not worker["process"].is_alive(): raise OSError(f"Worker {index} läuft nicht.")
+            _send_control_message(worker["control"], {"type": "connection", "addr": list(addr)}, pending_data, [sock.fileno()])
+            print(f"SERVER FRONTEND: {addr} an Worker {index} übergeben.")
+        except OSError as e: # Auch BlockingIOError, wenn der Worker hängt und sein Steuerkanal voll ist
+            print(f"SERVER FRONTEND: Übergabe von {addr} an Worker {index} fehlgeschlagen: {e}")
+            try: sock.sendall(encode_frame(json.dumps({"type": "error", "message": "Server überlastet. Bitte neu verbinden."}).encode("utf-8")))
+            except OSError: pass
+        sock.close() # Nur die Kopie des Front-Ends; kein shutdown(), die Verbindung gehört jetzt dem Worker
+
+    async def _supervise(self):
+        """Startet abgestürzte Worker neu und verteilt das zusammengeführte Raumverzeichnis an alle Worker."""
+        while True:
+            await asyncio.sleep(SHARD_REPORT_INTERVAL_SECONDS)
+            for index, worker in enumerate(self.workers):
+                if worker["process"].is_alive(): continue
+                print(f"SERVER FRONTEND: Worker {index} ist beendet (Exitcode {worker['process'].exitcode}). Starte neu; seine Räume sind verloren.")
+                asyncio.get_running_loop().remove_reader(worker["control"])
+                worker["control"].close()
+                self.start_worker(index)
+            directory = self.room_directory()
+            for worker in self.workers:
+                try: _send_control_message(worker["control"], {"type": "directory", "rooms": directory})
+                except OSError: pass # Nächster Versuch im nächsten Durchlauf
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((HOST, PORT))
+        server_socket.listen()
+        server_socket.setblocking(False)
+        for index in range(self.worker_count):
+            self.start_worker(index)
+        print(f"Hide and Seek Server (Front-End, {self.worker_count} Worker) lauscht auf {HOST}:{PORT}")
+        supervisor_task = asyncio.create_task(self._supervise())
+        try:
+            while True:
+                conn, addr = await loop.sock_accept(server_socket)
+                asyncio.create_task(self._route_connection(conn, addr))
+        finally:
+            supervisor_task.cancel()
+            server_socket.close()
+
+
+def main_server_sharded(worker_count, log_settings=None):
+    """Startet den Mehrprozess-Betrieb: ein Front-End-Prozess und worker_count Worker-Prozesse."""
+    print(f"SERVER: Starte Mehrprozess-Betrieb mit {worker_count} Workern...")
+    front_end = ShardFrontEnd(worker_count, BROADCAST_COALESCE_WINDOW_SECONDS, JOURNAL_DIR, AUTO_CATCH_RADIUS_METERS, CATCH_MAX_DISTANCE_METERS,
+                              ARCHIVE_DIR, METRICS_PORT, lock_profiler.enabled, log_settings)
+    try:
+        asyncio.run(front_end.serve())
+    except KeyboardInterrupt:
+        print("SERVER: KeyboardInterrupt. Fahre herunter.")
+    except OSError as e:
+        print(f"!!! SERVER FATAL: Fehler beim Binden an {HOST}:{PORT}: {e}. Läuft Server bereits? !!!")
+    finally:
+        front_end.stop_workers()
+    print("SERVER: Server beendet.")
+
 if __name__ == "__main__":
-    main_server()
+    arg_parser = argparse.ArgumentParser(description="Hide and Seek Spielserver")
+    arg_parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads",
+                            help="threads: ein Thread pro Verbindung (Standard), asyncio: alle Verbindungen in einem Event-Loop")
+    arg_parser.add_argument("--broadcast-window-ms", type=int, default=int(BROADCAST_COALESCE_WINDOW_SECONDS * 1000),
+                            help="Zeitfenster, in dem Broadcast-Anforderungen gebündelt werden (0 = nicht bündeln)")
+    arg_parser.add_argument("--workers", type=int, default=0,
+                            help="Anzahl Worker-Prozesse (ab 2: Räume werden auf Prozesse/Kerne verteilt, Worker nutzen die Thread-Engine; 0 = ein Prozess)")
+    arg_parser.add_argument("--auto-catch-radius", type=float, default=0,
+                            help="Automatisches Fangen: aktive Hider im Umkreis von so vielen Metern um einen Seeker gelten als gefangen (0 = aus)")
+    arg_parser.add_argument("--catch-max-distance", type=float, default=0,
+                            help=f"CATCH_HIDER nur aus höchstens so vielen Metern (plus GPS-Ungenauigkeit); bei Standorten älter als {CATCH_MAX_FIX_AGE_SECONDS} s keine Prüfung (0 = aus)")
+    arg_parser.add_argument("--journal-dir", default=None,
+                            help="Verzeichnis für Write-Ahead-Log und Snapshots; nach einem Absturz wird das laufende Spiel daraus wiederhergestellt")
+    arg_parser.add_argument("--archive-dir", default=None,
+                            help="Verzeichnis, in das beendete Spiele (Standortverläufe und Ereignisse) zur Wiedergabe archiviert werden")
+    arg_parser.add_argument("--metrics-port", type=int, default=0,
+                            help=f"HTTP-Port für /metrics und /metrics.json auf {METRICS_HOST} (0 = aus; im Mehrprozess-Betrieb Worker i auf Port + 1 + i)")
+    arg_parser.add_argument("--lock-profile", action="store_true",
+                            help="Warte- und Haltezeiten der Raum-Locks je Aufrufstelle messen (Rangliste unter /locks, benötigt --metrics-port)")
+    arg_parser.add_argument("--log-level", choices=sorted(gamelog.LEVELS_BY_NAME, key=gamelog.LEVELS_BY_NAME.get), default="info",
+                            help="Niedrigste ausgegebene Protokollstufe (debug zeigt u.a. jede empfangene Aktion)")
+    arg_parser.add_argument("--log-rate-limit", type=int, default=gamelog.LOG_RATE_LIMIT_PER_SECOND,
+                            help="Höchstens so viele Protokollzeilen pro Sekunde und Kategorie, der Rest wird zusammengefasst (0 = unbegrenzt; Fehler immer)")
+    arg_parser.add_argument("--control-socket", default=None,
+                            help="Unix-Socket-Pfad, über den ein neuer Serverprozess diesen ohne Unterbrechung ablösen kann")
+    arg_parser.add_argument("--takeover", action="store_true",
+                            help="Beim Start den unter --control-socket laufenden Server übernehmen (Listening-Socket + Spielstand)")
+    cli_args = arg_parser.parse_args()
+    BROADCAST_COALESCE_WINDOW_SECONDS = cli_args.broadcast_window_ms / 1000.0 # Gilt für alle ab jetzt angelegten Räume
+    JOURNAL_DIR = cli_args.journal_dir
+    ARCHIVE_DIR = cli_args.archive_dir
+    METRICS_PORT = cli_args.metrics_port or None
+    lock_profiler.enabled = cli_args.lock_profile
+    AUTO_CATCH_RADIUS_METERS = cli_args.auto_catch_radius or None
+    CATCH_MAX_DISTANCE_METERS = cli_args.catch_max_distance or None
+    CONTROL_SOCKET_PATH = cli_args.control_socket
+    TAKEOVER_ON_START = cli_args.takeover
+    log_settings = (gamelog.LEVELS_BY_NAME[cli_args.log_level], max(0, cli_args.log_rate_limit))
+    gamelog.install(*log_settings) # Ab hier schreibt print() nicht mehr selbst, sondern der Thread "log-writer"
+    if TAKEOVER_ON_START and not CONTROL_SOCKET_PATH:
+        arg_parser.error("--takeover benötigt --control-socket (Pfad des laufenden Servers)")
+    if CONTROL_SOCKET_PATH and cli_args.workers >= 2:
+        arg_parser.error("--control-socket/--takeover wird im Mehrprozess-Betrieb (--workers) nicht unterstützt")
+    if cli_args.workers >= 2:
+        if cli_args.engine == "asyncio": print("SERVER: Hinweis: Im Mehrprozess-Betrieb nutzen die Worker die Thread-Engine.")
+        main_server_sharded(cli_args.workers, log_settings)
+    elif cli_args.engine == "asyncio":
+        main_server_async()
+    else:
+        main_server()